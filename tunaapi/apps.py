@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class TunaapiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'tunaapi'
+
+    def ready(self):
+        # Connects the receivers that keep derived tables in sync
+        from tunaapi import signals  # pylint: disable=unused-import,import-outside-toplevel
@@ -0,0 +1,3 @@
+from .response_cache import cached_detail, cached_values, invalidate
+from .shared_version import SharedVersion
+from .single_flight import SingleFlight, coalesced
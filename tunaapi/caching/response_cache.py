@@ -0,0 +1,148 @@
+"""Versioned response cache for the detail endpoints
+
+Each cached resource (e.g. artist 3) has a version token in the cache.
+Cached responses are stored under a key that includes the current token, so
+invalidating a resource is a single write of a fresh token: old entries are
+never read again and simply expire. Tokens are only replaced once the write
+commits, so no reader can cache data from before the commit under the new
+token.
+"""
+import hashlib
+import json
+from functools import wraps
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+RESPONSE_CACHE_TIMEOUT = 60 * 10
+
+
+def _version_key(resource, pk):
+    return f'tunaapi:version:{resource}:{pk}'
+
+
+def _current_version(resource, pk):
+    key = _version_key(resource, pk)
+    version = cache.get(key)
+    if version is None:
+        # Start from a fresh token rather than a counter, so a version key
+        # that was evicted can never line up with entries cached before it
+        cache.add(key, uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+def _current_versions(resource, pks):
+    """Batch form of _current_version, one get_many for the common case"""
+    keys = {_version_key(resource, pk): pk for pk in pks}
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    for key in missing:
+        cache.add(key, uuid4().hex, None)
+    if missing:
+        found.update(cache.get_many(missing))
+    return {pk: found.get(key) for key, pk in keys.items()}
+
+
+def invalidate(resource, pks):
+    """Drop the cached responses of the given resources on commit
+
+    The keys are taken now, so `pks` may be a queryset over rows the
+    transaction is about to delete. Outside a transaction this is immediate.
+    """
+    keys = [_version_key(resource, pk) for pk in pks]
+    if keys:
+        transaction.on_commit(lambda: cache.set_many(
+            {key: uuid4().hex for key in keys}, None))
+
+
+def _make_etag(data, variant):
+    payload = json.dumps(data, cls=JSONEncoder, sort_keys=True)
+    digest = hashlib.sha1(f'{variant}\n{payload}'.encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def _not_modified(request, etag):
+    if_none_match = request.headers.get('If-None-Match')
+    if not if_none_match:
+        return False
+    etags = parse_etags(if_none_match)
+    return '*' in etags or etag in etags
+
+
+def _respond(request, etag, data):
+    if _not_modified(request, etag):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = Response(data)
+    response['ETag'] = etag
+    return response
+
+
+def cached_detail(resource):
+    """Cache a ViewSet retrieve method's successful responses
+
+    Responses carry a strong ETag and `If-None-Match` requests that match it
+    get an empty 304. A hit skips both the database and the serializer.
+    The pk is normalized to an int, so `/artists/01` shares the entry and
+    the invalidations of `/artists/1`; ids that are not integers are 404.
+    """
+    def decorator(retrieve):
+        @wraps(retrieve)
+        def wrapper(self, request, pk):
+            try:
+                pk = int(pk)
+            except ValueError as error:
+                raise NotFound() from error
+            variant = '{}?{}'.format(
+                request.accepted_renderer.format,
+                request.META.get('QUERY_STRING', ''))
+            key = 'tunaapi:response:{}:{}:{}:{}'.format(
+                resource, pk, _current_version(resource, pk),
+                hashlib.sha1(variant.encode()).hexdigest())
+
+            entry = cache.get(key)
+            if entry is not None:
+                etag, data = entry
+                return _respond(request, etag, data)
+
+            response = retrieve(self, request, pk)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            etag = _make_etag(response.data, variant)
+            cache.set(key, (etag, response.data), RESPONSE_CACHE_TIMEOUT)
+            return _respond(request, etag, response.data)
+        return wrapper
+    return decorator
+
+
+def cached_values(resource, pks, compute):
+    """Cached per-object values for a batch of primary keys
+
+    `compute(pks)` is called once with only the keys that missed and returns
+    a dict of pk to value; keys it leaves out are not cached and are missing
+    from the result. Values are invalidated with `invalidate(resource, ...)`
+    like the cached responses.
+    """
+    versions = _current_versions(resource, pks)
+    keys = {
+        f'tunaapi:value:{resource}:{pk}:{version}': pk
+        for pk, version in versions.items()
+    }
+    values = {keys[key]: value for key, value in cache.get_many(keys).items()}
+
+    missing = [pk for pk in versions if pk not in values]
+    if missing:
+        computed = compute(missing)
+        cache.set_many({
+            f'tunaapi:value:{resource}:{pk}:{versions[pk]}': value
+            for pk, value in computed.items()
+        }, RESPONSE_CACHE_TIMEOUT)
+        values.update(computed)
+    return values
@@ -0,0 +1,35 @@
+"""Version counters in the shared cache for data held in process memory
+
+A process that keeps derived data in memory records the version it built
+from. Writers bump the version after committing, so every other process
+sees a version it did not produce and rebuilds. A writer whose bump lands
+exactly one past the version it holds knows nobody else changed anything
+in between and can patch its own copy instead.
+"""
+import secrets
+
+from django.core.cache import cache
+
+
+class SharedVersion:
+    """An integer version under one cache key"""
+
+    def __init__(self, key):
+        self.key = key
+
+    def get(self):
+        version = cache.get(self.key)
+        if version is None:
+            # A random start, so a key that was evicted or cleared can never
+            # line up with a version some process built from before
+            cache.add(self.key, secrets.randbits(62), None)
+            version = cache.get(self.key)
+        return version
+
+    def bump(self):
+        """Increment the version and return the new value"""
+        try:
+            return cache.incr(self.key)
+        except ValueError:
+            self.get()
+            return cache.incr(self.key)
@@ -0,0 +1,116 @@
+"""Single-flight coalescing for expensive read-only endpoints
+
+When many identical requests arrive together, for instance dashboards
+refreshing at once, only the first one computes the response; the others
+wait for it and share its result instead of repeating the same
+aggregation. The result is then kept in the cache for a few seconds, so
+requests arriving just after are answered without any query either.
+
+Coalescing is per process; the short-TTL cache is shared like any other
+cache entry. Catalog writes also drop the cached results through
+`invalidate('coalesced', [endpoint])`, the TTL only bounds how long an
+unused result is kept.
+"""
+import hashlib
+import threading
+from functools import wraps
+
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+from tunaapi.metrics import registry
+from .response_cache import _current_version
+
+COALESCE_TIMEOUT = 5
+
+coalesced_requests = registry.counter(
+    'tunaapi_coalesced_requests_total',
+    'Coalesced endpoint lookups, by whether they were computed (miss), '
+    'shared from an in-flight computation (coalesced) or cached (hit)',
+    ('endpoint', 'outcome'))
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Runs one computation per key at a time, sharing it with waiters"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+
+    def do(self, key, compute):
+        """compute() run once for all concurrent callers with this key
+
+        Returns (result, shared), shared being True for callers that waited
+        on another caller's computation. If it raises, every caller does.
+        """
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = compute()
+        except Exception as error:
+            call.error = error
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+        return call.result, False
+
+
+single_flight = SingleFlight()
+
+
+def coalesced(endpoint, timeout=COALESCE_TIMEOUT):
+    """Coalesce a ViewSet action's identical concurrent requests
+
+    Requests are identical when they have the same URL arguments, query
+    string and renderer. Successful responses are cached for `timeout`
+    seconds or until `invalidate('coalesced', [endpoint])`.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(self, request, *args, **kwargs):
+            variant = '{}?{}:{}'.format(
+                request.accepted_renderer.format,
+                request.META.get('QUERY_STRING', ''), sorted(kwargs.items()))
+            key = 'tunaapi:coalesced:{}:{}:{}'.format(
+                endpoint, _current_version('coalesced', endpoint),
+                hashlib.sha1(variant.encode()).hexdigest())
+
+            data = cache.get(key)
+            if data is not None:
+                coalesced_requests.inc(endpoint=endpoint, outcome='hit')
+                return Response(data)
+
+            def compute():
+                response = view(self, request, *args, **kwargs)
+                if response.status_code == status.HTTP_200_OK:
+                    cache.set(key, response.data, timeout)
+                return response
+
+            response, shared = single_flight.do(key, compute)
+            coalesced_requests.inc(
+                endpoint=endpoint, outcome='coalesced' if shared else 'miss')
+            if shared:
+                return Response(response.data, status=response.status_code)
+            return response
+        return wrapper
+    return decorator
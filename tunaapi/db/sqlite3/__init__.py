@@ -0,0 +1 @@
+from .base import DEFAULT_PRAGMAS, TRANSACTION_MODES, configure_connection
@@ -0,0 +1,60 @@
+"""SQLite backend set up for concurrent readers and writers
+
+Selected with ENGINE 'tunaapi.db.sqlite3'. Two extra OPTIONS are read and
+removed before the connection is opened:
+
+- `pragmas`: applied to every new connection, merged over DEFAULT_PRAGMAS
+- `transaction_mode`: how atomic blocks begin their transaction. IMMEDIATE
+  takes the write lock up front, so a transaction that reads and then
+  writes waits on busy_timeout instead of failing with "database is
+  locked" when another writer got there first.
+"""
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+from django.utils.asyncio import async_unsafe
+
+DEFAULT_PRAGMAS = {
+    # Readers no longer block the writer and the writer no longer blocks
+    # readers
+    'journal_mode': 'WAL',
+    # Safe with WAL: a power loss can roll back the last commits, but cannot
+    # corrupt the database
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    # Negative values are in KiB, so 64 MiB of page cache per connection
+    'cache_size': -64 * 1024,
+    # Milliseconds to wait for a lock before raising "database is locked"
+    'busy_timeout': 5000,
+}
+
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+def configure_connection(connection, pragmas):
+    """Apply the pragmas to a DB-API sqlite3 connection"""
+    for name, value in pragmas.items():
+        connection.execute(f'PRAGMA {name} = {value}')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    pragmas = DEFAULT_PRAGMAS
+    transaction_mode = 'IMMEDIATE'
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self.pragmas = {**DEFAULT_PRAGMAS, **params.pop('pragmas', {})}
+        transaction_mode = params.pop('transaction_mode', 'IMMEDIATE').upper()
+        if transaction_mode not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(
+                f"transaction_mode must be one of {', '.join(TRANSACTION_MODES)}.")
+        self.transaction_mode = transaction_mode
+        return params
+
+    @async_unsafe
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        configure_connection(conn, self.pragmas)
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute(f'BEGIN {self.transaction_mode}')
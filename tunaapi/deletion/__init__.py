@@ -0,0 +1,2 @@
+from .artists import (PURGE_BATCH_SIZE, delete_artists, purge_artists,
+                      soft_delete_artist)
@@ -0,0 +1,133 @@
+"""Set-based cascade deletes for artists with large discographies
+
+`artist.delete()` has Django's collector load every song and song genre
+of the artist and run each row's delete signals, one round of counter
+updates per link. These functions issue one DELETE per table instead,
+in dependency order, and adjust the derived counters from grouped counts
+taken just before. Everything row signals would do is covered by
+tombstones written with INSERT ... SELECT and a single
+catalog_bulk_changed.
+
+For the largest artists `soft_delete_artist` retires the artist at once:
+it sets deleted_at, which the default Artist manager and the `live()`
+song and song genre querysets of the read endpoints leave out, and
+settles the counters, tombstones and caches as a delete would. An
+'artist-purge' job then removes the rows, PURGE_BATCH_SIZE songs per
+run, so no transaction holds the write lock for long.
+"""
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from tunaapi.jobs import enqueue
+from tunaapi.models import (Artist, ArtistGenre, Change, GenrePopularity, Song,
+                            SongGenre)
+from tunaapi.signals import catalog_bulk_changed
+
+# Songs removed by one run of the purge job
+PURGE_BATCH_SIZE = 1000
+
+
+def _delete_rows(queryset):
+    """DELETE a queryset's rows in one statement, skipping Django's collector
+
+    The collector would load every row to run its delete signals and
+    cascade to its dependents. Callers here delete dependents first, in
+    dependency order, and do what the signals would have done themselves:
+    tombstones, counter adjustments and catalog_bulk_changed.
+    """
+    return queryset._raw_delete(queryset.db)  # pylint: disable=protected-access
+
+
+def _artist_rows(artist_ids):
+    """The artists' songs and song genres"""
+    songs = Song.objects.filter(artist_id__in=artist_ids)
+    links = SongGenre.objects.filter(song__in=songs.values('pk'))
+    return songs, links
+
+
+def _retire(artist_ids):
+    """Account for the artists and their rows as deleted
+
+    Writes the tombstones, takes their songs out of GenrePopularity and
+    drops their ArtistGenre rows. Returns the song ids and the genre ids
+    whose counts moved, for catalog_bulk_changed.
+    """
+    songs, links = _artist_rows(artist_ids)
+    song_ids = list(songs.values_list('id', flat=True))
+    genre_counts = dict(
+        links.values_list('genre_id').annotate(count=Count('id')).order_by())
+
+    Change.objects.record_deleted(links)
+    Change.objects.record_deleted(songs)
+    Change.objects.record_deleted(
+        Artist.all_objects.filter(pk__in=artist_ids))
+    GenrePopularity.objects.adjust_many(
+        {genre_id: -count for genre_id, count in genre_counts.items()})
+    _delete_rows(ArtistGenre.objects.filter(artist_id__in=artist_ids))
+    return song_ids, list(genre_counts)
+
+
+def delete_artists(artist_ids):
+    """Delete artists with their songs and genre links, set-based
+
+    Returns the number of artists deleted.
+    """
+    artist_ids = set(artist_ids)
+    with transaction.atomic():
+        song_ids, genre_ids = _retire(artist_ids)
+        songs, links = _artist_rows(artist_ids)
+        _delete_rows(links)
+        _delete_rows(songs)
+        deleted = _delete_rows(Artist.all_objects.filter(pk__in=artist_ids))
+        catalog_bulk_changed.send(
+            sender=Artist, artist_ids=artist_ids, genre_ids=genre_ids,
+            song_ids=song_ids)
+    return deleted
+
+
+def soft_delete_artist(artist_id):
+    """Retire an artist now and queue the purge of its rows
+
+    Returns whether the artist was found.
+    """
+    with transaction.atomic():
+        hidden = Artist.objects.filter(pk=artist_id).update(
+            deleted_at=timezone.now())
+        if hidden:
+            song_ids, genre_ids = _retire([artist_id])
+            catalog_bulk_changed.send(
+                sender=Artist, artist_ids=[artist_id], genre_ids=genre_ids,
+                song_ids=song_ids)
+            enqueue('artist-purge', [artist_id])
+    return bool(hidden)
+
+
+def purge_artists(artist_ids):
+    """Remove one batch of songs of each soft-deleted artist
+
+    The artists were fully accounted for when they were soft-deleted, so
+    this only removes rows. An artist whose remaining songs fit in the
+    batch is removed with them. Returns the ids of the artists that still
+    have songs, for another run.
+    """
+    artist_ids = Artist.all_objects.filter(
+        pk__in=artist_ids, deleted_at__isnull=False).values_list(
+            'pk', flat=True)
+    remaining = []
+    for artist_id in artist_ids:
+        songs, links = _artist_rows([artist_id])
+        with transaction.atomic():
+            if not songs.order_by('pk')[
+                    PURGE_BATCH_SIZE:PURGE_BATCH_SIZE + 1].exists():
+                _delete_rows(links)
+                _delete_rows(songs)
+                _delete_rows(Artist.all_objects.filter(pk=artist_id))
+                continue
+            batch = Song.objects.filter(
+                pk__in=songs.order_by('pk')[:PURGE_BATCH_SIZE].values('pk'))
+            _delete_rows(SongGenre.objects.filter(
+                song__in=batch.values('pk')))
+            _delete_rows(batch)
+        remaining.append(artist_id)
+    return remaining
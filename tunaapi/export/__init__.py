@@ -0,0 +1,2 @@
+from .catalog_export import (EXPORT_COLUMNS, EXPORT_FORMATS, catalog_rows,
+                             content_type, export_chunks, export_filename)
@@ -0,0 +1,123 @@
+"""Denormalized catalog export: one row per song with its artist and genres
+
+Rows are read in a single pass over one query: the song, its artist's
+name and its genre descriptions grouped into a JSON array, so no per-song
+or per-page lookups are made. The cursor is read in chunks and
+output is encoded chunk by chunk, optionally gzipped, so memory stays flat
+however large the catalog is.
+
+The columns match what the import_catalog command reads, so an export can
+be imported into another catalog as it is.
+"""
+import csv
+import zlib
+
+from django.db.models import Aggregate, JSONField, OuterRef, Subquery
+
+from tunaapi.models import Song, SongGenre
+from tunaapi.renderers import NDJSONRenderer
+from tunaapi.renderers.streaming import STREAM_CHUNK_SIZE
+
+EXPORT_FORMATS = ('ndjson', 'csv')
+
+EXPORT_COLUMNS = ('id', 'title', 'artist_id', 'artist', 'album', 'length',
+                  'genres')
+
+CONTENT_TYPES = {'ndjson': NDJSONRenderer.media_type, 'csv': 'text/csv'}
+
+# Between the genres of a CSV row, the import_catalog default
+CSV_GENRE_SEPARATOR = '|'
+
+
+class JSONGroupArray(Aggregate):
+    """The grouped values as a JSON array"""
+    function = 'JSON_GROUP_ARRAY'
+    output_field = JSONField()
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return super().as_sql(
+            compiler, connection, function='JSON_AGG', **extra_context)
+
+
+def catalog_rows(chunk_size=STREAM_CHUNK_SIZE):
+    """Every song as a tuple in EXPORT_COLUMNS order, by id
+
+    Genres are a list of descriptions, empty for untagged songs.
+    """
+    # A correlated subquery per song rather than grouping the joined rows,
+    # so songs are read in rowid order and the first rows stream out
+    # without sorting the whole catalog first
+    genres = (
+        SongGenre.objects.filter(song_id=OuterRef('pk'))
+        .values('song_id')
+        .annotate(genres=JSONGroupArray('genre__description'))
+        .values('genres')
+    )
+    songs = (
+        Song.objects.live()
+        .values_list('id', 'title', 'artist_id', 'artist__name', 'album',
+                     'length')
+        .annotate(genres=Subquery(genres, output_field=JSONField()))
+        .order_by('id')
+    )
+    for *song, song_genres in songs.iterator(chunk_size=chunk_size):
+        yield (*song, song_genres or [])
+
+
+def export_chunks(output_format, compress=False, chunk_size=STREAM_CHUNK_SIZE):
+    """The export encoded as `output_format`, in chunks of about chunk_size rows"""
+    encode = _ndjson_chunks if output_format == 'ndjson' else _csv_chunks
+    chunks = encode(catalog_rows(chunk_size), chunk_size)
+    return _gzip(chunks) if compress else chunks
+
+
+def export_filename(output_format, compress=False):
+    return f"catalog.{output_format}{'.gz' if compress else ''}"
+
+
+def content_type(output_format, compress=False):
+    return 'application/gzip' if compress else CONTENT_TYPES[output_format]
+
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _ndjson_chunks(rows, chunk_size):
+    renderer = NDJSONRenderer()
+    for batch in _batches(rows, chunk_size):
+        yield b''.join(renderer.render_line(dict(zip(EXPORT_COLUMNS, row)))
+                       for row in batch)
+
+
+class _Lines:
+    """Write target for csv.writer that hands each line back"""
+
+    def write(self, line):
+        return line
+
+
+def _csv_chunks(rows, chunk_size):
+    writer = csv.writer(_Lines())
+    yield writer.writerow(EXPORT_COLUMNS).encode()
+    for batch in _batches(rows, chunk_size):
+        yield ''.join(
+            writer.writerow((*row[:-1], CSV_GENRE_SEPARATOR.join(row[-1])))
+            for row in batch).encode()
+
+
+def _gzip(chunks):
+    # wbits=31 writes the gzip header and trailer around the deflate stream
+    compressor = zlib.compressobj(wbits=31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
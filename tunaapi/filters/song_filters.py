@@ -1,5 +1,11 @@
 import django_filters
+from django import forms
 from tunaapi.models import Song
+from tunaapi.search import genre_index
+
+
+class IntegerInFilter(django_filters.BaseInFilter, django_filters.NumberFilter):
+    field_class = forms.IntegerField
 
 
 class SongFilter(django_filters.FilterSet):
@@ -9,7 +15,14 @@ class SongFilter(django_filters.FilterSet):
         field_name='length', lookup_expr='gte')
     max_length = django_filters.NumberFilter(
         field_name='length', lookup_expr='lte')
+    # Comma-separated genre ids: songs in every genre listed
+    genre = IntegerInFilter(method='filter_genres')
+    # Comma-separated genre ids: songs in at least one genre listed
+    genre_any = IntegerInFilter(method='filter_genres')
 
     class Meta:
         model = Song
-        fields = ['title', 'album', 'min_length', 'max_length']
+        fields = ['title', 'album', 'min_length', 'max_length', 'genre', 'genre_any']
+
+    def filter_genres(self, queryset, name, value):
+        return genre_index.filter(queryset, value, match_all=name == 'genre')
@@ -0,0 +1,2 @@
+from .handlers import JOB_HANDLERS
+from .worker import Worker, drain, enqueue, retry_failed, start_worker, wake
@@ -0,0 +1,58 @@
+"""Recompute handlers run by the job worker, by job kind
+
+Each handler is given the ids its job collected and runs inside the job's
+transaction, so a failing recompute leaves the derived data as it was.
+"""
+from django.db import transaction
+
+from tunaapi.caching import invalidate
+from tunaapi.models import ArtistGenre, GenrePopularity, Job
+from tunaapi.search import artist_similarity
+
+
+def rebuild_artist_genres(artist_ids):
+    """Recount the artists' genres, then refresh what is derived from them"""
+    # Imported here, the signals package imports the jobs package
+    from tunaapi.signals.response_cache import COALESCED_ENDPOINTS
+
+    ArtistGenre.objects.rebuild(artist_ids)
+
+    # Anything read between the write and this rebuild used the old counts
+    def invalidate_artists():
+        invalidate('artist', artist_ids)
+        invalidate('artist-stats', artist_ids)
+        invalidate('coalesced', COALESCED_ENDPOINTS)
+    transaction.on_commit(invalidate_artists)
+    artist_similarity.record(artist_ids=artist_ids)
+    Job.objects.enqueue('artist-stats', artist_ids)
+
+
+def repair_genre_popularity(genre_ids):
+    from tunaapi.signals.response_cache import COALESCED_ENDPOINTS
+
+    GenrePopularity.objects.repair(genre_ids)
+    transaction.on_commit(
+        lambda: invalidate('coalesced', COALESCED_ENDPOINTS))
+
+
+def warm_artist_stats(artist_ids):
+    """Compute the artists' stats into the cache before they are asked for"""
+    from tunaapi.views.artist import artist_stats
+
+    artist_stats(artist_ids)
+
+
+def purge_artists(artist_ids):
+    """Purge soft-deleted artists one batch of songs per run"""
+    # Imported here, the deletion package imports the jobs package
+    from tunaapi.deletion import purge_artists as purge_batch
+
+    Job.objects.enqueue('artist-purge', purge_batch(artist_ids))
+
+
+JOB_HANDLERS = {
+    'artist-genres': rebuild_artist_genres,
+    'genre-popularity': repair_genre_popularity,
+    'artist-stats': warm_artist_stats,
+    'artist-purge': purge_artists,
+}
@@ -0,0 +1,209 @@
+"""Background worker for the recompute job queue
+
+Jobs live in the Job table, so queued work survives a restart. A worker
+claims the oldest due job, runs its handler and deletes the job in the
+same transaction. A failing job is retried after an exponential backoff
+and marked failed once it has used MAX_ATTEMPTS; `manage.py jobs retry`
+queues failed jobs again.
+
+`Worker` is a pool of threads inside the web process, started by
+`start_worker` when settings.JOB_WORKERS is above zero. `drain` runs the
+due jobs in the calling thread, for the management command and tests.
+"""
+import logging
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, connection, transaction
+from django.utils import timezone
+
+from tunaapi.metrics import registry
+from tunaapi.models import Job
+from .handlers import JOB_HANDLERS
+
+logger = logging.getLogger('tunaapi.jobs')
+
+MAX_ATTEMPTS = 5
+# Seconds before the first retry, doubled after every further failure
+RETRY_BACKOFF = 2
+# A running job not finished by then is taken to have lost its worker
+STALE_AFTER = timedelta(minutes=10)
+POLL_INTERVAL = 1.0
+
+jobs_run = registry.counter(
+    'tunaapi_jobs_total',
+    'Recompute jobs run, by kind and whether they were done, retried or '
+    'failed for good', ('kind', 'outcome'))
+
+# Set after a commit that queued jobs, so idle workers need not wait for
+# their next poll
+_wakeup = threading.Event()
+
+
+def wake():
+    _wakeup.set()
+
+
+def enqueue(kind, ids):
+    """Queue a job and wake this process's workers once it is committed"""
+    if Job.objects.enqueue(kind, ids) is not None:
+        transaction.on_commit(wake)
+
+
+def claim(kinds=None):
+    """Mark the oldest due queued job running and return it, or None
+
+    With `kinds`, only jobs of those kinds are claimed.
+    """
+    with transaction.atomic():
+        jobs = Job.objects.select_for_update().filter(
+            status=Job.QUEUED, run_after__lte=timezone.now())
+        if kinds is not None:
+            jobs = jobs.filter(kind__in=kinds)
+        job = jobs.order_by('run_after', 'id').first()
+        if job is None:
+            return None
+        job.status = Job.RUNNING
+        job.attempts += 1
+        job.save(update_fields=['status', 'attempts', 'updated'])
+    return job
+
+
+def run(job):
+    """Run a claimed job, returns whether it succeeded"""
+    try:
+        handler = JOB_HANDLERS.get(job.kind)
+        if handler is None:
+            raise LookupError(f'No handler for job kind {job.kind!r}')
+        with transaction.atomic():
+            handler(job.ids)
+            Job.objects.filter(pk=job.pk).delete()
+    except Exception:  # pylint: disable=broad-except
+        logger.exception('Job %s (%s) failed', job.pk, job.kind)
+        fail(job, traceback.format_exc())
+        return False
+    jobs_run.inc(kind=job.kind, outcome='done')
+    return True
+
+
+def fail(job, error):
+    """Queue a failed job again after its backoff, or give up on it"""
+    now = timezone.now()
+    with transaction.atomic():
+        if job.attempts >= MAX_ATTEMPTS:
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.FAILED, last_error=error, updated=now)
+            jobs_run.inc(kind=job.kind, outcome='failed')
+            return
+
+        run_after = now + timedelta(
+            seconds=RETRY_BACKOFF * 2 ** (job.attempts - 1))
+        queued = Job.objects.filter(kind=job.kind, status=Job.QUEUED).first()
+        if queued is None:
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.QUEUED, run_after=run_after, last_error=error,
+                updated=now)
+        else:
+            # Writes queued this kind again meanwhile, only one can wait
+            queued.ids = sorted(set(queued.ids).union(job.ids))
+            queued.attempts = max(queued.attempts, job.attempts)
+            queued.run_after = max(queued.run_after, run_after)
+            queued.last_error = error
+            queued.save()
+            Job.objects.filter(pk=job.pk).delete()
+    jobs_run.inc(kind=job.kind, outcome='retried')
+
+
+def requeue_stale():
+    """Retry the running jobs whose worker stopped before finishing them"""
+    stale = Job.objects.filter(
+        status=Job.RUNNING, updated__lt=timezone.now() - STALE_AFTER)
+    for job in stale:
+        fail(job, 'The worker stopped while running the job')
+
+
+def retry_failed():
+    """Queue the failed jobs again with fresh attempts, returns how many"""
+    failed = list(Job.objects.filter(status=Job.FAILED))
+    with transaction.atomic():
+        for job in failed:
+            Job.objects.enqueue(job.kind, job.ids)
+        Job.objects.filter(pk__in=[job.pk for job in failed]).delete()
+    return len(failed)
+
+
+def drain(kinds=None):
+    """Run due jobs in this thread until none is left
+
+    With `kinds`, only jobs of those kinds are run and the rest are left
+    to the worker. Retried jobs wait out their backoff, so they are not run
+    again here. Returns (succeeded, failed) counts.
+    """
+    requeue_stale()
+    succeeded = failed = 0
+    while (job := claim(kinds)) is not None:
+        if run(job):
+            succeeded += 1
+        else:
+            failed += 1
+    return succeeded, failed
+
+
+class Worker:
+    """A pool of threads running due jobs as they are queued"""
+
+    def __init__(self, threads=1, poll_interval=POLL_INTERVAL):
+        self.threads = threads
+        self.poll_interval = poll_interval
+        self.stopping = threading.Event()
+        self.pool = []
+
+    def start(self):
+        requeue_stale()
+        self.stopping.clear()
+        self.pool = [
+            threading.Thread(target=self.loop, name=f'tunaapi-jobs-{number}',
+                             daemon=True)
+            for number in range(self.threads)]
+        for thread in self.pool:
+            thread.start()
+
+    def stop(self, timeout=None):
+        self.stopping.set()
+        wake()
+        for thread in self.pool:
+            thread.join(timeout)
+
+    def loop(self):
+        try:
+            while not self.stopping.is_set():
+                close_old_connections()
+                try:
+                    job = claim()
+                except DatabaseError:
+                    logger.exception('Could not claim a job')
+                    job = None
+                if job is None:
+                    _wakeup.wait(self.poll_interval)
+                    _wakeup.clear()
+                else:
+                    run(job)
+        finally:
+            connection.close()
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def start_worker():
+    """Start this process's worker pool once, if settings.JOB_WORKERS > 0"""
+    global _worker  # pylint: disable=global-statement
+    threads = getattr(settings, 'JOB_WORKERS', 0)
+    with _worker_lock:
+        if threads and _worker is None:
+            _worker = Worker(threads)
+            _worker.start()
+    return _worker
@@ -0,0 +1,142 @@
+import asyncio
+import io
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from asgiref.sync import async_to_sync
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.urls import Resolver404, resolve
+
+from tunaapi.management.endpoints import router_endpoints
+
+
+class Command(BaseCommand):
+    help = ('Compare the throughput of the sync (WSGI) read endpoints with '
+            'their async (ASGI) counterparts under concurrent load')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Requests per endpoint and server mode')
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument(
+            '--host', default='localhost',
+            help='Host header to send, must be allowed by ALLOWED_HOSTS')
+        parser.add_argument(
+            '--skip-full-lists', action='store_true',
+            help='Only benchmark the paginated variant of list endpoints')
+        parser.add_argument('--output', help='Write the JSON report here')
+
+    def handle(self, *args, **options):
+        self.host = options['host']
+        self.wsgi_application = WSGIHandler()
+        self.asgi_application = ASGIHandler()
+        results = []
+        for name, url in router_endpoints():
+            if options['skip_full_lists'] and name.endswith('-list'):
+                continue
+            async_url = f'/async{url}'
+            try:
+                resolve(async_url.split('?')[0])
+            except Resolver404:
+                continue
+
+            wsgi = self.measure_wsgi(url, options['requests'], options['concurrency'])
+            asgi = async_to_sync(self.measure_asgi)(
+                async_url, options['requests'], options['concurrency'])
+            results.append({
+                'name': name,
+                'url': url,
+                'wsgi': wsgi,
+                'asgi': asgi,
+                'asgi_speedup': round(asgi['requests_per_second']
+                                      / wsgi['requests_per_second'], 3),
+            })
+
+        report = json.dumps({'concurrency': options['concurrency'],
+                             'endpoints': results}, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                output.write(report)
+        else:
+            self.stdout.write(report)
+
+    def measure_wsgi(self, url, requests, concurrency):
+        """Serve the requests from a pool of threads, as a threaded WSGI server would"""
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            statuses = list(executor.map(lambda _: self.wsgi_get(url), range(requests)))
+        return self.summarize(statuses, time.perf_counter() - started)
+
+    async def measure_asgi(self, url, requests, concurrency):
+        """Serve the requests as concurrent tasks on one event loop"""
+        slots = asyncio.Semaphore(concurrency)
+
+        async def fetch():
+            async with slots:
+                return await self.asgi_get(url)
+
+        started = time.perf_counter()
+        statuses = await asyncio.gather(*(fetch() for _ in range(requests)))
+        return self.summarize(statuses, time.perf_counter() - started)
+
+    def wsgi_get(self, url):
+        """Call the WSGI application directly and drain the response"""
+        parts = urlsplit(url)
+        environ = {
+            'REQUEST_METHOD': 'GET',
+            'PATH_INFO': parts.path,
+            'QUERY_STRING': parts.query,
+            'SERVER_NAME': self.host,
+            'SERVER_PORT': '80',
+            'HTTP_HOST': self.host,
+            'wsgi.url_scheme': 'http',
+            'wsgi.input': io.BytesIO(),
+            'wsgi.errors': io.StringIO(),
+        }
+        status = []
+        body = self.wsgi_application(
+            environ, lambda status_line, headers: status.append(status_line))
+        try:
+            for _ in body:
+                pass
+        finally:
+            body.close()
+        return int(status[0].split()[0])
+
+    async def asgi_get(self, url):
+        """Call the ASGI application directly and drain the response"""
+        parts = urlsplit(url)
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': parts.path,
+            'query_string': parts.query.encode(),
+            'headers': [(b'host', self.host.encode())],
+            'client': ('127.0.0.1', 0),
+            'server': (self.host, 80),
+        }
+        status = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                status.append(message['status'])
+
+        await self.asgi_application(scope, receive, send)
+        return status[0]
+
+    def summarize(self, statuses, elapsed):
+        return {
+            'requests_per_second': round(len(statuses) / elapsed, 1),
+            'seconds': round(elapsed, 3),
+            'errors': sum(1 for status_code in statuses if status_code >= 400),
+        }
@@ -0,0 +1,105 @@
+import json
+import statistics
+import time
+import tracemalloc
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+
+from tunaapi.management.endpoints import router_endpoints
+
+
+class QueryCounter:
+    """Database execute wrapper counting the statements it sees
+
+    Used instead of connection.queries, which is reset at the start of
+    every request and only filled in with DEBUG on.
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = ('Time every GET endpoint on the router and report latency, '
+            'query count and peak memory as JSON')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument(
+            '--host', default='localhost',
+            help='Host header to send, must be allowed by ALLOWED_HOSTS')
+        parser.add_argument(
+            '--skip-full-lists', action='store_true',
+            help='Only benchmark the paginated variant of list endpoints')
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Clear the response cache before every request')
+        parser.add_argument('--output', help='Write the JSON report here')
+
+    def handle(self, *args, **options):
+        client = Client(HTTP_HOST=options['host'])
+        self.cold = options['cold']
+        results = []
+        for name, url in router_endpoints():
+            if options['skip_full_lists'] and name.endswith('-list'):
+                continue
+            results.append(self.measure(client, name, url, options))
+
+        report = json.dumps({'endpoints': results}, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                output.write(report)
+        else:
+            self.stdout.write(report)
+
+    def measure(self, client, name, url, options):
+        for _ in range(options['warmup']):
+            self.fetch(client, url)
+
+        timings = []
+        for _ in range(options['repeat']):
+            started = time.perf_counter()
+            status_code, size = self.fetch(client, url)
+            timings.append((time.perf_counter() - started) * 1000)
+
+        # Query count and memory come from one extra run each, tracemalloc
+        # slows allocation down too much to time alongside it
+        queries = QueryCounter()
+        with connection.execute_wrapper(queries):
+            self.fetch(client, url)
+        tracemalloc.start()
+        try:
+            self.fetch(client, url)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        timings.sort()
+        return {
+            'name': name,
+            'url': url,
+            'status': status_code,
+            'bytes': size,
+            'p50_ms': round(statistics.median(timings), 3),
+            'p95_ms': round(timings[max(0, round(len(timings) * 0.95) - 1)], 3),
+            'queries': queries.count,
+            'peak_memory_bytes': peak,
+        }
+
+    def fetch(self, client, url):
+        if self.cold:
+            cache.clear()
+        response = client.get(url)
+        if response.streaming:
+            size = sum(len(chunk) for chunk in response.streaming_content)
+        else:
+            size = len(response.content)
+        return response.status_code, size
@@ -0,0 +1,126 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+
+from tunaapi.management.endpoints import router_endpoints
+
+
+# Responses are never served from cache, so every request runs its SQL.
+# Without a shared cache the in-memory indexes keep what they loaded on the
+# warm-up request instead of reloading.
+NO_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+
+class StatementRecorder:
+    """Database execute wrapper keeping the SELECT statements it sees"""
+
+    def __init__(self):
+        self.statements = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if not many and sql.lstrip().upper().startswith('SELECT'):
+            self.statements.append((sql, params))
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = ("Run EXPLAIN QUERY PLAN on the SQL of every GET endpoint and "
+            "flag full table scans and unindexed sorts")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--host', default='localhost',
+            help='Host header to send, must be allowed by ALLOWED_HOSTS')
+        parser.add_argument(
+            '--skip-full-lists', action='store_true',
+            help='Only check the paginated variant of list endpoints')
+        parser.add_argument('--json', action='store_true',
+                            help='Print the report as JSON')
+        parser.add_argument(
+            '--fail-on-scan', action='store_true',
+            help='Exit with an error if any statement is flagged')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('EXPLAIN QUERY PLAN needs the SQLite backend')
+
+        client = Client(HTTP_HOST=options['host'])
+        report = []
+        with override_settings(CACHES=NO_CACHE):
+            for name, url in router_endpoints():
+                if options['skip_full_lists'] and name.endswith('-list'):
+                    continue
+                report.append({'name': name, 'url': url,
+                               'statements': self.explain_endpoint(client, url)})
+
+        flagged = [
+            (endpoint, statement) for endpoint in report
+            for statement in endpoint['statements'] if statement['flags']
+        ]
+        if options['json']:
+            self.stdout.write(json.dumps({'endpoints': report}, indent=2))
+        else:
+            self.write_text(report)
+
+        if flagged:
+            message = f'{len(flagged)} statements need an index'
+            if options['fail_on_scan']:
+                raise CommandError(message)
+            self.stderr.write(self.style.WARNING(message))
+
+    def explain_endpoint(self, client, url):
+        # Plans are for the steady state, after one-off loads on first use
+        self.fetch(client, url)
+        recorder = StatementRecorder()
+        with connection.execute_wrapper(recorder):
+            self.fetch(client, url)
+
+        statements = []
+        for sql, params in recorder.statements:
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+                plan = [row[3] for row in cursor.fetchall()]
+            statements.append(
+                {'sql': sql, 'plan': plan, 'flags': flag_plan(sql, plan)})
+        return statements
+
+    def fetch(self, client, url):
+        response = client.get(url)
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+
+    def write_text(self, report):
+        for endpoint in report:
+            self.stdout.write(f"{endpoint['name']} {endpoint['url']}")
+            for statement in endpoint['statements']:
+                marker = 'FLAG' if statement['flags'] else 'ok  '
+                self.stdout.write(f"  {marker} {statement['sql']}")
+                for step in statement['plan']:
+                    self.stdout.write(f'         {step}')
+                for flag in statement['flags']:
+                    self.stdout.write(self.style.WARNING(f'       ! {flag}'))
+
+
+def flag_plan(sql, plan):
+    """Problems in a query plan worth an index
+
+    A SCAN step without an index reads the whole table; it is only accepted
+    when the statement has a LIMIT and no temporary sort, as in a first
+    keyset page that stops after page_size rows. A temporary B-tree means
+    the result is sorted after the fact instead of read in index order,
+    except for COUNT(DISTINCT), which SQLite always dedupes in one per group.
+    """
+    bounded = ' LIMIT ' in sql.upper()
+    flags = []
+    for step in plan:
+        if step.startswith('SCAN ') and ' USING ' not in step:
+            table = step.split()[1]
+            if not bounded or any('TEMP B-TREE' in other for other in plan):
+                flags.append(f'Full scan of {table}')
+        elif 'TEMP B-TREE' in step and 'COUNT(DISTINCT)' not in step.upper():
+            flags.append(step.title())
+    return flags
@@ -0,0 +1,54 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tunaapi.export import EXPORT_FORMATS, export_chunks
+
+
+class Command(BaseCommand):
+    help = ('Export every song with its artist and genres as NDJSON or CSV, '
+            'optionally gzipped, in a format import_catalog reads back')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default='-',
+            help='File to write (default: standard output)')
+        parser.add_argument(
+            '--format', choices=EXPORT_FORMATS,
+            help='Output format (default: from the file extension, or ndjson)')
+        parser.add_argument(
+            '--gzip', action='store_true',
+            help='Gzip the output (implied by a .gz file extension)')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        compress = options['gzip'] or path.endswith('.gz')
+        output_format = options['format'] or guess_format(path)
+
+        started = time.perf_counter()
+        written = 0
+        if path == '-':
+            target = sys.stdout.buffer
+        else:
+            try:
+                target = open(path, 'wb')
+            except OSError as error:
+                raise CommandError(f'Cannot write {path}: {error}') from error
+        try:
+            for chunk in export_chunks(output_format, compress):
+                target.write(chunk)
+                written += len(chunk)
+        finally:
+            if target is not sys.stdout.buffer:
+                target.close()
+
+        if path != '-':
+            self.stdout.write(self.style.SUCCESS(
+                f'Exported {written} bytes of {output_format} to {path} in '
+                f'{time.perf_counter() - started:.1f}s'))
+
+
+def guess_format(path):
+    name = path[:-3] if path.endswith('.gz') else path
+    return 'csv' if name.endswith('.csv') else 'ndjson'
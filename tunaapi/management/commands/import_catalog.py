@@ -0,0 +1,277 @@
+import csv
+import gzip
+import hashlib
+import json
+import os
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from tunaapi.jobs import drain
+from tunaapi.models import (Artist, Change, Genre, ImportCheckpoint, Song,
+                            SongGenre)
+from tunaapi.signals import catalog_bulk_changed
+
+FORMATS = ('csv', 'ndjson')
+
+# Bytes hashed to tell a changed source file from the one a checkpoint is for
+FINGERPRINT_BYTES = 1 << 20
+
+# Invalid rows reported individually before only counting them
+MAX_REPORTED_ERRORS = 10
+
+# Recomputes queued by catalog_bulk_changed, and the stats warm-up the
+# ArtistGenre recount queues in turn
+IMPORT_JOB_KINDS = ('artist-genres', 'genre-popularity', 'artist-stats')
+
+
+class RowError(ValueError):
+    pass
+
+
+class Command(BaseCommand):
+    help = ('Import songs with their artists and genres from a CSV or NDJSON '
+            'file, resuming an interrupted import where it stopped')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', help='CSV or NDJSON file, optionally gzipped. Each row '
+            'has title, artist, album, length and genres, and optionally '
+            'artist_age and artist_bio for artists not yet in the catalog')
+        parser.add_argument(
+            '--format', choices=FORMATS,
+            help='Input format (default: from the file extension)')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--genre-separator', default='|',
+            help='Separator between the genres of a CSV row')
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='Ignore any checkpoint and import the whole file again')
+
+    def handle(self, *args, **options):
+        path = os.path.abspath(options['path'])
+        if not os.path.isfile(path):
+            raise CommandError(f'No such file: {path}')
+        if options['batch_size'] < 1:
+            raise CommandError('Batch size must be at least 1')
+        self.format = options['format'] or guess_format(path)
+        self.separator = options['genre_separator']
+        self.batch_size = options['batch_size']
+
+        checkpoint = self.checkpoint(path, options['restart'])
+        if checkpoint.completed:
+            self.stdout.write(self.style.SUCCESS(
+                f'{path} was already imported, pass --restart to import '
+                'it again'))
+            return
+
+        # Name to id maps, so rows never look their artist or genre up
+        # one at a time. Duplicate names resolve to the oldest row
+        self.artists = dict(
+            Artist.objects.order_by('-id').values_list('name', 'id'))
+        self.genres = dict(
+            Genre.objects.order_by('-id').values_list('description', 'id'))
+        self.touched_artists = set(checkpoint.artist_ids)
+        self.touched_genres = set(checkpoint.genre_ids)
+        self.new_artists = self.new_genres = self.imported = self.rejected = 0
+
+        resumed_after = checkpoint.rows_done
+        started = time.perf_counter()
+        with open_source(path) as source:
+            rows = self.read(source, resumed_after)
+            while True:
+                chunk = list(islice(rows, self.batch_size))
+                if not chunk:
+                    break
+                self.import_chunk(checkpoint, chunk)
+                if options['verbosity'] > 1:
+                    self.report_progress(checkpoint, resumed_after, started)
+
+        # bulk_create skips model signals, so refresh the derived counters
+        # and indexes of everything this import touched, including chunks
+        # committed by an earlier interrupted run
+        with transaction.atomic():
+            catalog_bulk_changed.send(
+                sender=Song, artist_ids=self.touched_artists,
+                genre_ids=self.touched_genres, song_ids=())
+            checkpoint.completed = True
+            checkpoint.save(update_fields=['completed', 'updated'])
+        # The recounts are queued as jobs; an import is off the request path
+        # already, so run them now rather than wait for a worker. Jobs merge
+        # per kind, so these also carry any ids other writes queued in the
+        # meantime; other kinds, like artist purges, are left to the worker
+        drain(IMPORT_JOB_KINDS)
+
+        elapsed = time.perf_counter() - started
+        processed = checkpoint.rows_done - resumed_after
+        resumed = f', resumed after row {resumed_after}' if resumed_after else ''
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {self.imported} songs ({self.new_artists} new artists, '
+            f'{self.new_genres} new genres, {self.rejected} rows rejected) in '
+            f'{elapsed:.1f}s, {processed / max(elapsed, 1e-9):.0f} rows/s'
+            f'{resumed}'))
+
+    def checkpoint(self, path, restart):
+        fingerprint = file_fingerprint(path)
+        checkpoint, _ = ImportCheckpoint.objects.get_or_create(
+            source=path, defaults={'fingerprint': fingerprint})
+        if restart or (checkpoint.completed and
+                       checkpoint.fingerprint != fingerprint):
+            checkpoint.fingerprint = fingerprint
+            checkpoint.rows_done = 0
+            checkpoint.artist_ids = []
+            checkpoint.genre_ids = []
+            checkpoint.completed = False
+            checkpoint.save()
+        elif checkpoint.fingerprint != fingerprint:
+            raise CommandError(
+                f'{path} changed since its import was interrupted after row '
+                f'{checkpoint.rows_done}, pass --restart to import it again')
+        return checkpoint
+
+    def read(self, source, skip):
+        """Numbered rows of the source as dicts, after the first `skip`
+
+        Rows are numbered from 1. Skipped NDJSON lines are not decoded;
+        skipped CSV rows still go through the CSV reader, since a quoted
+        field may span lines, but are not cleaned or imported. Invalid rows
+        are yielded as RowError so they still count towards the checkpoint
+        position.
+        """
+        if self.format == 'csv':
+            records = csv.DictReader(source)
+        else:
+            records = (line for line in source if line.strip())
+        records = islice(records, skip, None)
+        for number, record in enumerate(records, skip + 1):
+            try:
+                if self.format == 'ndjson':
+                    try:
+                        record = json.loads(record)
+                    except ValueError as error:
+                        raise RowError(f'invalid JSON ({error})') from error
+                yield number, self.clean(record)
+            except RowError as error:
+                yield number, error
+
+    def clean(self, record):
+        if not isinstance(record, dict):
+            raise RowError('expected an object')
+        row = {}
+        for field in ('title', 'artist', 'album'):
+            value = record.get(field)
+            if not isinstance(value, str) or not value.strip():
+                raise RowError(f'{field} is required')
+            row[field] = value.strip()[:200]
+        try:
+            row['length'] = int(record.get('length'))
+            row['artist_age'] = int(record.get('artist_age') or 0)
+        except (TypeError, ValueError) as error:
+            raise RowError(
+                'length and artist_age must be integers') from error
+        if row['length'] < 0:
+            raise RowError('length must not be negative')
+        row['artist_bio'] = str(record.get('artist_bio') or '')
+
+        genres = record.get('genres') or []
+        if isinstance(genres, str):
+            genres = genres.split(self.separator)
+        if not isinstance(genres, list):
+            raise RowError('genres must be a list or a separated string')
+        row['genres'] = list(dict.fromkeys(
+            str(genre).strip() for genre in genres if str(genre).strip()))
+        return row
+
+    def import_chunk(self, checkpoint, chunk):
+        """Write one chunk and move the checkpoint past it, all or nothing"""
+        valid = []
+        for number, row in chunk:
+            if isinstance(row, RowError):
+                self.reject(number, row)
+            else:
+                valid.append(row)
+
+        with transaction.atomic():
+            self.create_missing(valid)
+            songs = Song.objects.bulk_create([
+                Song(title=row['title'], artist_id=self.artists[row['artist']],
+                     album=row['album'], length=row['length'])
+                for row in valid])
+            song_genres = SongGenre.objects.bulk_create([
+                SongGenre(song_id=song.pk, genre_id=self.genres[genre])
+                for song, row in zip(songs, valid) for genre in row['genres']])
+            Change.objects.record(Change.CREATED, songs)
+            Change.objects.record(Change.CREATED, song_genres)
+
+            self.touched_artists.update(
+                self.artists[row['artist']] for row in valid)
+            self.touched_genres.update(
+                self.genres[genre] for row in valid for genre in row['genres'])
+            checkpoint.rows_done = chunk[-1][0]
+            checkpoint.artist_ids = sorted(self.touched_artists)
+            checkpoint.genre_ids = sorted(self.touched_genres)
+            checkpoint.save(update_fields=[
+                'rows_done', 'artist_ids', 'genre_ids', 'updated'])
+        self.imported += len(songs)
+
+    def create_missing(self, rows):
+        """Create the chunk's unknown artists and genres and map their ids"""
+        artists = {}
+        genres = {}
+        for row in rows:
+            if row['artist'] not in self.artists:
+                artists.setdefault(row['artist'], Artist(
+                    name=row['artist'], age=row['artist_age'],
+                    bio=row['artist_bio']))
+            for genre in row['genres']:
+                if genre not in self.genres:
+                    genres.setdefault(genre, Genre(description=genre))
+
+        for artist in Artist.objects.bulk_create(artists.values()):
+            self.artists[artist.name] = artist.pk
+        for genre in Genre.objects.bulk_create(genres.values()):
+            self.genres[genre.description] = genre.pk
+        Change.objects.record(Change.CREATED, artists.values())
+        Change.objects.record(Change.CREATED, genres.values())
+        self.new_artists += len(artists)
+        self.new_genres += len(genres)
+
+    def reject(self, number, error):
+        self.rejected += 1
+        if self.rejected <= MAX_REPORTED_ERRORS:
+            self.stderr.write(f'Row {number}: {error}')
+        elif self.rejected == MAX_REPORTED_ERRORS + 1:
+            self.stderr.write('Further rejected rows are only counted')
+
+    def report_progress(self, checkpoint, resumed_after, started):
+        elapsed = time.perf_counter() - started
+        processed = checkpoint.rows_done - resumed_after
+        self.stdout.write(
+            f'{checkpoint.rows_done} rows, '
+            f'{processed / max(elapsed, 1e-9):.0f} rows/s')
+
+
+def guess_format(path):
+    name = path[:-3] if path.endswith('.gz') else path
+    if name.endswith('.csv'):
+        return 'csv'
+    if name.endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    raise CommandError(f'Cannot tell the format of {path}, pass --format')
+
+
+def open_source(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, encoding='utf-8', newline='')
+
+
+def file_fingerprint(path):
+    """Size plus a hash of the first megabyte, cheap even for huge files"""
+    with open(path, 'rb') as source:
+        head = source.read(FINGERPRINT_BYTES)
+    digest = hashlib.sha1(head).hexdigest()
+    return f'{os.path.getsize(path)}:{digest}'
@@ -0,0 +1,71 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, Min
+
+from tunaapi.jobs import Worker, drain, retry_failed
+from tunaapi.models import Job
+
+ACTIONS = ('inspect', 'drain', 'retry', 'work')
+
+
+class Command(BaseCommand):
+    help = ('Inspect the background recompute job queue, run its due jobs, '
+            'queue failed jobs again or run a worker pool in the foreground')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'action', nargs='?', choices=ACTIONS, default='inspect',
+            help='inspect (default) lists the queue, drain runs the due '
+            'jobs and exits, retry queues failed jobs again, work runs '
+            'jobs as they are queued until interrupted')
+        parser.add_argument(
+            '--threads', type=int, default=1,
+            help='Worker threads for work (default: 1)')
+
+    def handle(self, *args, **options):
+        getattr(self, options['action'])(options)
+
+    def inspect(self, options):
+        groups = (
+            Job.objects.values('status', 'kind')
+            .annotate(jobs=Count('id'), next_run=Min('run_after'))
+            .order_by('status', 'kind')
+        )
+        if not groups:
+            self.stdout.write('The job queue is empty')
+            return
+        for group in groups:
+            self.stdout.write(
+                f"{group['status']:<8} {group['kind']:<17} {group['jobs']} "
+                f"job(s), next run after {group['next_run']:%Y-%m-%d %H:%M:%S}")
+        for job in Job.objects.filter(status=Job.FAILED).order_by('id'):
+            error = job.last_error.strip().splitlines()[-1:] or ['']
+            self.stdout.write(
+                f'Failed job {job.pk} ({job.kind}, {len(job.ids)} ids, '
+                f'{job.attempts} attempts): {error[0]}')
+
+    def drain(self, options):
+        started = time.perf_counter()
+        succeeded, failed = drain()
+        self.stdout.write(self.style.SUCCESS(
+            f'Ran {succeeded + failed} jobs ({failed} failed) in '
+            f'{time.perf_counter() - started:.1f}s'))
+
+    def retry(self, options):
+        self.stdout.write(self.style.SUCCESS(
+            f'Queued {retry_failed()} failed jobs again'))
+
+    def work(self, options):
+        if options['threads'] < 1:
+            raise CommandError('Threads must be at least 1')
+        worker = Worker(options['threads'])
+        worker.start()
+        self.stdout.write(
+            f"Running jobs with {options['threads']} thread(s), "
+            'CONTROL-C to stop')
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            worker.stop()
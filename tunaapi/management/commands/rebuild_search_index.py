@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from tunaapi.search import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the song full-text search index and its sync triggers'
+
+    def handle(self, *args, **options):
+        count = rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} songs'))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from tunaapi.models import GenrePopularity
+
+
+class Command(BaseCommand):
+    help = 'Recount songs per genre and fix drifted popularity counters'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'genre_ids', nargs='*', type=int,
+            help='Only check these genres (default: all genres)')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            drift = GenrePopularity.objects.repair(options['genre_ids'] or None)
+        for genre_id, stored, actual in drift:
+            self.stdout.write(
+                f'Genre {genre_id}: stored {stored}, actual {actual}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Repaired {len(drift)} genre counters'))
@@ -0,0 +1,106 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from faker import Faker
+
+from tunaapi.models import Artist, ArtistGenre, Genre, GenrePopularity, Song, SongGenre
+from tunaapi.search import song_index
+
+
+class Command(BaseCommand):
+    help = 'Seed the catalog with generated artists, genres, songs and links'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--artists', type=int, default=1000)
+        parser.add_argument('--genres', type=int, default=50)
+        parser.add_argument('--songs', type=int, default=100000)
+        parser.add_argument(
+            '--links', type=int, default=300000,
+            help='Number of song-genre links, spread evenly over the songs')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        if min(options['artists'], options['genres'], options['songs']) < 1:
+            raise CommandError('Need at least one artist, genre and song')
+        if options['links'] > options['songs'] * options['genres']:
+            raise CommandError('More links requested than song/genre pairs')
+
+        self.random = random.Random(options['seed'])
+        self.faker = Faker()
+        self.faker.seed_instance(options['seed'])
+        self.batch_size = options['batch_size']
+        # Song titles and albums are drawn from a small vocabulary, calling
+        # Faker for every one of millions of rows would dominate the run
+        self.words = self.faker.words(nb=2000)
+
+        started = time.perf_counter()
+        # Refill the search index in one pass at the end instead of firing
+        # its triggers for every inserted song
+        song_index.uninstall()
+        try:
+            artist_ids = self.create_artists(options['artists'])
+            genre_ids = self.create_genres(options['genres'])
+            song_ids = self.create_songs(options['songs'], artist_ids)
+            self.create_links(options['links'], song_ids, genre_ids)
+        finally:
+            song_index.install()
+
+        # bulk_create skips model signals, so rebuild the derived tables
+        ArtistGenre.objects.rebuild()
+        GenrePopularity.objects.repair()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {len(artist_ids)} artists, {len(genre_ids)} genres, "
+            f"{len(song_ids)} songs and {options['links']} links in "
+            f"{time.perf_counter() - started:.1f}s"))
+
+    def insert(self, model, rows):
+        """bulk_create generated rows batch by batch and return their ids"""
+        ids = []
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == self.batch_size:
+                ids.extend(self.flush(model, batch))
+                batch = []
+        if batch:
+            ids.extend(self.flush(model, batch))
+        return ids
+
+    def flush(self, model, batch):
+        with transaction.atomic():
+            created = model.objects.bulk_create(batch)
+        return [instance.pk for instance in created]
+
+    def phrase(self, low, high):
+        return ' '.join(
+            self.random.choices(self.words, k=self.random.randint(low, high))
+        ).capitalize()
+
+    def create_artists(self, count):
+        return self.insert(Artist, (
+            Artist(name=self.faker.name(), age=self.random.randint(18, 100),
+                   bio=self.faker.sentence())
+            for _ in range(count)))
+
+    def create_genres(self, count):
+        return self.insert(Genre, (
+            Genre(description=self.phrase(1, 3)) for _ in range(count)))
+
+    def create_songs(self, count, artist_ids):
+        return self.insert(Song, (
+            Song(title=self.phrase(1, 5), artist_id=self.random.choice(artist_ids),
+                 album=self.phrase(1, 3), length=self.random.randint(15, 600))
+            for _ in range(count)))
+
+    def create_links(self, count, song_ids, genre_ids):
+        def links():
+            per_song, extra = divmod(count, len(song_ids))
+            for position, song_id in enumerate(song_ids):
+                genres = per_song + (1 if position < extra else 0)
+                for genre_id in self.random.sample(genre_ids, genres):
+                    yield SongGenre(song_id=song_id, genre_id=genre_id)
+        return self.insert(SongGenre, links())
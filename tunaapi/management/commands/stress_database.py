@@ -0,0 +1,170 @@
+import json
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from tunaapi.db.sqlite3 import DEFAULT_PRAGMAS, configure_connection
+
+READ_SQL = (
+    'SELECT song.id, song.title, artist.name FROM tunaapi_song song '
+    'INNER JOIN tunaapi_artist artist ON artist.id = song.artist_id '
+    'WHERE song.id >= ? ORDER BY song.id LIMIT 50')
+# Read then write in one transaction, the shape of most ORM updates
+WRITE_SQL = (
+    'SELECT song_count FROM tunaapi_genrepopularity WHERE genre_id = ?',
+    'UPDATE tunaapi_genrepopularity SET song_count = ? WHERE genre_id = ?')
+
+# Django's stock SQLite setup: rollback journal, a new connection for every
+# request and deferred transactions
+STOCK = {'pragmas': {'journal_mode': 'DELETE', 'synchronous': 'FULL'},
+         'transaction_mode': 'DEFERRED', 'persistent': False}
+
+
+class Command(BaseCommand):
+    help = ('Run a mixed read/write load from several threads against a copy '
+            'of the database, with Django\'s stock SQLite connection setup and '
+            'with the tuned one, and report throughput and lock errors as JSON')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--seconds', type=float, default=5.0,
+                            help='Duration of each phase')
+        parser.add_argument('--write-ratio', type=float, default=0.2)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Write the JSON report here')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('stress_database only supports SQLite.')
+        connection.ensure_connection()
+        tuned = {
+            'pragmas': getattr(connection, 'pragmas', DEFAULT_PRAGMAS),
+            'transaction_mode': getattr(connection, 'transaction_mode', 'IMMEDIATE'),
+            'persistent': True,
+        }
+
+        phases = {}
+        with tempfile.TemporaryDirectory() as directory:
+            for name, setup in (('stock', STOCK), ('tuned', tuned)):
+                path = Path(directory) / f'{name}.sqlite3'
+                with sqlite3.connect(path) as copy:
+                    connection.connection.backup(copy)
+                copy.close()
+                phases[name] = self.run_phase(path, setup, options)
+
+        report = json.dumps({
+            'threads': options['threads'],
+            'seconds': options['seconds'],
+            'write_ratio': options['write_ratio'],
+            'phases': phases,
+        }, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                output.write(report)
+        else:
+            self.stdout.write(report)
+
+    def run_phase(self, path, setup, options):
+        with sqlite3.connect(path, isolation_level=None) as conn:
+            # journal_mode is stored in the file, so set it before the load
+            configure_connection(conn, setup['pragmas'])
+            max_song = conn.execute('SELECT max(id) FROM tunaapi_song').fetchone()[0]
+            genre_ids = [row[0] for row in conn.execute(
+                'SELECT genre_id FROM tunaapi_genrepopularity')]
+        conn.close()
+
+        deadline = time.perf_counter() + options['seconds']
+        workers = [StressWorker(path, setup, max_song or 0, genre_ids,
+                                options['write_ratio'], options['seed'] + index,
+                                deadline)
+                   for index in range(options['threads'])]
+        started = time.perf_counter()
+        threads = [threading.Thread(target=worker.run) for worker in workers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        reads = sum(worker.reads for worker in workers)
+        writes = sum(worker.writes for worker in workers)
+        write_timings = sorted(timing for worker in workers
+                               for timing in worker.write_timings)
+        return {
+            'reads': reads,
+            'writes': writes,
+            'locked_errors': sum(worker.locked_errors for worker in workers),
+            'reads_per_second': round(reads / elapsed, 1),
+            'writes_per_second': round(writes / elapsed, 1),
+            'p95_write_ms': round(write_timings[
+                max(0, round(len(write_timings) * 0.95) - 1)], 3)
+                if write_timings else None,
+        }
+
+
+class StressWorker:
+    """One thread of the load, counting completed and failed operations"""
+
+    def __init__(self, path, setup, max_song, genre_ids, write_ratio, seed, deadline):
+        self.path = path
+        self.setup = setup
+        self.max_song = max_song
+        self.genre_ids = genre_ids
+        self.write_ratio = write_ratio
+        self.random = random.Random(seed)
+        self.deadline = deadline
+        self.reads = 0
+        self.writes = 0
+        self.locked_errors = 0
+        self.write_timings = []
+
+    def connect(self):
+        conn = sqlite3.connect(self.path, isolation_level=None,
+                               check_same_thread=False)
+        configure_connection(conn, {
+            name: value for name, value in self.setup['pragmas'].items()
+            if name != 'journal_mode'})
+        return conn
+
+    def run(self):
+        conn = self.connect() if self.setup['persistent'] else None
+        try:
+            while time.perf_counter() < self.deadline:
+                request_conn = conn or self.connect()
+                try:
+                    if self.genre_ids and self.random.random() < self.write_ratio:
+                        self.write(request_conn)
+                    else:
+                        self.read(request_conn)
+                except sqlite3.OperationalError as error:
+                    if 'locked' not in str(error) and 'busy' not in str(error):
+                        raise
+                    self.locked_errors += 1
+                    if request_conn.in_transaction:
+                        request_conn.execute('ROLLBACK')
+                finally:
+                    if conn is None:
+                        request_conn.close()
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def read(self, conn):
+        conn.execute(READ_SQL, (self.random.randint(0, self.max_song),)).fetchall()
+        self.reads += 1
+
+    def write(self, conn):
+        genre_id = self.random.choice(self.genre_ids)
+        started = time.perf_counter()
+        conn.execute(f"BEGIN {self.setup['transaction_mode']}")
+        count = conn.execute(WRITE_SQL[0], (genre_id,)).fetchone()[0]
+        conn.execute(WRITE_SQL[1], (count, genre_id))
+        conn.execute('COMMIT')
+        self.write_timings.append((time.perf_counter() - started) * 1000)
+        self.writes += 1
@@ -0,0 +1,31 @@
+"""Enumerate the GET endpoints of the API router for the tooling commands"""
+from django.apps import apps
+
+from tunapiano.urls import router
+
+
+def router_endpoints(paginated_lists=True):
+    """Yield (name, url) for every GET route registered on the router
+
+    Detail routes use the lowest primary key of the viewset's model, found by
+    its router basename. Routes whose model has no rows are skipped.
+    """
+    for prefix, viewset, basename in router.registry:
+        model = apps.get_model('tunaapi', basename)
+        pk = model.objects.order_by('pk').values_list('pk', flat=True).first()
+
+        if hasattr(viewset, 'list'):
+            yield f'{basename}-list', f'/{prefix}'
+            if paginated_lists:
+                yield f'{basename}-list-paginated', f'/{prefix}?page_size=100'
+        if hasattr(viewset, 'retrieve') and pk is not None:
+            yield f'{basename}-detail', f'/{prefix}/{pk}'
+
+        for extra_action in viewset.get_extra_actions():
+            if 'get' not in extra_action.mapping:
+                continue
+            name = f'{basename}-{extra_action.url_name}'
+            if not extra_action.detail:
+                yield name, f'/{prefix}/{extra_action.url_path}'
+            elif pk is not None:
+                yield name, f'/{prefix}/{pk}/{extra_action.url_path}'
@@ -0,0 +1,115 @@
+"""In-process metrics rendered in the Prometheus text exposition format
+
+Each worker process keeps its own numbers; scrape every process (or run a
+single one) to get the full picture.
+"""
+import math
+import threading
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\')
+                         .replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels)
+    return '{' + pairs + '}'
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with optional labels"""
+    kind = 'counter'
+
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple((name, labels[name]) for name in self.label_names)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def value(self, **labels):
+        key = tuple((name, labels[name]) for name in self.label_names)
+        return self.values.get(key, 0)
+
+    def samples(self):
+        with self.lock:
+            values = sorted(self.values.items())
+        for key, value in values:
+            yield self.name, key, value
+
+
+class Histogram:
+    """Cumulative bucket histogram with optional labels"""
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, buckets, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self.label_names = tuple(label_names)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple((name, labels[name]) for name in self.label_names)
+        with self.lock:
+            counts, total = self.values.get(key, ([0] * len(self.buckets), 0))
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+            self.values[key] = (counts, total + value)
+
+    def samples(self):
+        with self.lock:
+            values = sorted(
+                (key, (list(counts), total))
+                for key, (counts, total) in self.values.items())
+        for key, (counts, total) in values:
+            for bound, count in zip(self.buckets, counts):
+                yield f'{self.name}_bucket', key + (('le', _format_value(bound)),), count
+            yield f'{self.name}_sum', key, total
+            yield f'{self.name}_count', key, counts[-1]
+
+
+class Registry:
+    """Named collection of metrics"""
+
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def register(self, metric):
+        with self.lock:
+            return self.metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, help_text, label_names=()):
+        return self.register(Counter(name, help_text, label_names))
+
+    def histogram(self, name, help_text, buckets, label_names=()):
+        return self.register(Histogram(name, help_text, buckets, label_names))
+
+    def render(self):
+        """All metrics in the Prometheus text format"""
+        lines = []
+        for metric in sorted(self.metrics.values(), key=lambda m: m.name):
+            lines.append(f'# HELP {metric.name} {metric.help_text}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, labels, value in metric.samples():
+                lines.append(
+                    f'{name}{_format_labels(labels)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
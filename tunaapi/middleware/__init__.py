@@ -0,0 +1 @@
+from .sql_instrumentation import SQLInstrumentationMiddleware
@@ -0,0 +1,167 @@
+"""Per-request SQL instrumentation
+
+Records every statement through a database execute wrapper, which works
+with DEBUG off, unlike connection.queries.
+"""
+import heapq
+import logging
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.db import connection
+
+from tunaapi.metrics import registry
+
+logger = logging.getLogger('tunaapi.sql')
+
+# Statement templates run at least this often in one request are reported
+# as likely N+1 patterns
+N_PLUS_ONE_THRESHOLD = 5
+SLOWEST_STATEMENTS = 3
+
+request_duration = registry.histogram(
+    'tunaapi_request_duration_seconds', 'Time spent handling a request',
+    (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10), ('route',))
+request_db_duration = registry.histogram(
+    'tunaapi_request_db_duration_seconds',
+    'Time spent in database statements per request',
+    (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5), ('route',))
+request_queries = registry.histogram(
+    'tunaapi_request_queries', 'Database statements executed per request',
+    (0, 1, 2, 3, 5, 10, 20, 50, 100, 500), ('route',))
+n_plus_one_requests = registry.counter(
+    'tunaapi_n_plus_one_requests_total',
+    'Requests that repeated one statement template '
+    f'{N_PLUS_ONE_THRESHOLD} or more times', ('route',))
+
+# The recorder of the request being handled. Concurrent async requests share
+# the ORM's thread and so its connection, each recorder skips the statements
+# run from another request's context.
+_active_recorder = ContextVar('tunaapi_sql_recorder', default=None)
+
+
+class QueryRecorder:
+    """Execute wrapper collecting statement counts and timings"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.slowest = []
+        self.templates = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        if _active_recorder.get() not in (None, self):
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.count += 1
+            self.duration += duration
+            self.templates[sql] += 1
+            entry = (duration, self.count, sql)
+            if len(self.slowest) < SLOWEST_STATEMENTS:
+                heapq.heappush(self.slowest, entry)
+            else:
+                heapq.heappushpop(self.slowest, entry)
+
+    def slowest_statements(self):
+        return [(duration, sql) for duration, _, sql in
+                sorted(self.slowest, reverse=True)]
+
+    def repeated_statements(self):
+        return [(sql, count) for sql, count in self.templates.most_common()
+                if count >= N_PLUS_ONE_THRESHOLD]
+
+
+def _install(recorder):
+    # Must run on the ORM's thread, connections are per thread
+    connection.execute_wrappers.append(recorder)
+
+
+def _uninstall(recorder):
+    connection.execute_wrappers.remove(recorder)
+
+
+def _route(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match is not None else 'unmatched'
+
+
+class SQLInstrumentationMiddleware:
+    """Measure database work per request
+
+    Adds a Server-Timing header with the statement count and database time,
+    logs likely N+1 patterns to the `tunaapi.sql` logger, and feeds per-route
+    histograms served by the metrics endpoint. Statements run while a
+    streaming response is being consumed happen after this middleware
+    returns and are not included.
+
+    Under ASGI it runs as async middleware, so async views are not pushed
+    onto a thread. The async ORM runs every query on one shared thread, so
+    the recorder is installed on that thread's connection and only counts
+    statements issued from its own request.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        token = _active_recorder.set(recorder)
+        try:
+            with connection.execute_wrapper(recorder):
+                response = self.get_response(request)
+        finally:
+            _active_recorder.reset(token)
+        return self.finish(request, response, recorder, started)
+
+    async def __acall__(self, request):
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        token = _active_recorder.set(recorder)
+        await sync_to_async(_install)(recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(_uninstall)(recorder)
+            _active_recorder.reset(token)
+        return self.finish(request, response, recorder, started)
+
+    def finish(self, request, response, recorder, started):
+        duration = time.perf_counter() - started
+
+        route = _route(request)
+        request_duration.observe(duration, route=route)
+        request_db_duration.observe(recorder.duration, route=route)
+        request_queries.observe(recorder.count, route=route)
+
+        repeated = recorder.repeated_statements()
+        if repeated:
+            n_plus_one_requests.inc(route=route)
+            logger.warning(
+                'Possible N+1 on %s %s: %s', request.method, request.path,
+                '; '.join(f'{count}x {sql}' for sql, count in repeated))
+        if recorder.count:
+            logger.debug(
+                '%s %s ran %d statements in %.1fms, slowest: %s',
+                request.method, request.path, recorder.count,
+                recorder.duration * 1000,
+                '; '.join(f'{duration * 1000:.1f}ms {sql}' for duration, sql
+                          in recorder.slowest_statements()))
+
+        response['Server-Timing'] = (
+            f'db;dur={recorder.duration * 1000:.2f};'
+            f'desc="{recorder.count} queries", '
+            f'app;dur={duration * 1000:.2f}')
+        return response
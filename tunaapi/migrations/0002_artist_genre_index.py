@@ -0,0 +1,61 @@
+# Generated by Django 4.2.8 on 2026-10-18 13:31
+
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def build_artist_genres(apps, schema_editor):
+    SongGenre = apps.get_model('tunaapi', 'SongGenre')
+    ArtistGenre = apps.get_model('tunaapi', 'ArtistGenre')
+    counts = (
+        SongGenre.objects.values_list('song__artist_id', 'genre_id')
+        .annotate(count=Count('id'))
+        .order_by('song__artist_id', '-count', 'genre_id')
+    )
+    rows = []
+    previous_artist = None
+    for artist_id, genre_id, count in counts.iterator():
+        rows.append(ArtistGenre(
+            artist_id=artist_id, genre_id=genre_id, song_count=count,
+            is_dominant=artist_id != previous_artist))
+        previous_artist = artist_id
+    ArtistGenre.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tunaapi', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='artist',
+            name='age',
+            field=models.IntegerField(),
+        ),
+        migrations.AlterField(
+            model_name='song',
+            name='artist',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='songs', to='tunaapi.artist'),
+        ),
+        migrations.CreateModel(
+            name='ArtistGenre',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('song_count', models.PositiveIntegerField(default=0)),
+                ('is_dominant', models.BooleanField(default=False)),
+                ('artist', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='genre_counts', to='tunaapi.artist')),
+                ('genre', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='tunaapi.genre')),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('is_dominant', True)), fields=['genre', 'artist'], name='artist_dominant_genre_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='artistgenre',
+            constraint=models.UniqueConstraint(fields=('artist', 'genre'), name='unique_artist_genre'),
+        ),
+        migrations.RunPython(build_artist_genres, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+from django.db import migrations
+
+from tunaapi.search import song_index
+
+
+def install_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    song_index.install(schema_editor)
+
+
+def uninstall_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    song_index.uninstall(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tunaapi', '0002_artist_genre_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search_index, uninstall_search_index),
+    ]
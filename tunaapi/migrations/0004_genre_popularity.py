@@ -0,0 +1,37 @@
+# Generated by Django 4.2.8 on 2026-10-18 13:35
+
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def count_genre_songs(apps, schema_editor):
+    Genre = apps.get_model('tunaapi', 'Genre')
+    GenrePopularity = apps.get_model('tunaapi', 'GenrePopularity')
+    genres = Genre.objects.annotate(count=Count('songgenre')).values_list(
+        'id', 'count')
+    GenrePopularity.objects.bulk_create(
+        (GenrePopularity(genre_id=genre_id, song_count=count)
+         for genre_id, count in genres.iterator()),
+        batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tunaapi', '0003_song_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GenrePopularity',
+            fields=[
+                ('genre', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='popularity', serialize=False, to='tunaapi.genre')),
+                ('song_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-song_count', 'genre'], name='genre_popularity_idx')],
+            },
+        ),
+        migrations.RunPython(count_genre_songs, migrations.RunPython.noop),
+    ]
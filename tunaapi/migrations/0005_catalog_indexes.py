@@ -0,0 +1,93 @@
+# Generated by Django 4.2.8 on 2026-10-18 13:41
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_duplicate_song_genres(apps, schema_editor):
+    """Keep the oldest link of each duplicated (song, genre) pair
+
+    The derived counters of the artists and genres involved are recounted
+    afterwards, since they included the duplicates.
+    """
+    SongGenre = apps.get_model('tunaapi', 'SongGenre')
+    ArtistGenre = apps.get_model('tunaapi', 'ArtistGenre')
+    GenrePopularity = apps.get_model('tunaapi', 'GenrePopularity')
+
+    duplicates = (
+        SongGenre.objects.values('song_id', 'genre_id')
+        .annotate(keep=Min('id'), links=Count('id'))
+        .filter(links__gt=1)
+    )
+    artist_ids = set()
+    genre_ids = set()
+    for duplicate in duplicates.iterator():
+        SongGenre.objects.filter(
+            song_id=duplicate['song_id'], genre_id=duplicate['genre_id']
+        ).exclude(pk=duplicate['keep']).delete()
+        genre_ids.add(duplicate['genre_id'])
+        artist_ids.add(SongGenre.objects.get(pk=duplicate['keep']).song.artist_id)
+
+    for genre_id in genre_ids:
+        GenrePopularity.objects.filter(genre_id=genre_id).update(
+            song_count=SongGenre.objects.filter(genre_id=genre_id).count())
+    if artist_ids:
+        ArtistGenre.objects.filter(artist_id__in=artist_ids).delete()
+        counts = (
+            SongGenre.objects.filter(song__artist_id__in=artist_ids)
+            .values_list('song__artist_id', 'genre_id')
+            .annotate(count=Count('id'))
+            .order_by('song__artist_id', '-count', 'genre_id')
+        )
+        rows = []
+        previous_artist = None
+        for artist_id, genre_id, count in counts:
+            rows.append(ArtistGenre(
+                artist_id=artist_id, genre_id=genre_id, song_count=count,
+                is_dominant=artist_id != previous_artist))
+            previous_artist = artist_id
+        ArtistGenre.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tunaapi', '0004_genre_popularity'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='artist',
+            index=models.Index(fields=['name'], name='artist_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='artist',
+            index=models.Index(fields=['age'], name='artist_age_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='genre',
+            index=models.Index(fields=['description'], name='genre_description_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='song',
+            index=models.Index(fields=['length'], name='song_length_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='song',
+            index=models.Index(fields=['title'], name='song_title_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='song',
+            index=models.Index(fields=['album'], name='song_album_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='songgenre',
+            index=models.Index(fields=['genre', 'song'], name='songgenre_genre_song_idx'),
+        ),
+        migrations.RunPython(
+            remove_duplicate_song_genres, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='songgenre',
+            constraint=models.UniqueConstraint(fields=('song', 'genre'), name='unique_song_genre'),
+        ),
+    ]
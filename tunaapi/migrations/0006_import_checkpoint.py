@@ -0,0 +1,26 @@
+# Generated by Django 4.2.8 on 2026-10-18 15:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tunaapi', '0005_catalog_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=500, unique=True)),
+                ('fingerprint', models.CharField(max_length=100)),
+                ('rows_done', models.PositiveBigIntegerField(default=0)),
+                ('artist_ids', models.JSONField(default=list)),
+                ('genre_ids', models.JSONField(default=list)),
+                ('completed', models.BooleanField(default=False)),
+                ('updated', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.8 on 2026-10-18 18:20
+
+from django.db import migrations, models
+import django.db.models.manager
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tunaapi', '0008_job_queue'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='artist',
+            options={'base_manager_name': 'all_objects'},
+        ),
+        migrations.AlterModelManagers(
+            name='artist',
+            managers=[
+                ('objects', django.db.models.manager.Manager()),
+                ('all_objects', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='artist',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='artist',
+            index=models.Index(fields=['deleted_at'], name='artist_deleted_at_idx'),
+        ),
+    ]
@@ -2,3 +2,8 @@ from .song import Song
 from .artist import Artist
 from .song_genre import SongGenre
 from .genre import Genre
+from .artist_genre import ArtistGenre
+from .genre_popularity import GenrePopularity
+from .import_checkpoint import ImportCheckpoint
+from .change import Change
+from .job import Job
@@ -1,7 +1,39 @@
 from django.db import models
 
 
+class LiveArtistManager(models.Manager):
+    """Artists that are not soft-deleted and waiting to be purged"""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
 class Artist(models.Model):
     name = models.CharField(max_length=200)
     age = models.IntegerField()
     bio = models.TextField()
+    # Set when the artist is soft-deleted, the purge job then removes the
+    # songs in batches and finally the artist
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = LiveArtistManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        # Related lookups and the purge still reach soft-deleted artists
+        base_manager_name = 'all_objects'
+        indexes = [
+            models.Index(fields=['name'], name='artist_name_idx'),
+            models.Index(fields=['age'], name='artist_age_idx'),
+            # Covers listing the ids of live artists
+            models.Index(fields=['deleted_at'], name='artist_deleted_at_idx'),
+        ]
+
+
+def soft_deleted_artists():
+    """Ids of the soft-deleted artists, as a subquery
+
+    The read endpoints leave out their songs and song genres too, through
+    `Song.objects.live()` and `SongGenre.objects.live()`.
+    """
+    return Artist.all_objects.filter(deleted_at__isnull=False).values('pk')
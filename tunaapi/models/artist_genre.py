@@ -0,0 +1,99 @@
+from django.db import models
+from django.db.models import Count, F, Q
+from .artist import Artist
+from .genre import Genre
+
+
+class ArtistGenreManager(models.Manager):
+    """Keeps the per-artist genre counters and dominant-genre flags in sync"""
+
+    def adjust(self, artist_id, genre_id, delta):
+        """Add delta to the song count of one (artist, genre) pair"""
+        updated = self.filter(artist_id=artist_id, genre_id=genre_id).update(
+            song_count=F('song_count') + delta)
+        if not updated and delta > 0:
+            _, created = self.get_or_create(
+                artist_id=artist_id, genre_id=genre_id,
+                defaults={'song_count': delta})
+            if not created:
+                self.filter(artist_id=artist_id, genre_id=genre_id).update(
+                    song_count=F('song_count') + delta)
+        if delta < 0:
+            self.filter(artist_id=artist_id, song_count__lte=0).delete()
+        self.refresh_dominant([artist_id])
+
+    def refresh_dominant(self, artist_ids):
+        """Re-flag the dominant genre of each artist
+
+        Ties on song count go to the lowest genre id so the result is stable.
+        """
+        for artist_id in set(artist_ids):
+            top = (
+                self.filter(artist_id=artist_id)
+                .order_by('-song_count', 'genre_id')
+                .values_list('pk', flat=True)
+                .first()
+            )
+            self.filter(artist_id=artist_id, is_dominant=True).exclude(
+                pk=top).update(is_dominant=False)
+            if top is not None:
+                self.filter(pk=top, is_dominant=False).update(is_dominant=True)
+
+    def rebuild(self, artist_ids=None):
+        """Recompute the counters from SongGenre for some or all artists"""
+        from .song_genre import SongGenre
+
+        song_genres = SongGenre.objects.all()
+        rows = self.all()
+        if artist_ids is not None:
+            artist_ids = set(artist_ids)
+            song_genres = song_genres.filter(song__artist_id__in=artist_ids)
+            rows = rows.filter(artist_id__in=artist_ids)
+
+        counts = (
+            song_genres.values_list('song__artist_id', 'genre_id')
+            .annotate(count=Count('id'))
+            .order_by('song__artist_id', '-count', 'genre_id')
+        )
+        # Soft-deleted artists lost their rows when they were soft-deleted
+        hidden = set(Artist.all_objects.filter(
+            deleted_at__isnull=False).values_list('pk', flat=True))
+        new_rows = []
+        previous_artist = None
+        for artist_id, genre_id, count in counts.iterator():
+            if artist_id in hidden:
+                continue
+            new_rows.append(self.model(
+                artist_id=artist_id, genre_id=genre_id, song_count=count,
+                is_dominant=artist_id != previous_artist))
+            previous_artist = artist_id
+
+        rows.delete()
+        self.bulk_create(new_rows, batch_size=1000)
+        return len(new_rows)
+
+
+class ArtistGenre(models.Model):
+    """How many of an artist's songs are tagged with a genre
+
+    Maintained from SongGenre writes; the row flagged is_dominant is the
+    artist's most common genre and backs the related-artists lookup.
+    """
+    artist = models.ForeignKey(
+        Artist, on_delete=models.CASCADE, related_name='genre_counts')
+    genre = models.ForeignKey(Genre, on_delete=models.CASCADE)
+    song_count = models.PositiveIntegerField(default=0)
+    is_dominant = models.BooleanField(default=False)
+
+    objects = ArtistGenreManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['artist', 'genre'], name='unique_artist_genre'),
+        ]
+        indexes = [
+            models.Index(
+                fields=['genre', 'artist'], condition=Q(is_dominant=True),
+                name='artist_dominant_genre_idx'),
+        ]
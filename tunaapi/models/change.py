@@ -0,0 +1,63 @@
+from django.db import connections, models
+from django.utils import timezone
+
+
+def _row(instance):
+    """The instance's columns, foreign keys as <name>_id like the list endpoints
+
+    Non-editable bookkeeping columns such as Artist.deleted_at are left out.
+    """
+    return {field.attname: getattr(instance, field.attname)
+            for field in instance._meta.concrete_fields
+            if field.editable or field.primary_key}
+
+
+class ChangeManager(models.Manager):
+    """Appends to the change log"""
+
+    def record(self, action, instances):
+        """Log one change per instance, with its current row unless deleted"""
+        self.bulk_create([
+            self.model(
+                resource=instance._meta.model_name, object_id=instance.pk,
+                action=action,
+                data=None if action == Change.DELETED else _row(instance))
+            for instance in instances
+        ], batch_size=1000)
+
+    def record_deleted(self, queryset):
+        """Log a tombstone for every row of `queryset` without loading them
+
+        Must run before the rows are deleted.
+        """
+        connection = connections[queryset.db]
+        select, params = (
+            queryset.order_by('pk').values('pk').query.sql_with_params())
+        changed_at = connection.ops.adapt_datetimefield_value(timezone.now())
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {self.model._meta.db_table} '
+                '(resource, object_id, action, data, changed_at) '
+                f'SELECT %s, id, %s, NULL, %s FROM ({select}) AS deleted',
+                [queryset.model._meta.model_name, Change.DELETED, changed_at,
+                 *params])
+
+
+class Change(models.Model):
+    """One create, update or delete of a catalog row, in commit order
+
+    The id is the sync cursor. Creates and updates carry the row as it was
+    written; deletes are tombstones without data.
+    """
+    CREATED = 'created'
+    UPDATED = 'updated'
+    DELETED = 'deleted'
+    ACTIONS = [(CREATED, 'Created'), (UPDATED, 'Updated'), (DELETED, 'Deleted')]
+
+    resource = models.CharField(max_length=20)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=7, choices=ACTIONS)
+    data = models.JSONField(null=True)
+    changed_at = models.DateTimeField(auto_now_add=True)
+
+    objects = ChangeManager()
@@ -3,3 +3,8 @@ from django.db import models
 
 class Genre(models.Model):
     description = models.TextField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['description'], name='genre_description_idx'),
+        ]
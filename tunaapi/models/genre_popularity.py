@@ -0,0 +1,90 @@
+from django.db import models
+from django.db.models import Case, Count, F, Value, When
+from .genre import Genre
+
+
+class GenrePopularityManager(models.Manager):
+    """Keeps the denormalized per-genre song counts in sync"""
+
+    def adjust(self, genre_id, delta):
+        """Add delta to the song count of a genre"""
+        updated = self.filter(genre_id=genre_id).update(
+            song_count=F('song_count') + delta)
+        if not updated and delta > 0 and Genre.objects.filter(pk=genre_id).exists():
+            self.create(genre_id=genre_id, song_count=delta)
+
+    def adjust_many(self, deltas):
+        """Add deltas to the song counts of several genres in one UPDATE
+
+        `deltas` maps genre id to delta; genres without a row are skipped.
+        """
+        if not deltas:
+            return
+        self.filter(genre_id__in=deltas).update(song_count=F('song_count') + Case(
+            *(When(genre_id=genre_id, then=Value(delta))
+              for genre_id, delta in deltas.items()),
+            default=Value(0)))
+
+    def repair(self, genre_ids=None):
+        """Recount songs per genre from SongGenre and fix any drift
+
+        Returns a list of (genre_id, stored_count, actual_count) for every
+        genre whose stored count was wrong or missing.
+        """
+        from .song import soft_deleted_songs
+        from .song_genre import SongGenre
+
+        genres = Genre.objects.all()
+        song_genres = SongGenre.objects.all()
+        stored = self.all()
+        if genre_ids is not None:
+            genres = genres.filter(pk__in=genre_ids)
+            song_genres = song_genres.filter(genre_id__in=genre_ids)
+            stored = stored.filter(genre_id__in=genre_ids)
+
+        actual = dict.fromkeys(genres.values_list('id', flat=True), 0)
+        actual.update(
+            song_genres.values_list('genre_id').annotate(count=Count('id'))
+            .order_by())
+        # Songs of soft-deleted artists left the counts when the artists were
+        # soft-deleted. Subtracting them afterwards reads only their links,
+        # where filtering the recount would check every link
+        hidden = song_genres.filter(song_id__in=soft_deleted_songs())
+        for genre_id, count in (hidden.values_list('genre_id')
+                                .annotate(count=Count('id')).order_by()):
+            actual[genre_id] -= count
+        stored = dict(stored.values_list('genre_id', 'song_count'))
+
+        drift = [
+            (genre_id, stored.get(genre_id), count)
+            for genre_id, count in actual.items()
+            if stored.get(genre_id) != count
+        ]
+        missing = []
+        for genre_id, previous, count in drift:
+            if previous is None:
+                missing.append(self.model(genre_id=genre_id, song_count=count))
+            else:
+                self.filter(genre_id=genre_id).update(song_count=count)
+        self.bulk_create(missing, batch_size=1000)
+        return drift
+
+
+class GenrePopularity(models.Model):
+    """Number of songs tagged with a genre, maintained on SongGenre writes
+
+    Backs /genres/popular so it reads an index instead of counting the
+    whole SongGenre table.
+    """
+    genre = models.OneToOneField(
+        Genre, on_delete=models.CASCADE, primary_key=True,
+        related_name='popularity')
+    song_count = models.PositiveIntegerField(default=0)
+
+    objects = GenrePopularityManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-song_count', 'genre'],
+                         name='genre_popularity_idx'),
+        ]
@@ -0,0 +1,18 @@
+from django.db import models
+
+
+class ImportCheckpoint(models.Model):
+    """How far the import_catalog command got through a source file
+
+    Updated in the same transaction as each imported chunk, so an
+    interrupted import resumes after the last committed row. The artists
+    and genres touched so far are kept too: their derived counters are
+    refreshed once the whole file is in.
+    """
+    source = models.CharField(max_length=500, unique=True)
+    fingerprint = models.CharField(max_length=100)
+    rows_done = models.PositiveBigIntegerField(default=0)
+    artist_ids = models.JSONField(default=list)
+    genre_ids = models.JSONField(default=list)
+    completed = models.BooleanField(default=False)
+    updated = models.DateTimeField(auto_now=True)
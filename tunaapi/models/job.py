@@ -0,0 +1,62 @@
+from django.db import models, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+
+class JobManager(models.Manager):
+    """Queues deduplicated recompute jobs"""
+
+    def enqueue(self, kind, ids, run_after=None):
+        """Queue `kind` for `ids`, merged into the queued job of that kind
+
+        Only one job per kind waits in the queue, so a burst of writes adds
+        its ids to a single job instead of queueing one job per write.
+        """
+        ids = set(ids)
+        if not ids:
+            return None
+        run_after = run_after or timezone.now()
+        with transaction.atomic():
+            job = self.filter(kind=kind, status=Job.QUEUED).first()
+            if job is None:
+                return self.create(
+                    kind=kind, ids=sorted(ids), run_after=run_after)
+            merged = ids.union(job.ids)
+            if len(merged) != len(job.ids):
+                job.ids = sorted(merged)
+                job.save(update_fields=['ids', 'updated'])
+            return job
+
+
+class Job(models.Model):
+    """A recompute of derived data for some ids, run by the job worker
+
+    Finished jobs are deleted; failed ones stay until retried.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUSES = [(QUEUED, 'Queued'), (RUNNING, 'Running'), (FAILED, 'Failed')]
+
+    kind = models.CharField(max_length=50)
+    ids = models.JSONField(default=list)
+    status = models.CharField(max_length=7, choices=STATUSES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    run_after = models.DateTimeField()
+    last_error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    objects = JobManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['kind'], condition=Q(status='queued'),
+                name='unique_queued_job_kind'),
+        ]
+        indexes = [
+            # The worker's poll: due queued jobs, oldest first
+            models.Index(fields=['status', 'run_after'],
+                         name='job_status_run_after_idx'),
+        ]
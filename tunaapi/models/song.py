@@ -1,5 +1,18 @@
 from django.db import models
-from .artist import Artist
+from .artist import Artist, soft_deleted_artists
+
+
+class SongManager(models.Manager):
+    """Plain querysets, plus `live()` for the endpoints that list songs
+
+    Songs of soft-deleted artists stay in the table until the purge job
+    removes them. Only the reads filter them out; derived data and the
+    indexes keep using the unfiltered table.
+    """
+
+    def live(self):
+        """Songs whose artist is not soft-deleted"""
+        return self.exclude(artist_id__in=soft_deleted_artists())
 
 
 class Song(models.Model):
@@ -8,3 +21,21 @@ class Song(models.Model):
         Artist, on_delete=models.CASCADE, related_name='songs')
     album = models.CharField(max_length=200)
     length = models.PositiveIntegerField()
+
+    objects = SongManager()
+
+    class Meta:
+        indexes = [
+            # Range filters and keyset pages on length, title and album.
+            # SQLite appends the rowid (id) to every index, so each one also
+            # serves the (column, id) tie-break ordering
+            models.Index(fields=['length'], name='song_length_idx'),
+            models.Index(fields=['title'], name='song_title_idx'),
+            models.Index(fields=['album'], name='song_album_idx'),
+        ]
+
+
+def soft_deleted_songs():
+    """Ids of the songs of soft-deleted artists, as a subquery"""
+    return Song.objects.filter(
+        artist_id__in=soft_deleted_artists()).values('pk')
@@ -1,8 +1,33 @@
 from django.db import models
-from .song import Song
+from .song import Song, soft_deleted_songs
 from .genre import Genre
 
 
+class SongGenreManager(models.Manager):
+    """Plain querysets, plus `live()` like SongManager"""
+
+    def live(self):
+        """Song genres whose song's artist is not soft-deleted
+
+        Excludes by song id rather than joining tunaapi_song, so the
+        filter reads only the songs of soft-deleted artists.
+        """
+        return self.exclude(song_id__in=soft_deleted_songs())
+
+
 class SongGenre(models.Model):
     song = models.ForeignKey(Song, on_delete=models.CASCADE)
     genre = models.ForeignKey(Genre, on_delete=models.CASCADE)
+
+    objects = SongGenreManager()
+
+    class Meta:
+        constraints = [
+            # Also the covering index for lookups by song
+            models.UniqueConstraint(
+                fields=['song', 'genre'], name='unique_song_genre'),
+        ]
+        indexes = [
+            # Covers grouping and joins by genre without touching the table
+            models.Index(fields=['genre', 'song'], name='songgenre_genre_song_idx'),
+        ]
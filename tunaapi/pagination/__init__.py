@@ -0,0 +1,3 @@
+from .keyset_pagination import KeysetPagination
+from .cursor_pagination import CatalogCursorPagination
+from .search_pagination import SearchCursorPagination
@@ -0,0 +1,51 @@
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+
+from .keyset_pagination import KeysetPagination
+
+
+class CatalogCursorPagination(KeysetPagination):
+    """Opaque keyset pagination for the catalog list endpoints
+
+    Pagination is opt-in so existing clients keep receiving a plain list:
+    it kicks in when the request carries a `cursor` or `page_size`.
+    Pages are keyed on `id` by default, or on one of the view's sort
+    columns passed as `?ordering=` (prefix with `-` for descending), with
+    `id` as the tie-breaker.
+
+    A page past the key (value, id) is `col > value OR (col = value AND
+    id > id)`. DRF's CursorPagination keys on the first column only and
+    skips rows sharing its value by offset, so pages deep into a run of
+    equal lengths or albums would cost more the deeper they are.
+    """
+    ordering_query_param = 'ordering'
+
+    def __init__(self, ordering_fields=('id',)):
+        self.ordering_fields = ordering_fields
+
+    def is_requested(self, request):
+        """Whether the client asked for a paginated response"""
+        return (self.cursor_query_param in request.query_params
+                or self.page_size_query_param in request.query_params)
+
+    def get_ordering(self, request, queryset, view):
+        requested = request.query_params.get(self.ordering_query_param, 'id')
+        field = requested.lstrip('-')
+        if field not in self.ordering_fields:
+            raise ValidationError({self.ordering_query_param: [
+                f"Cannot order by '{field}', choose one of "
+                f"{', '.join(self.ordering_fields)}."]})
+        if field == 'id':
+            return (requested,)
+        return (requested, '-id' if requested.startswith('-') else 'id')
+
+    def past(self, queryset, key, after):
+        descending = self.ordering[0].startswith('-')
+        lookup = 'gt' if after != descending else 'lt'
+        if len(self.fields) == 1:
+            return queryset.filter(**{f'id__{lookup}': key[0]})
+        field = self.fields[0]
+        value, row_id = key
+        return queryset.filter(
+            Q(**{f'{field}__{lookup}': value})
+            | Q(**{field: value, f'id__{lookup}': row_id}))
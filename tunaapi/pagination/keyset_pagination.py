@@ -0,0 +1,129 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Opaque cursor pagination keyed on the row at the page boundary
+
+    Rows are ordered on `get_ordering`, whose last column is `id`. The
+    cursor carries that row's values of the ordering columns (the key) and
+    the direction of travel, and each page is one range query past the
+    key, so a page costs the same whatever its depth. Subclasses build
+    that range query in `past`.
+    """
+    cursor_query_param = 'cursor'
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    invalid_cursor_message = 'Invalid cursor'
+
+    # State of the page being paginated, set by paginate_queryset
+    base_url = None
+    ordering = ()
+    fields = ()
+    page = None
+    has_next = has_previous = False
+
+    def get_ordering(self, request, queryset, view):
+        """Order-by names of the pages, ending with `id` or `-id`"""
+        raise NotImplementedError
+
+    def past(self, queryset, key, after):
+        """Rows after (or, for previous pages, before) the key"""
+        raise NotImplementedError
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.fields = [name.lstrip('-') for name in self.ordering]
+        cursor = self.decode_cursor(request)
+        reverse = cursor is not None and cursor['d'] == 'p'
+
+        if cursor is not None:
+            queryset = self.past(queryset, cursor['k'], after=not reverse)
+        ordering = self.ordering
+        if reverse:
+            ordering = [name[1:] if name.startswith('-') else f'-{name}'
+                        for name in ordering]
+        queryset = queryset.order_by(*ordering)
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if reverse:
+            self.page.reverse()
+            self.has_previous = has_more
+            self.has_next = True
+        else:
+            self.has_previous = cursor is not None
+            self.has_next = has_more
+        return self.page
+
+    def get_page_size(self, request):
+        """?page_size= when valid, capped at max_page_size"""
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True, cutoff=self.max_page_size)
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def parse_key(self, key):
+        """The cursor's key checked against the ordering, or ValueError"""
+        if not isinstance(key, list) or len(key) != len(self.fields):
+            raise ValueError
+        key[-1] = int(key[-1])
+        return key
+
+    def decode_cursor(self, request):
+        """The request's cursor as {'k': key, 'd': direction}, or None"""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            cursor = json.loads(urlsafe_b64decode(encoded.encode('ascii')))
+            if cursor['d'] not in ('n', 'p'):
+                raise ValueError
+            return {'k': self.parse_key(cursor['k']), 'd': cursor['d']}
+        except (TypeError, ValueError, KeyError) as error:
+            raise NotFound(self.invalid_cursor_message) from error
+
+    def encode_cursor(self, row, direction):
+        """Link to the page after ('n') or before ('p') a row"""
+        key = [row[field] if isinstance(row, dict) else getattr(row, field)
+               for field in self.fields]
+        token = json.dumps({'k': key, 'd': direction})
+        encoded = urlsafe_b64encode(token.encode('ascii')).decode('ascii')
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        """Link to the next page, or None on the last one"""
+        if not self.has_next:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[-1], 'n')
+
+    def get_previous_link(self):
+        """Link to the previous page, or None on the first one"""
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], 'p')
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data)
+        ]))
@@ -0,0 +1,28 @@
+from tunaapi.search.song_index import TABLE
+from .keyset_pagination import KeysetPagination
+
+
+class SearchCursorPagination(KeysetPagination):
+    """Keyset pagination over relevance-ranked search results
+
+    Search hits are ordered by (rank, id), and the rank is an extra select
+    rather than a model field, so the range past the boundary is written
+    against the FTS table's rank column.
+    """
+
+    def get_ordering(self, request, queryset, view):
+        return ('search_rank', 'id')
+
+    def parse_key(self, key):
+        key = super().parse_key(key)
+        key[0] = float(key[0])
+        return key
+
+    def past(self, queryset, key, after):
+        comparison = '>' if after else '<'
+        rank, row_id = key
+        return queryset.extra(
+            where=[f'({TABLE}.rank {comparison} %s OR '
+                   f'({TABLE}.rank = %s AND tunaapi_song.id {comparison} %s))'],
+            params=[rank, rank, row_id],
+        )
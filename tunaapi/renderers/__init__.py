@@ -0,0 +1,3 @@
+from .fast_json import FastJSONRenderer
+from .ndjson_renderer import NDJSONRenderer
+from .streaming import stream_rows, streaming_response, wants_stream
@@ -0,0 +1,38 @@
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is an optional speedup
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer that encodes with orjson when it is installed
+
+    Output is byte-for-byte what JSONRenderer writes for the API's data:
+    compact separators, UTF-8 text and U+2028/U+2029 escaped. Dates and
+    anything else orjson does not handle natively go through DRF's encoder.
+    Indented output, settings that change JSONRenderer's format, and data
+    orjson rejects (such as integers beyond 64 bits) fall back to
+    JSONRenderer. Floats differ in two corners: exponents lose their '+'
+    and NaN or infinity become null instead of raising.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None or not self.uses_orjson(accepted_media_type, renderer_context):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(
+                data, default=self.encoder_class().default,
+                option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME)
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Same escaping as JSONRenderer, these break JavaScript string literals
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+    def uses_orjson(self, accepted_media_type, renderer_context):
+        return (orjson is not None
+                and not self.ensure_ascii
+                and self.compact
+                and self.strict
+                and self.get_indent(accepted_media_type or '', renderer_context or {}) is None)
@@ -0,0 +1,18 @@
+from .fast_json import FastJSONRenderer
+
+
+class NDJSONRenderer(FastJSONRenderer):
+    """Renders a list as newline-delimited JSON, one compact object per line"""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if not isinstance(data, list):
+            data = [data]
+        return b''.join(self.render_line(item) for item in data)
+
+    def render_line(self, item):
+        """Render one object followed by a newline"""
+        return super().render(item) + b'\n'
@@ -0,0 +1,51 @@
+from django.http import StreamingHttpResponse
+from .fast_json import FastJSONRenderer
+from .ndjson_renderer import NDJSONRenderer
+
+STREAM_CHUNK_SIZE = 2000
+
+
+def wants_stream(request):
+    """Whether a list request opted into a streamed response
+
+    Clients opt in with `?stream=1`, or by asking for NDJSON through
+    `Accept: application/x-ndjson` or `?format=ndjson`.
+    """
+    if request.accepted_renderer.format == NDJSONRenderer.format:
+        return True
+    return request.query_params.get('stream', '').lower() in ('1', 'true')
+
+
+def streaming_response(request, queryset, serializer_class, **serializer_kwargs):
+    """Stream a queryset, serializing rows as they come off the cursor
+
+    Rows are read with a chunked iterator so memory stays flat however many
+    rows match. NDJSON clients get one object per line, everyone else gets a
+    JSON array written incrementally. `serializer_kwargs` are passed on to
+    the serializer.
+    """
+    serializer = serializer_class(**serializer_kwargs)
+    rows = queryset.iterator(chunk_size=STREAM_CHUNK_SIZE)
+    return stream_rows(request, (serializer.to_representation(row) for row in rows))
+
+
+def stream_rows(request, rows):
+    """Stream an iterable of already serialized rows, as streaming_response"""
+    if request.accepted_renderer.format == NDJSONRenderer.format:
+        renderer = NDJSONRenderer()
+        content = (renderer.render_line(row) for row in rows)
+        return StreamingHttpResponse(
+            content, content_type=NDJSONRenderer.media_type)
+
+    return StreamingHttpResponse(
+        _json_array(rows), content_type=FastJSONRenderer.media_type)
+
+
+def _json_array(rows):
+    renderer = FastJSONRenderer()
+    yield b'['
+    separator = b''
+    for row in rows:
+        yield separator + renderer.render(row)
+        separator = b','
+    yield b']'
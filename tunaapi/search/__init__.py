@@ -0,0 +1,3 @@
+from .song_index import install, uninstall, rebuild, search_songs
+from .genre_index import genre_index
+from .artist_similarity import artist_similarity
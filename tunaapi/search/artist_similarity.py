@@ -0,0 +1,157 @@
+"""Top-k similar artists by the genre mix of their songs, scored with NumPy
+
+An artist's genre profile is how many of their songs carry each genre,
+read from ArtistGenre, which is SongGenre x Song.artist kept counted. Each
+process holds the profiles as an artists x genres matrix. Scoring one
+artist against all others reads only the columns of that artist's genres,
+so it costs a few vector operations over the artist axis.
+
+Writes mark the artists they touch after the transaction commits. Those
+rows are reloaded on the next read, and a SharedVersion makes the other
+processes reload everything.
+"""
+import threading
+
+import numpy as np
+from django.db import transaction
+
+from tunaapi.caching import SharedVersion
+from tunaapi.models import ArtistGenre, Song
+
+METRICS = ('cosine', 'jaccard')
+
+index_version = SharedVersion('tunaapi:artist-similarity:version')
+
+
+class GenreProfiles:
+    """Song counts per genre for every artist with tagged songs"""
+
+    def __init__(self, rows):
+        artist_ids = sorted({artist_id for artist_id, _, _ in rows})
+        genre_ids = sorted({genre_id for _, genre_id, _ in rows})
+        self.artist_ids = np.array(artist_ids, dtype=np.int64)
+        self.positions = {artist_id: row for row, artist_id in enumerate(artist_ids)}
+        self.columns = {genre_id: column for column, genre_id in enumerate(genre_ids)}
+        # Column-major, scoring reads a few genre columns across all artists
+        self.counts = np.zeros((len(artist_ids), len(genre_ids)),
+                               dtype=np.float32, order='F')
+        self.fill(rows)
+        self.norms = np.linalg.norm(self.counts, axis=1)
+        self.genre_totals = np.count_nonzero(self.counts, axis=1)
+
+    @classmethod
+    def load(cls):
+        return cls(list(ArtistGenre.objects.filter(song_count__gt=0).values_list(
+            'artist_id', 'genre_id', 'song_count')))
+
+    def fill(self, rows):
+        for artist_id, genre_id, song_count in rows:
+            self.counts[self.positions[artist_id], self.columns[genre_id]] = song_count
+
+    def refresh(self, artist_ids):
+        """Reload the profiles of some artists in place
+
+        Returns False when an artist or genre is new, which needs a new
+        matrix.
+        """
+        rows = list(ArtistGenre.objects.filter(
+            artist_id__in=artist_ids, song_count__gt=0).values_list(
+                'artist_id', 'genre_id', 'song_count'))
+        if any(artist_id not in self.positions or genre_id not in self.columns
+               for artist_id, genre_id, _ in rows):
+            return False
+        positions = [self.positions[artist_id] for artist_id in artist_ids
+                     if artist_id in self.positions]
+        self.counts[positions] = 0
+        self.fill(rows)
+        self.norms[positions] = np.linalg.norm(self.counts[positions], axis=1)
+        self.genre_totals[positions] = np.count_nonzero(self.counts[positions], axis=1)
+        return True
+
+    def top_k(self, artist_id, k, metric):
+        position = self.positions.get(artist_id)
+        if position is None:
+            return []
+        profile = self.counts[position]
+        columns = np.flatnonzero(profile)
+        if not columns.size:
+            return []
+        shared = self.counts[:, columns].astype(np.float64)
+
+        if metric == 'cosine':
+            dots = shared @ profile[columns].astype(np.float64)
+            scale = self.norms * self.norms[position]
+            scores = np.divide(dots, scale, out=np.zeros_like(dots), where=scale > 0)
+        else:
+            # Genres in common over genres either artist has
+            common = np.count_nonzero(shared, axis=1)
+            scores = common / (self.genre_totals + columns.size - common)
+        scores[position] = 0
+
+        candidates = np.flatnonzero(scores > 0)
+        if candidates.size > k:
+            # Keep everything tied with the k-th best so ties go by artist id
+            kth = -np.partition(-scores[candidates], k - 1)[k - 1]
+            candidates = candidates[scores[candidates] >= kth]
+        order = np.lexsort((self.artist_ids[candidates], -scores[candidates]))[:k]
+        return [(int(self.artist_ids[index]), float(scores[index]))
+                for index in candidates[order]]
+
+
+class ArtistSimilarity:
+    """The process's GenreProfiles, kept current with committed writes"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._profiles = None
+        self._version = None
+        self._artist_ids = set()
+        self._song_ids = set()
+
+    def similar(self, artist_id, k=10, metric='cosine'):
+        """Up to k (artist_id, score) pairs, most similar first
+
+        Artists sharing no genre with the given one are left out, as is an
+        artist with no tagged songs.
+        """
+        current = index_version.get()
+        with self._lock:
+            profiles = self._current(current)
+            return profiles.top_k(artist_id, k, metric)
+
+    def record(self, artist_ids=(), song_ids=(), rebuild=False):
+        """Mark artists, or the artists of songs, as changed on commit"""
+        transaction.on_commit(
+            lambda: self._apply(set(artist_ids), set(song_ids), rebuild))
+
+    def _apply(self, artist_ids, song_ids, rebuild):
+        with self._lock:
+            expected = self._version
+            current = index_version.bump()
+            if (rebuild or self._profiles is None or expected is None
+                    or current != expected + 1):
+                # Another process changed profiles since this one loaded them
+                self._profiles = None
+                return
+            self._artist_ids.update(artist_ids)
+            self._song_ids.update(song_ids)
+            self._version = current
+
+    def _current(self, current):
+        if self._profiles is not None and self._version == current:
+            if self._song_ids:
+                self._artist_ids.update(Song.objects.filter(
+                    pk__in=self._song_ids).values_list('artist_id', flat=True))
+            if self._artist_ids and not self._profiles.refresh(self._artist_ids):
+                self._profiles = None
+        if self._profiles is None or self._version != current:
+            # Take the version before reading, so writes committed while
+            # loading cause another load rather than be missed
+            self._version = current
+            self._profiles = GenreProfiles.load()
+        self._artist_ids.clear()
+        self._song_ids.clear()
+        return self._profiles
+
+
+artist_similarity = ArtistSimilarity()
@@ -0,0 +1,111 @@
+"""In-memory index of the songs in each genre, for multi-genre filters
+
+Each process keeps a set of song ids per genre, built from SongGenre on
+first use. Songs in all of several genres are then a set intersection
+instead of one self-join of the SongGenre table per genre.
+
+Writes are applied to the local sets after their transaction commits and
+bump a SharedVersion, so other processes rebuild their sets on the next
+read. Changes the signals cannot describe row by row, such as bulk writes,
+only bump the version.
+"""
+import json
+import threading
+
+from django.db import connection, transaction
+from django.db.models.expressions import RawSQL
+
+from tunaapi.caching import SharedVersion
+from tunaapi.models import SongGenre
+
+index_version = SharedVersion('tunaapi:genre-index:version')
+
+# Larger results are handed to SQLite as one JSON array parameter rather
+# than one parameter per id
+MAX_INLINE_IDS = 500
+
+
+class GenreIndex:
+    """Song ids per genre id, rebuilt when another process changed them"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._songs = None
+        self._version = None
+
+    def song_ids(self, genre_ids, match_all=True):
+        """Sorted ids of the songs in all (or any) of the given genres"""
+        songs = self._current()
+        sets = [songs.get(genre_id, set()) for genre_id in set(genre_ids)]
+        if not sets:
+            return []
+        if match_all:
+            sets.sort(key=len)
+            found = sets[0].intersection(*sets[1:])
+        else:
+            found = set().union(*sets)
+        return sorted(found)
+
+    def filter(self, queryset, genre_ids, match_all=True):
+        """Limit a song queryset to the songs in all (or any) of the genres"""
+        ids = self.song_ids(genre_ids, match_all)
+        if not ids:
+            return queryset.none()
+        if len(ids) <= MAX_INLINE_IDS:
+            return queryset.filter(pk__in=ids)
+        if connection.vendor == 'sqlite':
+            return queryset.filter(pk__in=RawSQL(
+                'SELECT value FROM json_each(%s)', (json.dumps(ids),)))
+        return _filter_in_database(queryset, genre_ids, match_all)
+
+    def record(self, added=(), removed=(), rebuild=False):
+        """Apply (genre_id, song_id) changes once the transaction commits
+
+        With `rebuild`, every process rebuilds its sets from the table.
+        """
+        transaction.on_commit(lambda: self._apply(added, removed, rebuild))
+
+    def _apply(self, added, removed, rebuild):
+        with self._lock:
+            expected = self._version
+            current = index_version.bump()
+            if (rebuild or self._songs is None or expected is None
+                    or current != expected + 1):
+                # Another process changed the sets since they were built
+                self._songs = None
+                return
+            for genre_id, song_id in added:
+                self._songs.setdefault(genre_id, set()).add(song_id)
+            for genre_id, song_id in removed:
+                self._songs.get(genre_id, set()).discard(song_id)
+            self._version = current
+
+    def _current(self):
+        current = index_version.get()
+        with self._lock:
+            if self._songs is None or self._version != current:
+                # Take the version before reading, so writes committed
+                # while loading cause another rebuild rather than be missed
+                self._version = current
+                self._songs = self._load()
+            return self._songs
+
+    def _load(self):
+        songs = {}
+        for genre_id, song_id in SongGenre.objects.values_list(
+                'genre_id', 'song_id').iterator(chunk_size=10000):
+            songs.setdefault(genre_id, set()).add(song_id)
+        return songs
+
+
+def _filter_in_database(queryset, genre_ids, match_all):
+    if not match_all:
+        return queryset.filter(pk__in=SongGenre.objects.filter(
+            genre_id__in=genre_ids).values('song_id'))
+    for genre_id in set(genre_ids):
+        queryset = queryset.filter(pk__in=SongGenre.objects.filter(
+            genre_id=genre_id).values('song_id'))
+    return queryset
+
+
+genre_index = GenreIndex()
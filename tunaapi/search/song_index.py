@@ -0,0 +1,121 @@
+"""SQLite FTS5 index over song title, album and artist name
+
+The index is an FTS5 table keyed by song id. Triggers on the song and artist
+tables keep it in sync, so every write path (ORM saves, bulk_create,
+queryset updates and deletes, raw SQL) is covered without Python signals.
+"""
+import re
+
+from django.db import connection
+
+TABLE = 'tunaapi_song_search'
+
+# Column weights for bm25: title matches rank above album, album above artist
+RANK = 'bm25(10.0, 5.0, 2.0)'
+
+INSERT_ROW = f"""
+    INSERT INTO {TABLE}(rowid, title, album, artist_name)
+    SELECT new.id, new.title, new.album, tunaapi_artist.name
+    FROM tunaapi_artist WHERE tunaapi_artist.id = new.artist_id;
+"""
+
+CREATE_STATEMENTS = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5(
+        title, album, artist_name, tokenize = 'unicode61 remove_diacritics 2'
+    )""",
+    f"INSERT INTO {TABLE}({TABLE}, rank) VALUES ('rank', '{RANK}')",
+    f"""CREATE TRIGGER IF NOT EXISTS {TABLE}_song_insert
+        AFTER INSERT ON tunaapi_song BEGIN {INSERT_ROW} END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {TABLE}_song_update
+        AFTER UPDATE OF title, album, artist_id ON tunaapi_song BEGIN
+            DELETE FROM {TABLE} WHERE rowid = old.id;
+            {INSERT_ROW}
+        END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {TABLE}_song_delete
+        AFTER DELETE ON tunaapi_song BEGIN
+            DELETE FROM {TABLE} WHERE rowid = old.id;
+        END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {TABLE}_artist_update
+        AFTER UPDATE OF name ON tunaapi_artist BEGIN
+            UPDATE {TABLE} SET artist_name = new.name
+            WHERE rowid IN (
+                SELECT id FROM tunaapi_song WHERE artist_id = new.id);
+        END""",
+]
+
+DROP_STATEMENTS = [
+    f"DROP TRIGGER IF EXISTS {TABLE}_song_insert",
+    f"DROP TRIGGER IF EXISTS {TABLE}_song_update",
+    f"DROP TRIGGER IF EXISTS {TABLE}_song_delete",
+    f"DROP TRIGGER IF EXISTS {TABLE}_artist_update",
+    f"DROP TABLE IF EXISTS {TABLE}",
+]
+
+POPULATE = f"""
+    INSERT INTO {TABLE}(rowid, title, album, artist_name)
+    SELECT tunaapi_song.id, tunaapi_song.title, tunaapi_song.album,
+           tunaapi_artist.name
+    FROM tunaapi_song
+    INNER JOIN tunaapi_artist ON tunaapi_artist.id = tunaapi_song.artist_id
+"""
+
+
+def install(schema_editor=None):
+    """Create the index table and its triggers, then fill it"""
+    cursor_source = schema_editor.connection if schema_editor else connection
+    with cursor_source.cursor() as cursor:
+        for statement in CREATE_STATEMENTS:
+            cursor.execute(statement)
+        cursor.execute(POPULATE)
+
+
+def uninstall(schema_editor=None):
+    cursor_source = schema_editor.connection if schema_editor else connection
+    with cursor_source.cursor() as cursor:
+        for statement in DROP_STATEMENTS:
+            cursor.execute(statement)
+
+
+def rebuild():
+    """Drop and recreate the index from the song and artist tables
+
+    Also restores the triggers, which SQLite drops whenever a migration
+    rebuilds the song or artist table.
+    """
+    uninstall()
+    install()
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT count(*) FROM {TABLE}")
+        return cursor.fetchone()[0]
+
+
+def match_expression(query):
+    """Turn free text into an FTS5 query that matches every word
+
+    Words are quoted so FTS5 operators in user input are treated as text, and
+    the last word is a prefix match so partial input still finds results.
+    """
+    words = re.findall(r'\w+', query)
+    if not words:
+        return None
+    terms = ['"{}"'.format(word.replace('"', '""')) for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def search_songs(queryset, query):
+    """Restrict a Song queryset to search hits, most relevant first
+
+    Each song gets a `search_rank` attribute (lower is more relevant). A
+    query without words matches nothing, but keeps `search_rank` so the
+    result can still be ordered and paginated like any other search.
+    """
+    expression = match_expression(query)
+    ranked = queryset.extra(
+        select={'search_rank': f'{TABLE}.rank'}, tables=[TABLE])
+    if expression is None:
+        return ranked.none().order_by('search_rank', 'id')
+    return ranked.extra(
+        where=[f'{TABLE}.rowid = tunaapi_song.id', f'{TABLE} MATCH %s'],
+        params=[expression],
+    ).order_by('search_rank', 'id')
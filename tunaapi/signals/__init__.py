@@ -0,0 +1,8 @@
+from .catalog import catalog_bulk_changed
+from . import artist_genre
+from . import artist_similarity
+from . import change_log
+from . import genre_index
+from . import genre_popularity
+from . import jobs
+from . import response_cache
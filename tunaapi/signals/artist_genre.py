@@ -0,0 +1,72 @@
+"""Receivers that keep the ArtistGenre index in sync with SongGenre and Song"""
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from tunaapi.jobs import enqueue
+from tunaapi.models import ArtistGenre, Song, SongGenre
+from .catalog import catalog_bulk_changed
+
+
+def _song_artist_id(song_id):
+    return Song.objects.filter(pk=song_id).values_list(
+        'artist_id', flat=True).first()
+
+
+@receiver(pre_save, sender=SongGenre)
+def remember_song_genre(sender, instance, **kwargs):
+    """Stash the old (artist, genre) pair when an existing link is edited"""
+    instance._index_previous = None
+    if instance.pk is not None:
+        instance._index_previous = (
+            SongGenre.objects.filter(pk=instance.pk)
+            .values_list('song__artist_id', 'genre_id')
+            .first()
+        )
+
+
+@receiver(post_save, sender=SongGenre)
+def count_song_genre(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_index_previous', None)
+    current = (_song_artist_id(instance.song_id), instance.genre_id)
+    if previous == current:
+        return
+    if previous is not None:
+        ArtistGenre.objects.adjust(*previous, -1)
+    if current[0] is not None:
+        ArtistGenre.objects.adjust(*current, 1)
+
+
+@receiver(post_delete, sender=SongGenre)
+def uncount_song_genre(sender, instance, **kwargs):
+    # On a song or artist cascade the song row is still present here, the
+    # collector deletes dependent SongGenre rows first
+    artist_id = _song_artist_id(instance.song_id)
+    if artist_id is not None:
+        ArtistGenre.objects.adjust(artist_id, instance.genre_id, -1)
+
+
+@receiver(pre_save, sender=Song)
+def remember_song_artist(sender, instance, **kwargs):
+    instance._index_previous_artist = None
+    if instance.pk is not None:
+        instance._index_previous_artist = _song_artist_id(instance.pk)
+
+
+@receiver(post_save, sender=Song)
+def move_song_genres(sender, instance, created, **kwargs):
+    """Move a song's genre counts over when it changes artist"""
+    previous_artist = getattr(instance, '_index_previous_artist', None)
+    if previous_artist is None or previous_artist == instance.artist_id:
+        return
+    genre_ids = SongGenre.objects.filter(
+        song_id=instance.pk).values_list('genre_id', flat=True)
+    for genre_id in genre_ids:
+        ArtistGenre.objects.adjust(previous_artist, genre_id, -1)
+        ArtistGenre.objects.adjust(instance.artist_id, genre_id, 1)
+
+
+@receiver(catalog_bulk_changed)
+def rebuild_artist_genres(sender, artist_ids=(), genre_ids=(), **kwargs):
+    # Only genre link changes move the counters, new untagged songs do not.
+    # Recounting is left to the job worker, off the request path
+    if artist_ids and genre_ids:
+        enqueue('artist-genres', artist_ids)
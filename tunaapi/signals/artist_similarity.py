@@ -0,0 +1,42 @@
+"""Receivers that mark artists whose genre profile changed for similarity"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from tunaapi.models import Artist, Song, SongGenre
+from tunaapi.search import artist_similarity
+from .catalog import catalog_bulk_changed
+
+
+@receiver(post_save, sender=SongGenre)
+def profile_song_genre(sender, instance, created, **kwargs):
+    if created:
+        artist_similarity.record(song_ids=[instance.song_id])
+    else:
+        # The previous song is not known here
+        artist_similarity.record(rebuild=True)
+
+
+@receiver(post_delete, sender=SongGenre)
+def unprofile_song_genre(sender, instance, **kwargs):
+    artist_similarity.record(song_ids=[instance.song_id])
+
+
+@receiver(post_save, sender=Song)
+def profile_song_artist(sender, instance, created, **kwargs):
+    # remember_song_artist in artist_genre stashes the pre-save artist
+    previous_artist = getattr(instance, '_index_previous_artist', None)
+    if previous_artist is not None and previous_artist != instance.artist_id:
+        artist_similarity.record(artist_ids=[previous_artist, instance.artist_id])
+
+
+@receiver(post_delete, sender=Song)
+@receiver(post_delete, sender=Artist)
+def unprofile_artist(sender, instance, **kwargs):
+    # Once the song is gone its artist can no longer be looked up
+    artist_id = instance.artist_id if sender is Song else instance.pk
+    artist_similarity.record(artist_ids=[artist_id])
+
+
+@receiver(catalog_bulk_changed)
+def reprofile_artists(sender, artist_ids=(), genre_ids=(), **kwargs):
+    if artist_ids and genre_ids:
+        artist_similarity.record(artist_ids=artist_ids)
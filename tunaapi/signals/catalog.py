@@ -0,0 +1,8 @@
+from django.dispatch import Signal
+
+# Sent after bulk writes that bypass model signals (bulk_create, queryset
+# deletes) so derived tables can be recounted for the rows touched.
+# Receivers get `artist_ids`, `genre_ids` and `song_ids` keyword arguments:
+# the artists whose songs were added, removed or re-tagged, the genres
+# involved and the songs whose genre links changed.
+catalog_bulk_changed = Signal()
@@ -0,0 +1,27 @@
+"""Receivers that append every catalog write to the change log
+
+Bulk writes skip these, so the bulk endpoints and the import command log
+their rows with Change.objects.record themselves.
+"""
+from django.db.models.signals import post_delete, post_save
+from tunaapi.models import Artist, Change, Genre, Song, SongGenre
+
+LOGGED_MODELS = (Artist, Genre, Song, SongGenre)
+
+
+def log_save(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        Change.objects.record(
+            Change.CREATED if created else Change.UPDATED, [instance])
+
+
+def log_delete(sender, instance, **kwargs):
+    # Runs for every row a cascade removes, so each gets its tombstone
+    Change.objects.record(Change.DELETED, [instance])
+
+
+for model in LOGGED_MODELS:
+    post_save.connect(log_save, sender=model,
+                      dispatch_uid=f'change_log_save_{model._meta.model_name}')
+    post_delete.connect(log_delete, sender=model,
+                        dispatch_uid=f'change_log_delete_{model._meta.model_name}')
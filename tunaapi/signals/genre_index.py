@@ -0,0 +1,27 @@
+"""Receivers that keep the in-memory genre membership index up to date"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from tunaapi.models import SongGenre
+from tunaapi.search import genre_index
+from .catalog import catalog_bulk_changed
+
+
+@receiver(post_save, sender=SongGenre)
+def index_song_genre(sender, instance, created, **kwargs):
+    if created:
+        genre_index.record(added=[(instance.genre_id, instance.song_id)])
+    else:
+        # The previous song and genre are not known here
+        genre_index.record(rebuild=True)
+
+
+@receiver(post_delete, sender=SongGenre)
+def unindex_song_genre(sender, instance, **kwargs):
+    genre_index.record(removed=[(instance.genre_id, instance.song_id)])
+
+
+@receiver(catalog_bulk_changed)
+def reindex_song_genres(sender, song_ids=(), genre_ids=(), **kwargs):
+    # Imports name only the genres whose links changed, not every song
+    if song_ids or genre_ids:
+        genre_index.record(rebuild=True)
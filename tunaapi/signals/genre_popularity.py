@@ -0,0 +1,36 @@
+"""Receivers that keep GenrePopularity song counts in sync with SongGenre"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from tunaapi.jobs import enqueue
+from tunaapi.models import Genre, GenrePopularity, SongGenre
+from .catalog import catalog_bulk_changed
+
+
+@receiver(post_save, sender=Genre)
+def create_genre_popularity(sender, instance, created, **kwargs):
+    if created:
+        GenrePopularity.objects.get_or_create(genre=instance)
+
+
+@receiver(post_save, sender=SongGenre)
+def count_genre_song(sender, instance, created, **kwargs):
+    # remember_song_genre in artist_genre stashes the pre-save pair
+    previous = getattr(instance, '_index_previous', None)
+    previous_genre = previous[1] if previous else None
+    if previous_genre == instance.genre_id:
+        return
+    if previous_genre is not None:
+        GenrePopularity.objects.adjust(previous_genre, -1)
+    GenrePopularity.objects.adjust(instance.genre_id, 1)
+
+
+@receiver(post_delete, sender=SongGenre)
+def uncount_genre_song(sender, instance, **kwargs):
+    GenrePopularity.objects.adjust(instance.genre_id, -1)
+
+
+@receiver(catalog_bulk_changed)
+def recount_genre_songs(sender, genre_ids=(), **kwargs):
+    # Recounting is left to the job worker, off the request path
+    if genre_ids:
+        enqueue('genre-popularity', genre_ids)
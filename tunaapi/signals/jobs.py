@@ -0,0 +1,32 @@
+"""Receivers that queue background recompute jobs for catalog writes
+
+Song and song genre writes queue a warm-up of the stats of the artists
+involved, so the next stats read is a cache hit. Bulk writes queue the
+ArtistGenre and GenrePopularity recounts, which are too slow to run
+inside the request that made the write.
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from tunaapi.jobs import enqueue
+from tunaapi.models import Song, SongGenre
+
+
+@receiver(post_save, sender=Song)
+@receiver(post_delete, sender=Song)
+def warm_song_artist_stats(sender, instance, **kwargs):
+    # remember_song_artist in artist_genre stashes the pre-save artist
+    artist_ids = {instance.artist_id,
+                  getattr(instance, '_index_previous_artist', None)}
+    enqueue('artist-stats', artist_ids - {None})
+
+
+@receiver(post_save, sender=SongGenre)
+@receiver(post_delete, sender=SongGenre)
+def warm_song_genre_artist_stats(sender, instance, **kwargs):
+    artist_ids = {Song.objects.filter(pk=instance.song_id).values_list(
+        'artist_id', flat=True).first()}
+    # remember_song_genre in artist_genre stashes the pre-save pair
+    previous = getattr(instance, '_index_previous', None)
+    if previous is not None:
+        artist_ids.add(previous[0])
+    enqueue('artist-stats', artist_ids - {None})
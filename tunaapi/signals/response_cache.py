@@ -0,0 +1,84 @@
+"""Receivers that invalidate cached detail responses when their data changes
+
+Artist details embed the artist's songs, song details embed the artist and
+genres, and genre details embed the genre's songs, so a write invalidates
+every detail response its row appears in. With ?include=genres artist
+details also list the artist's genres, so song genre and genre writes
+invalidate the artists involved as well. Artist stats summarize the
+artist's songs and their genres, so song, song genre and genre writes also
+invalidate the stats of the artists involved. Any catalog write can move
+the related-artist and popular-genre aggregates, so it also drops their
+coalesced results. `invalidate` defers the version bumps until the write
+commits.
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from tunaapi.caching import invalidate
+from tunaapi.models import Artist, ArtistGenre, Genre, Song, SongGenre
+from .catalog import catalog_bulk_changed
+
+# Endpoints cached by `coalesced`, all computed from catalog-wide aggregates
+COALESCED_ENDPOINTS = ('artist-related', 'genre-popular')
+
+
+@receiver(post_save, sender=Artist)
+@receiver(post_delete, sender=Artist)
+def invalidate_artist(sender, instance, **kwargs):
+    invalidate('artist', [instance.pk])
+    invalidate('artist-stats', [instance.pk])
+    invalidate('coalesced', COALESCED_ENDPOINTS)
+    invalidate('song', Song.objects.filter(
+        artist_id=instance.pk).values_list('id', flat=True))
+
+
+@receiver(post_save, sender=Genre)
+@receiver(post_delete, sender=Genre)
+def invalidate_genre(sender, instance, **kwargs):
+    invalidate('genre', [instance.pk])
+    invalidate('coalesced', COALESCED_ENDPOINTS)
+    invalidate('song', SongGenre.objects.filter(
+        genre_id=instance.pk).values_list('song_id', flat=True))
+    artist_ids = list(ArtistGenre.objects.filter(
+        genre_id=instance.pk).values_list('artist_id', flat=True))
+    invalidate('artist', artist_ids)
+    invalidate('artist-stats', artist_ids)
+
+
+@receiver(post_save, sender=Song)
+@receiver(post_delete, sender=Song)
+def invalidate_song(sender, instance, **kwargs):
+    invalidate('song', [instance.pk])
+    invalidate('coalesced', COALESCED_ENDPOINTS)
+    # remember_song_artist in artist_genre stashes the pre-save artist
+    artist_ids = {instance.artist_id,
+                  getattr(instance, '_index_previous_artist', None)}
+    invalidate('artist', artist_ids - {None})
+    invalidate('artist-stats', artist_ids - {None})
+    invalidate('genre', SongGenre.objects.filter(
+        song_id=instance.pk).values_list('genre_id', flat=True))
+
+
+@receiver(post_save, sender=SongGenre)
+@receiver(post_delete, sender=SongGenre)
+def invalidate_song_genre(sender, instance, **kwargs):
+    invalidate('song', [instance.song_id])
+    invalidate('coalesced', COALESCED_ENDPOINTS)
+    invalidate('genre', [instance.genre_id])
+    artist_ids = {Song.objects.filter(pk=instance.song_id).values_list(
+        'artist_id', flat=True).first()}
+    # remember_song_genre in artist_genre stashes the pre-save pair
+    previous = getattr(instance, '_index_previous', None)
+    if previous is not None:
+        invalidate('genre', [previous[1]])
+        artist_ids.add(previous[0])
+    invalidate('artist', artist_ids - {None})
+    invalidate('artist-stats', artist_ids - {None})
+
+
+@receiver(catalog_bulk_changed)
+def invalidate_bulk(sender, artist_ids=(), genre_ids=(), song_ids=(), **kwargs):
+    invalidate('artist', artist_ids)
+    invalidate('artist-stats', artist_ids)
+    invalidate('genre', genre_ids)
+    invalidate('song', song_ids)
+    invalidate('coalesced', COALESCED_ENDPOINTS)
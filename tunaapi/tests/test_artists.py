@@ -1,7 +1,15 @@
+import json
+from unittest import mock
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
 from rest_framework.test import APITestCase
 
-from tunaapi.models import Artist
+from tunaapi.jobs import drain
+from tunaapi.jobs.worker import claim, run
+from tunaapi.models import (Artist, ArtistGenre, Change, GenrePopularity, Job,
+                            Song, SongGenre)
 from .utils import create_data, refresh_data
 
 
@@ -36,6 +44,74 @@ class TestArtists(APITestCase):
         self.assertEqual(db_artist.age, new_artist["age"])
         self.assertEqual(db_artist.bio, new_artist["bio"])
 
+    def test_bulk_create(self):
+        new_artists = [
+            {"name": self.faker.name(), "age": 30, "bio": "First"},
+            {"name": self.faker.name(), "bio": "No age"},
+            {"name": self.faker.name(), "age": 40, "bio": "Third"},
+        ]
+        response = self.client.post("/artists/bulk", new_artists, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        data = response.data
+        self.assertEqual(
+            [artist["name"] for artist in data["created"]],
+            [new_artists[0]["name"], new_artists[2]["name"]])
+        self.assertEqual(len(data["errors"]), 1)
+        self.assertEqual(data["errors"][0]["index"], 1)
+        self.assertTrue("age" in data["errors"][0]["errors"])
+        self.assertTrue(
+            Artist.objects.filter(pk=data["created"][0]["id"]).exists())
+
+    def test_bulk_create_rejects_non_list(self):
+        response = self.client.post(
+            "/artists/bulk", {"name": "Solo"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_retrieve_unknown_then_bulk_created(self):
+        next_id = Artist.all_objects.order_by("-id").first().id + 1
+        response = self.client.get(f"/artists/{next_id}")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        response = self.client.post(
+            "/artists/bulk", [{"name": "Late", "age": 30, "bio": "Bio"}],
+            format="json")
+        self.assertEqual(response.data["created"][0]["id"], next_id)
+
+        response = self.client.get(f"/artists/{next_id}")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["name"], "Late")
+
+    def test_details_cached_under_the_int_pk(self):
+        artist = self.artists[0]
+        url = f"/artists/0{artist.id}"
+        self.assertEqual(self.client.get(url).data["name"], artist.name)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put(
+                f"/artists/{artist.id}",
+                {"name": "Renamed", "age": artist.age, "bio": artist.bio},
+                format="json")
+        self.assertEqual(self.client.get(url).data["name"], "Renamed")
+
+        response = self.client.get("/artists/first")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_details_invalidated_on_commit(self):
+        artist = self.artists[0]
+        url = f"/artists/{artist.id}"
+        name = self.client.get(url).data["name"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            artist.name = "Pending"
+            artist.save()
+            # Until the write commits, readers keep the committed response
+            # rather than caching uncommitted data under a fresh version
+            with self.assertNumQueries(0):
+                self.assertEqual(self.client.get(url).data["name"], name)
+        self.assertEqual(self.client.get(url).data["name"], "Pending")
+
     def test_delete(self):
         artist_id = Artist.objects.all()[0].id
         response = self.client.delete(f"/artists/{artist_id}")
@@ -46,6 +122,123 @@ class TestArtists(APITestCase):
         artists = Artist.objects.filter(id=artist_id)
         self.assertEqual(len(artists), 0)
 
+    def add_discography(self, artist, count):
+        """`count` more songs for the artist, tagged with two genres each"""
+        songs = Song.objects.bulk_create([
+            Song(title=f"Song {number}", artist=artist, album="Album",
+                 length=100) for number in range(count)])
+        SongGenre.objects.bulk_create([
+            SongGenre(song=song, genre=genre)
+            for song in songs for genre in self.genres[:2]])
+        ArtistGenre.objects.rebuild([artist.id])
+        GenrePopularity.objects.repair()
+        return songs
+
+    def assert_counters_consistent(self):
+        stored = set(ArtistGenre.objects.values_list(
+            "artist_id", "genre_id", "song_count", "is_dominant"))
+        ArtistGenre.objects.rebuild()
+        self.assertEqual(stored, set(ArtistGenre.objects.values_list(
+            "artist_id", "genre_id", "song_count", "is_dominant")))
+        self.assertEqual(GenrePopularity.objects.repair(), [])
+
+    def test_soft_deleted_filtered_on_reads_only(self):
+        # Derived data and indexes read the plain tables, only the read
+        # endpoints pay for the soft-delete subquery
+        for queryset in (Song.objects.all(), SongGenre.objects.all()):
+            self.assertNotIn("deleted_at", str(queryset.query))
+        for queryset in (Song.objects.live(), SongGenre.objects.live()):
+            self.assertIn("deleted_at", str(queryset.query))
+        self.assertNotIn("INNER JOIN", str(SongGenre.objects.live().query))
+
+    def test_delete_cascades_set_based(self):
+        artist = self.artists[0]
+        self.add_discography(artist, 20)
+        song_ids = set(artist.songs.values_list("id", flat=True))
+        link_ids = set(SongGenre.objects.filter(
+            song__artist=artist).values_list("id", flat=True))
+        latest = Change.objects.latest("id").id
+        Job.objects.all().delete()
+
+        with CaptureQueriesContext(connection) as many_songs:
+            response = self.client.delete(f"/artists/{artist.id}")
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        self.assertFalse(Artist.all_objects.filter(id=artist.id).exists())
+        self.assertFalse(Song.objects.filter(id__in=song_ids).exists())
+        self.assertFalse(SongGenre.objects.filter(id__in=link_ids).exists())
+        self.assertFalse(ArtistGenre.objects.filter(artist=artist).exists())
+        self.assert_counters_consistent()
+
+        tombstones = set(Change.objects.filter(id__gt=latest).values_list(
+            "resource", "object_id", "action"))
+        self.assertEqual(tombstones, {("artist", artist.id, "deleted")} |
+                         {("song", song_id, "deleted") for song_id in song_ids} |
+                         {("songgenre", link_id, "deleted")
+                          for link_id in link_ids})
+
+        # The statements do not grow with the discography
+        other = self.artists[1]
+        Job.objects.all().delete()
+        with CaptureQueriesContext(connection) as few_songs:
+            self.client.delete(f"/artists/{other.id}")
+        self.assertEqual(len(few_songs), len(many_songs))
+
+    def test_delete_in_background(self):
+        artist = self.artists[0]
+        self.add_discography(artist, 5)
+        song_ids = set(artist.songs.values_list("id", flat=True))
+        latest = Change.objects.latest("id").id
+        Job.objects.all().delete()
+
+        response = self.client.delete(f"/artists/{artist.id}?background=1")
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+
+        # Gone from every read and counter at once, only the rows remain
+        response = self.client.get(f"/artists/{artist.id}")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertNotIn(artist.id, [
+            row["id"] for row in self.client.get("/artists").data])
+        self.assertFalse(song_ids & {
+            row["id"] for row in self.client.get("/songs").data})
+        self.assertFalse(song_ids & {
+            row["song"]["id"] for row in self.client.get("/songgenres").data})
+        self.assertFalse(song_ids & {
+            row["id"] for row in
+            self.client.get("/songs?q=Song").data["results"]})
+        exported = b"".join(self.client.get("/export").streaming_content)
+        self.assertFalse(song_ids & {
+            json.loads(line)["id"] for line in exported.splitlines()})
+        self.assert_counters_consistent()
+        self.assertIn(("artist", artist.id), Change.objects.filter(
+            id__gt=latest, action="deleted").values_list(
+                "resource", "object_id"))
+        self.assertEqual(
+            Song.objects.filter(artist=artist).count(), len(song_ids))
+
+        # The recounts queued alongside the purge have nothing left to do
+        Job.objects.exclude(kind="artist-purge").delete()
+        changes = Change.objects.count()
+        with mock.patch("tunaapi.deletion.artists.PURGE_BATCH_SIZE", 2):
+            # One batch per run, counters consistent after each
+            self.assertTrue(run(claim()))
+            self.assertEqual(
+                Song.objects.filter(artist=artist).count(),
+                len(song_ids) - 2)
+            self.assertEqual(self.queued_purge().ids, [artist.id])
+            self.assert_counters_consistent()
+            drain()
+
+        self.assertFalse(Job.objects.filter(kind="artist-purge").exists())
+        self.assertFalse(Artist.all_objects.filter(id=artist.id).exists())
+        self.assertFalse(Song.objects.filter(artist=artist).exists())
+        self.assert_counters_consistent()
+        # Tombstones were written by the soft delete, not again
+        self.assertEqual(Change.objects.count(), changes)
+
+    def queued_purge(self):
+        return Job.objects.get(kind="artist-purge", status=Job.QUEUED)
+
     def test_update(self):
         artist_id = Artist.objects.all()[0].id
         updated_artist = {
@@ -83,6 +276,45 @@ class TestArtists(APITestCase):
         self.assertTrue("age" in first_artist)
         self.assertTrue("bio" in first_artist)
 
+    def test_list_paginated(self):
+        response = self.client.get("/artists?page_size=4&ordering=-age")
+        data = response.data
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(data["results"]), 4)
+        self.assertIsNone(data["previous"])
+        self.assertIsNotNone(data["next"])
+        expected = sorted(self.artists, key=lambda artist: (-artist.age, -artist.id))
+        self.assertEqual([artist["id"] for artist in data["results"]],
+                         [artist.id for artist in expected[:4]])
+
+    def test_list_sparse_fields(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/artists?fields=id,name")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('"bio"', queries[0]["sql"])
+        self.assertEqual(response.data, [
+            {"id": artist["id"], "name": artist["name"]}
+            for artist in self.client.get("/artists").data])
+
+        response = self.client.get("/artists?fields=name&page_size=2&ordering=age")
+        self.assertEqual([list(artist) for artist in response.data["results"]],
+                         [["name"], ["name"]])
+
+    def test_details_sparse_fields(self):
+        artist = self.artists[0]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f"/artists/{artist.id}?fields=name")
+
+        self.assertEqual(response.data, {"name": artist.name})
+        # No songs prefetched when neither songs nor song_count is asked for
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('"bio"', queries[0]["sql"])
+
+        data = self.client.get(f"/artists/{artist.id}?fields=song_count").data
+        self.assertEqual(data, {"song_count": artist.songs.count()})
+
     def test_details(self):
         artist = Artist.objects.all()[0]
         response = self.client.get(f"/artists/{artist.id}")
@@ -104,3 +336,270 @@ class TestArtists(APITestCase):
         self.assertTrue("title" in first_song)
         self.assertTrue("album" in first_song)
         self.assertTrue("length" in first_song)
+
+    def test_related(self):
+        artist = self.artists[0]
+        other = self.artists[1]
+        genre = self.genres[0]
+
+        # Tag every song of the other artist with this artist's genre twice
+        # over, so it becomes the other artist's most common genre
+        for song in other.songs.all():
+            SongGenre.objects.create(song=song, genre=genre)
+        song = Song.objects.create(
+            title="Extra", artist=other, album="Extra", length=100)
+        SongGenre.objects.create(song=song, genre=genre)
+
+        with self.assertNumQueries(2):
+            response = self.client.get(f"/artists/{artist.id}/related")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data, {"artists": [{"id": other.id, "name": other.name}]})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            song.delete()
+            SongGenre.objects.filter(song__artist=other, genre=genre).delete()
+        response = self.client.get(f"/artists/{artist.id}/related")
+        self.assertEqual(response.data, {"artists": []})
+
+    def profile(self, artist):
+        return dict(ArtistGenre.objects.filter(artist=artist).values_list(
+            "genre_id", "song_count"))
+
+    def cosine(self, first, second):
+        first, second = self.profile(first), self.profile(second)
+        dot = sum(count * second.get(genre, 0) for genre, count in first.items())
+        norms = (sum(count ** 2 for count in first.values())
+                 * sum(count ** 2 for count in second.values())) ** 0.5
+        return dot / norms
+
+    def test_similar(self):
+        artist, other, third = self.artists[:3]
+        genre = self.genres[0]
+        # other shares one song's worth of the genre, third all of its songs
+        SongGenre.objects.create(song=other.songs.all()[0], genre=genre)
+        for song in third.songs.all():
+            SongGenre.objects.create(song=song, genre=genre)
+        expected = sorted([other, third], key=lambda similar: (
+            -self.cosine(artist, similar), similar.id))
+
+        response = self.client.get(f"/artists/{artist.id}/similar")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.data["artists"]
+        self.assertEqual([similar["id"] for similar in data],
+                         [similar.id for similar in expected])
+        for similar, expected_artist in zip(data, expected):
+            self.assertEqual(similar["name"], expected_artist.name)
+            self.assertAlmostEqual(
+                similar["score"], self.cosine(artist, expected_artist), places=5)
+
+        # Both share one of two genres, the tie goes to the lower id
+        data = self.client.get(
+            f"/artists/{artist.id}/similar?k=1&metric=jaccard").data["artists"]
+        first = min(other, third, key=lambda similar: similar.id)
+        self.assertEqual(data, [{"id": first.id, "name": first.name, "score": 0.5}])
+
+        with self.assertNumQueries(2):
+            self.client.get(f"/artists/{artist.id}/similar")
+
+    def test_similar_invalid_parameters(self):
+        artist = self.artists[0]
+        for query in ("k=0", "k=101", "k=ten", "metric=euclidean"):
+            response = self.client.get(f"/artists/{artist.id}/similar?{query}")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_similar_tracks_writes(self):
+        artist, other = self.artists[:2]
+        genre = self.genres[0]
+        url = f"/artists/{artist.id}/similar"
+        self.assertEqual(self.client.get(url).data, {"artists": []})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            song_genre = SongGenre.objects.create(
+                song=other.songs.all()[0], genre=genre)
+        self.assertEqual([similar["id"] for similar in self.client.get(url).data["artists"]],
+                         [other.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            song_genre.delete()
+        self.assertEqual(self.client.get(url).data, {"artists": []})
+
+    def test_related_tie_break(self):
+        artist = self.artists[0]
+        song = artist.songs.all()[0]
+        # An equal count of a lower-id genre wins the tie, a higher one loses
+        lower, higher = sorted(self.genres[1:3], key=lambda genre: genre.id)
+        SongGenre.objects.filter(song__artist=artist).exclude(
+            song=song).delete()
+        SongGenre.objects.create(song=song, genre=higher)
+        dominant = ArtistGenre.objects.get(artist=artist, is_dominant=True)
+        self.assertEqual(dominant.genre_id, min(higher.id, self.genres[0].id))
+
+        SongGenre.objects.create(song=song, genre=lower)
+        dominant = ArtistGenre.objects.get(artist=artist, is_dominant=True)
+        self.assertEqual(dominant.genre_id, min(
+            lower.id, higher.id, self.genres[0].id))
+
+    def test_related_index_follows_song_artist(self):
+        song = self.artists[0].songs.all()[0]
+        song.artist = self.artists[1]
+        song.save()
+
+        counts = dict(ArtistGenre.objects.filter(
+            artist=self.artists[1]).values_list("genre_id", "song_count"))
+        self.assertEqual(counts[self.genres[0].id], 1)
+
+    def test_details_cached(self):
+        artist = self.artists[0]
+        first = self.client.get(f"/artists/{artist.id}")
+        etag = first["ETag"]
+
+        with self.assertNumQueries(0):
+            second = self.client.get(f"/artists/{artist.id}")
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second["ETag"], etag)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                f"/artists/{artist.id}", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b"")
+
+        # A new song for the artist invalidates the cached response
+        with self.captureOnCommitCallbacks(execute=True):
+            Song.objects.create(
+                title="New", artist=artist, album="New", length=100)
+        response = self.client.get(
+            f"/artists/{artist.id}", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.data["song_count"], artist.songs.count())
+
+    def expected_stats(self, artist):
+        songs = list(Song.objects.filter(artist=artist))
+        lengths = [song.length for song in songs]
+        genres = ArtistGenre.objects.filter(artist=artist).order_by(
+            "-song_count", "genre_id")
+        return {
+            "id": artist.id,
+            "song_count": len(songs),
+            "total_length": sum(lengths),
+            "average_length": round(sum(lengths) / len(lengths), 2)
+            if lengths else None,
+            "min_length": min(lengths, default=None),
+            "max_length": max(lengths, default=None),
+            "album_count": len({song.album for song in songs}),
+            "genres": [
+                {"id": row.genre_id, "description": row.genre.description,
+                 "song_count": row.song_count}
+                for row in genres
+            ],
+        }
+
+    def test_stats(self):
+        artist = self.artists[0]
+        # A second genre and a repeated album on the artist's songs
+        song = Song.objects.create(
+            title="Extra", artist=artist, album=artist.songs.all()[0].album,
+            length=7)
+        SongGenre.objects.create(song=song, genre=self.genres[1])
+
+        response = self.client.get(f"/artists/{artist.id}/stats")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, self.expected_stats(artist))
+        self.assertEqual(len(response.data["genres"]), 2)
+
+        empty = Artist.objects.create(name="Empty", age=30, bio="")
+        response = self.client.get(f"/artists/{empty.id}/stats")
+        self.assertEqual(response.data, {
+            "id": empty.id, "song_count": 0, "total_length": 0,
+            "average_length": None, "min_length": None, "max_length": None,
+            "album_count": 0, "genres": [],
+        })
+
+        response = self.client.get("/artists/999999/stats")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_batch_stats(self):
+        first, second = self.artists[:2]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                f"/artists/stats?ids={second.id},999999,{first.id}")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # One grouped query for the songs and one for the genres
+        self.assertEqual(len(queries), 2)
+        self.assertEqual(response.data["artists"], [
+            self.expected_stats(second), self.expected_stats(first)])
+
+        response = self.client.get("/artists/stats")
+        self.assertEqual(response.data["artists"], [
+            self.expected_stats(artist)
+            for artist in sorted(self.artists, key=lambda artist: artist.id)])
+
+    def test_batch_stats_invalid_ids(self):
+        for ids in ("1,x", ",".join(str(n) for n in range(1001))):
+            with self.subTest(ids=ids[:10]):
+                response = self.client.get(f"/artists/stats?ids={ids}")
+                self.assertEqual(response.status_code,
+                                 status.HTTP_400_BAD_REQUEST)
+
+    def test_stats_cached_until_songs_change(self):
+        artist = self.artists[0]
+        url = f"/artists/{artist.id}/stats"
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            self.client.get(url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            song = Song.objects.create(
+                title="New", artist=artist, album="New album", length=500)
+        self.assertEqual(self.client.get(url).data, self.expected_stats(artist))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            SongGenre.objects.create(song=song, genre=self.genres[2])
+        self.assertEqual(self.client.get(url).data, self.expected_stats(artist))
+
+        # Moving a song away refreshes both artists
+        other = self.artists[1]
+        self.client.get(f"/artists/{other.id}/stats")
+        with self.captureOnCommitCallbacks(execute=True):
+            song.artist = other
+            song.save()
+        self.assertEqual(self.client.get(url).data, self.expected_stats(artist))
+        self.assertEqual(self.client.get(f"/artists/{other.id}/stats").data,
+                         self.expected_stats(other))
+
+    def test_include(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/artists?include=songs,genres")
+        self.assertEqual(len(queries), 3)
+        data = response.data
+        self.assertEqual(len(data["included"]["songs"]), len(self.songs))
+        self.assertEqual(
+            [genre["id"] for genre in data["included"]["genres"]],
+            sorted(genre.id for genre in self.genres))
+        for row in data["results"]:
+            artist = Artist.objects.get(pk=row["id"])
+            self.assertEqual(row["song_ids"], sorted(
+                artist.songs.values_list("id", flat=True)))
+            self.assertEqual(row["genre_ids"], sorted(
+                ArtistGenre.objects.filter(artist=artist)
+                .values_list("genre_id", flat=True)))
+
+    def test_details_include_invalidated_by_genre_writes(self):
+        artist = self.artists[0]
+        url = f"/artists/{artist.id}?include=genres"
+        self.assertEqual(len(self.client.get(url).data["included"]["genres"]), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            SongGenre.objects.create(
+                song=artist.songs.all()[0], genre=self.genres[1])
+        self.assertEqual(len(self.client.get(url).data["included"]["genres"]), 2)
+
+        genre = self.genres[1]
+        genre.description = "Renamed"
+        with self.captureOnCommitCallbacks(execute=True):
+            genre.save()
+        self.assertIn({"id": genre.id, "description": "Renamed"},
+                      self.client.get(url).data["included"]["genres"])
@@ -0,0 +1,73 @@
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.test import AsyncClient
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from tunaapi.search import genre_index
+from .utils import create_data, refresh_data
+
+
+class TestAsyncCatalog(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        create_data(cls)
+
+    def setUp(self):
+        refresh_data(self)
+        self.async_client = AsyncClient()
+
+    async def assert_same_as_sync(self, url):
+        response = await self.async_client.get(f"/async{url}")
+        self.assertEqual(response.status_code, status.HTTP_200_OK, url)
+        self.assertEqual(response["Content-Type"], "application/json")
+
+        sync_response = await sync_to_async(self.client.get)(url)
+        content = response.content.replace(b"/async/", b"/")
+        self.assertEqual(json.loads(content),
+                         json.loads(sync_response.content), url)
+
+    async def test_matches_sync_endpoints(self):
+        artist = self.artists[0]
+        genre = self.genres[0]
+        song = self.songs[0]
+        for url in ["/artists", "/artists?page_size=3&ordering=-name",
+                    f"/artists/{artist.id}", f"/artists/{artist.id}/related",
+                    "/genres", f"/genres/{genre.id}", "/genres/popular",
+                    "/genres/popular?limit=2", "/songs", "/songs?min_length=60",
+                    "/songs?page_size=2", f"/songs/{song.id}", "/songgenres"]:
+            await self.assert_same_as_sync(url)
+
+    async def test_genre_filters_load_a_cold_index(self):
+        genre = self.genres[0]
+        for url in [f"/songs?genre={genre.id}",
+                    f"/songs?genre_any={genre.id},{self.genres[1].id}"]:
+            # Cold, as in a fresh process or after a SongGenre write
+            genre_index._songs = None
+            await self.assert_same_as_sync(url)
+
+    async def test_errors(self):
+        response = await self.async_client.get("/async/songs/0")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        response = await self.async_client.get("/async/genres/popular?limit=x")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = await self.async_client.get(
+            "/async/songs?page_size=2&ordering=artist")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    async def test_instrumented(self):
+        response = await self.async_client.get(
+            f"/async/artists/{self.artists[0].id}")
+        self.assertIn('desc="2 queries"', response["Server-Timing"])
+
+    async def test_concurrent_requests_instrumented_separately(self):
+        responses = await asyncio.gather(*(
+            self.async_client.get(f"/async/artists/{artist.id}")
+            for artist in self.artists[:4]))
+        for response in responses:
+            self.assertIn('desc="2 queries"', response["Server-Timing"])
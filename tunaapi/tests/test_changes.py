@@ -0,0 +1,114 @@
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from tunaapi.models import Artist, Change, Song, SongGenre
+from .utils import create_data, refresh_data
+
+
+class TestChanges(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        create_data(cls)
+
+    def setUp(self):
+        refresh_data(self)
+
+    def latest(self):
+        return self.client.get("/changes?since=latest").data["cursor"]
+
+    def changes_since(self, cursor, **params):
+        return self.client.get("/changes", {"since": cursor, **params}).data
+
+    def summary(self, data):
+        return [(change["resource"], change["object_id"], change["action"])
+                for change in data["results"]]
+
+    def test_latest(self):
+        response = self.client.get("/changes?since=latest")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["results"], [])
+        self.assertEqual(response.data["cursor"], Change.objects.latest("id").id)
+
+    def test_view_writes_are_logged(self):
+        cursor = self.latest()
+        response = self.client.post("/artists", {
+            "name": "New", "age": 30, "bio": "Bio"}, format="json")
+        artist_id = response.data["id"]
+        self.client.put(f"/artists/{artist_id}", {
+            "name": "Renamed", "age": 31, "bio": "Bio"}, format="json")
+
+        data = self.changes_since(cursor)
+        self.assertEqual(self.summary(data), [
+            ("artist", artist_id, "created"), ("artist", artist_id, "updated")])
+        self.assertEqual(data["results"][1]["data"], {
+            "id": artist_id, "name": "Renamed", "age": 31, "bio": "Bio"})
+        self.assertEqual(data["cursor"], data["results"][-1]["id"])
+        self.assertIsNone(data["next"])
+
+        # Nothing new since the returned cursor
+        self.assertEqual(self.changes_since(data["cursor"])["results"], [])
+
+    def test_cascade_deletes_leave_tombstones(self):
+        artist = self.artists[0]
+        song_ids = set(artist.songs.values_list("id", flat=True))
+        link_ids = set(SongGenre.objects.filter(
+            song__artist=artist).values_list("id", flat=True))
+        cursor = self.latest()
+
+        self.client.delete(f"/artists/{artist.id}")
+        changes = self.changes_since(cursor)["results"]
+        self.assertTrue(all(change["action"] == "deleted" and
+                            change["data"] is None for change in changes))
+        deleted = {(change["resource"], change["object_id"]) for change in changes}
+        self.assertEqual(deleted, {("artist", artist.id)}
+                         | {("song", song_id) for song_id in song_ids}
+                         | {("songgenre", link_id) for link_id in link_ids})
+
+    def test_bulk_writes_are_logged(self):
+        cursor = self.latest()
+        response = self.client.post("/songs/bulk", [
+            {"title": "Bulk", "artist_id": self.artists[0].id,
+             "album": "Bulk", "length": 100}] * 2, format="json")
+        created = [song["id"] for song in response.data["created"]]
+
+        data = self.changes_since(cursor)
+        self.assertEqual(self.summary(data),
+                         [("song", song_id, "created") for song_id in created])
+        self.assertEqual(data["results"][0]["data"]["artist_id"],
+                         self.artists[0].id)
+
+    def test_paginated(self):
+        cursor = self.latest()
+        for number in range(5):
+            Artist.objects.create(name=f"Artist {number}", age=20, bio="")
+
+        seen = []
+        data = self.changes_since(cursor, page_size=2)
+        while True:
+            seen.extend(change["object_id"] for change in data["results"])
+            if data["next"] is None:
+                break
+            self.assertIn(f"since={data['cursor']}", data["next"])
+            data = self.client.get(data["next"]).data
+        self.assertEqual(seen, list(Artist.objects.filter(
+            name__startswith="Artist ").order_by("id").values_list("id", flat=True)))
+
+    def test_song_genre_changes(self):
+        cursor = self.latest()
+        song = Song.objects.create(
+            title="New", artist=self.artists[0], album="A", length=5)
+        link = SongGenre.objects.create(song=song, genre=self.genres[0])
+        link_id = link.id
+        link.delete()
+        self.assertEqual(self.summary(self.changes_since(cursor)), [
+            ("song", song.id, "created"), ("songgenre", link_id, "created"),
+            ("songgenre", link_id, "deleted")])
+
+    def test_invalid_parameters(self):
+        for params in ({"since": "x"}, {"since": "-1"}, {"page_size": "0"},
+                       {"page_size": "1001"}):
+            with self.subTest(params=params):
+                response = self.client.get("/changes", params)
+                self.assertEqual(response.status_code,
+                                 status.HTTP_400_BAD_REQUEST)
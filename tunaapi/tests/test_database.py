@@ -0,0 +1,61 @@
+import json
+import sqlite3
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from tunaapi.db.sqlite3 import DEFAULT_PRAGMAS, configure_connection
+
+
+class TestSQLiteConnection(TestCase):
+
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f"PRAGMA {name}")
+            return cursor.fetchone()[0]
+
+    def test_pragmas_applied(self):
+        self.assertEqual(self.pragma("synchronous"), 1)
+        self.assertEqual(self.pragma("cache_size"), DEFAULT_PRAGMAS["cache_size"])
+        self.assertEqual(self.pragma("busy_timeout"), 5000)
+        self.assertEqual(connection.transaction_mode, "IMMEDIATE")
+
+    def test_wal_on_file_database(self):
+        with tempfile.TemporaryDirectory() as directory:
+            conn = sqlite3.connect(Path(directory) / "db.sqlite3")
+            configure_connection(conn, DEFAULT_PRAGMAS)
+            self.assertEqual(
+                conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+            conn.close()
+
+
+class TestImmediateTransactions(TransactionTestCase):
+
+    def test_atomic_begins_immediate(self):
+        with CaptureQueriesContext(connection) as queries:
+            with transaction.atomic():
+                pass
+        self.assertEqual(queries[0]["sql"], "BEGIN IMMEDIATE")
+
+
+class TestStressDatabase(TransactionTestCase):
+
+    def setUp(self):
+        call_command("seed_catalog", artists=3, genres=3, songs=20, links=30,
+                     stdout=StringIO())
+
+    def test_reports_both_phases(self):
+        out = StringIO()
+        call_command("stress_database", threads=3, seconds=0.3, stdout=out)
+
+        phases = json.loads(out.getvalue())["phases"]
+        self.assertEqual(set(phases), {"stock", "tuned"})
+        tuned = phases["tuned"]
+        self.assertGreater(tuned["reads"], 0)
+        self.assertGreater(tuned["writes"], 0)
+        self.assertEqual(tuned["locked_errors"], 0)
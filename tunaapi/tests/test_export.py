@@ -0,0 +1,76 @@
+import csv
+import gzip
+import io
+import json
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from tunaapi.models import Song, SongGenre
+from .utils import create_data, refresh_data
+
+
+class TestExport(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        create_data(cls)
+
+    def setUp(self):
+        refresh_data(self)
+
+    def expected(self):
+        rows = []
+        for song in Song.objects.select_related("artist").order_by("id"):
+            rows.append({
+                "id": song.id, "title": song.title,
+                "artist_id": song.artist_id, "artist": song.artist.name,
+                "album": song.album, "length": song.length,
+                "genres": list(SongGenre.objects.filter(song=song)
+                               .order_by("genre_id")
+                               .values_list("genre__description", flat=True)),
+            })
+        return rows
+
+    def test_ndjson(self):
+        # An untagged song and one with two genres
+        untagged = Song.objects.create(
+            title="Quiet", artist=self.artists[0], album="A", length=10)
+        SongGenre.objects.create(song=self.songs[0], genre=self.genres[5])
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/export")
+            content = b"".join(response.streaming_content)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        self.assertIn('filename="catalog.ndjson"',
+                      response["Content-Disposition"])
+
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(rows, self.expected())
+        self.assertEqual(rows[-1]["id"], untagged.id)
+        self.assertEqual(rows[-1]["genres"], [])
+
+    def test_csv_gzipped(self):
+        response = self.client.get("/export?format=csv&gzip=1")
+        self.assertEqual(response["Content-Type"], "application/gzip")
+        self.assertIn('filename="catalog.csv.gz"',
+                      response["Content-Disposition"])
+
+        text = gzip.decompress(b"".join(response.streaming_content)).decode()
+        rows = list(csv.DictReader(io.StringIO(text)))
+        expected = self.expected()
+        self.assertEqual(len(rows), len(expected))
+        for row, song in zip(rows, expected):
+            self.assertEqual(row["title"], song["title"])
+            self.assertEqual(row["artist"], song["artist"])
+            self.assertEqual(int(row["length"]), song["length"])
+            self.assertEqual(row["genres"].split("|"), song["genres"])
+
+    def test_unknown_format(self):
+        response = self.client.get("/export?format=xml")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("format", response.json())
@@ -0,0 +1,103 @@
+import datetime
+import decimal
+import uuid
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+from django.test import SimpleTestCase
+
+from tunaapi.models import Artist, Song, SongGenre
+from tunaapi.renderers import FastJSONRenderer
+from tunaapi.views import ArtistSerializer, SongSerializer
+from tunaapi.views.song_genre import AllSongGenreSerializer
+from .utils import create_data, refresh_data
+
+
+class TestFastJSONRenderer(SimpleTestCase):
+
+    def assert_same_bytes(self, data, media_type=None):
+        self.assertEqual(FastJSONRenderer().render(data, media_type),
+                         JSONRenderer().render(data, media_type))
+
+    def test_matches_json_renderer(self):
+        for data in [
+            {"id": 1, "title": "Café \u2028\u2029 \"quoted\" \\ \n\t\x01 ☃"},
+            [None, True, False, 0, -1, 2 ** 63 - 1, "", [], {}],
+            {1: "int key", "nested": {"list": (1, 2), "set": {3}}},
+            {"when": datetime.datetime(2023, 1, 2, 3, 4, 5, 678901,
+                                       tzinfo=datetime.timezone.utc),
+             "day": datetime.date(2023, 1, 2),
+             "time": datetime.time(3, 4, 5, 678901),
+             "price": decimal.Decimal("1.10"),
+             "uuid": uuid.UUID(int=7),
+             "float": 0.1},
+            # Beyond orjson's integer range, rendered by JSONRenderer
+            {"big": 2 ** 70},
+        ]:
+            self.assert_same_bytes(data)
+
+    def test_indent_falls_back(self):
+        self.assert_same_bytes({"a": [1, 2]}, "application/json; indent=4")
+
+    def test_none(self):
+        self.assertEqual(FastJSONRenderer().render(None), b"")
+
+
+class TestFastListContract(APITestCase):
+    """Fast list output is byte-identical to the serializers it replaces"""
+
+    @classmethod
+    def setUpTestData(cls):
+        create_data(cls)
+        artist = cls.artists[0]
+        cls.songs.append(Song.objects.create(
+            title="Línea\u2028«nueva»", artist=artist, album="Ä", length=61))
+
+    def setUp(self):
+        refresh_data(self)
+
+    def expected(self, serializer_class, queryset, **kwargs):
+        return JSONRenderer().render(
+            serializer_class(queryset.order_by("pk"), many=True, **kwargs).data)
+
+    def assert_page_matches(self, url, serializer_class, model):
+        response = self.client.get(url)
+        data = response.data
+        by_id = model.objects.in_bulk([row["id"] for row in data["results"]])
+        results = serializer_class(
+            [by_id[row["id"]] for row in data["results"]], many=True).data
+        self.assertEqual(response.content, JSONRenderer().render({
+            "next": data["next"], "previous": data["previous"], "results": results}))
+
+    def test_songs(self):
+        self.assertEqual(self.client.get("/songs").content,
+                         self.expected(SongSerializer, Song.objects.all()))
+        self.assertEqual(
+            self.client.get("/songs?min_length=60").content,
+            self.expected(SongSerializer, Song.objects.filter(length__gte=60)))
+        self.assertEqual(
+            self.client.get("/songs?fields=album,id").content,
+            self.expected(SongSerializer, Song.objects.all(), fields=("id", "album")))
+        self.assertEqual(
+            b"".join(self.client.get("/songs?stream=1").streaming_content),
+            self.expected(SongSerializer, Song.objects.all()))
+
+    def test_songs_paginated(self):
+        self.assert_page_matches("/songs?page_size=3&ordering=-title",
+                                 SongSerializer, Song)
+
+    def test_song_genres(self):
+        self.assertEqual(
+            self.client.get("/songgenres").content,
+            self.expected(AllSongGenreSerializer, SongGenre.objects.all()))
+        self.assertEqual(
+            b"".join(self.client.get("/songgenres?stream=1").streaming_content),
+            self.expected(AllSongGenreSerializer, SongGenre.objects.all()))
+        self.assert_page_matches("/songgenres?page_size=4",
+                                 AllSongGenreSerializer, SongGenre)
+
+    def test_artists(self):
+        self.assertEqual(self.client.get("/artists").content,
+                         self.expected(ArtistSerializer, Artist.objects.all()))
+        self.assert_page_matches("/artists?page_size=4&ordering=age",
+                                 ArtistSerializer, Artist)
@@ -1,7 +1,10 @@
+from io import StringIO
+
+from django.core.management import call_command
 from rest_framework import status
 from rest_framework.test import APITestCase
 
-from tunaapi.models import Genre, SongGenre
+from tunaapi.models import Genre, GenrePopularity, SongGenre
 
 from .utils import create_data, refresh_data
 
@@ -69,6 +72,23 @@ class TestGenres(APITestCase):
         self.assertTrue("id" in first_genre)
         self.assertTrue("description" in first_genre)
 
+    def test_list_include(self):
+        response = self.client.get("/genres?include=songs&page_size=4")
+        data = response.data
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        expected = SongGenre.objects.filter(
+            genre_id__in=[genre["id"] for genre in data["results"]])
+        for genre in data["results"]:
+            self.assertEqual(genre["song_ids"], sorted(
+                expected.filter(genre_id=genre["id"])
+                .values_list("song_id", flat=True)))
+        songs = data["included"]["songs"]
+        self.assertEqual([song["id"] for song in songs],
+                         sorted(expected.values_list("song_id", flat=True)))
+        self.assertEqual(songs[0].keys(),
+                         {"id", "title", "artist_id", "album", "length"})
+
     def test_details(self):
         genre = Genre.objects.all()[0]
         response = self.client.get(f"/genres/{genre.id}")
@@ -89,3 +109,68 @@ class TestGenres(APITestCase):
         self.assertTrue("artist_id" in first_song)
         self.assertTrue("album" in first_song)
         self.assertTrue("length" in first_song)
+
+    def expected_popular(self):
+        counts = [
+            (genre.id, SongGenre.objects.filter(genre=genre).count())
+            for genre in Genre.objects.all()
+        ]
+        return sorted(counts, key=lambda count: (-count[1], count[0]))
+
+    def test_popular(self):
+        response = self.client.get("/genres/popular")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        genres = response.data["genres"]
+        self.assertEqual(
+            [(genre["id"], genre["song_count"]) for genre in genres],
+            self.expected_popular())
+        self.assertTrue("description" in genres[0])
+
+        response = self.client.get("/genres/popular?limit=3")
+        self.assertEqual(len(response.data["genres"]), 3)
+
+        response = self.client.get("/genres/popular?limit=0")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_popular_tracks_writes(self):
+        genre = self.genres[-1]
+        for song in self.songs[:4]:
+            self.client.post(
+                "/songgenres", {"song": song.id, "genre": genre.id})
+        self.client.post("/genres", {"description": "Brand new"})
+        self.client.delete(f"/songs/{self.songs[0].id}")
+        self.client.delete(f"/songgenres/{self.song_genres[1].id}")
+
+        response = self.client.get("/genres/popular")
+        self.assertEqual(
+            [(genre["id"], genre["song_count"])
+             for genre in response.data["genres"]],
+            self.expected_popular())
+
+    def test_repair_genre_counts(self):
+        genre = self.genres[0]
+        GenrePopularity.objects.filter(genre=genre).update(song_count=99)
+        GenrePopularity.objects.filter(genre=self.genres[1]).delete()
+
+        out = StringIO()
+        call_command("repair_genre_counts", stdout=out)
+
+        self.assertIn("Repaired 2 genre counters", out.getvalue())
+        self.assertEqual(
+            GenrePopularity.objects.get(genre=genre).song_count,
+            SongGenre.objects.filter(genre=genre).count())
+        self.assertTrue(
+            GenrePopularity.objects.filter(genre=self.genres[1]).exists())
+
+    def test_details_invalidated_by_song_genre(self):
+        genre = self.genres[0]
+        before = self.client.get(f"/genres/{genre.id}").data
+
+        song = self.songs[-1]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                "/songgenres", {"song": song.id, "genre": genre.id})
+
+        after = self.client.get(f"/genres/{genre.id}").data
+        self.assertEqual(len(after["songs"]), len(before["songs"]) + 1)
@@ -0,0 +1,52 @@
+from django.db import connection
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from tunaapi.middleware.sql_instrumentation import N_PLUS_ONE_THRESHOLD, QueryRecorder
+from tunaapi.models import Artist
+from .utils import create_data, refresh_data
+
+
+class TestSQLInstrumentation(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        create_data(cls)
+
+    def setUp(self):
+        refresh_data(self)
+
+    def test_server_timing(self):
+        response = self.client.get(f"/artists/{self.artists[0].id}")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        timing = response["Server-Timing"]
+        self.assertIn('desc="2 queries"', timing)
+        self.assertTrue(timing.startswith("db;dur="))
+        self.assertIn("app;dur=", timing)
+
+    def test_metrics(self):
+        self.client.get("/genres/popular")
+        response = self.client.get("/metrics")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        body = response.content.decode()
+        self.assertIn("# TYPE tunaapi_request_queries histogram", body)
+        self.assertIn(
+            'tunaapi_request_queries_bucket{route="genre-popular",le="1"}', body)
+        self.assertIn(
+            'tunaapi_request_duration_seconds_count{route="genre-popular"}', body)
+
+    def test_repeated_statements(self):
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            for artist in self.artists[:N_PLUS_ONE_THRESHOLD]:
+                list(Artist.objects.filter(pk=artist.pk))
+            Artist.objects.count()
+
+        self.assertEqual(recorder.count, N_PLUS_ONE_THRESHOLD + 1)
+        repeated = recorder.repeated_statements()
+        self.assertEqual(len(repeated), 1)
+        self.assertEqual(repeated[0][1], N_PLUS_ONE_THRESHOLD)
+        self.assertEqual(len(recorder.slowest_statements()), 3)
@@ -0,0 +1,198 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from tunaapi.jobs import JOB_HANDLERS, drain, retry_failed
+from tunaapi.jobs.worker import (MAX_ATTEMPTS, RETRY_BACKOFF, claim,
+                                 jobs_run, run)
+from tunaapi.models import ArtistGenre, GenrePopularity, Job, SongGenre
+from .utils import create_data, refresh_data
+
+
+class TestJobs(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        create_data(cls)
+
+    def setUp(self):
+        refresh_data(self)
+        # Start from an empty queue, the fixtures queue stats warm-ups
+        Job.objects.all().delete()
+
+    def queued(self, kind):
+        return Job.objects.get(kind=kind, status=Job.QUEUED)
+
+    def fail_on_purpose(self, ids):
+        raise RuntimeError("Recompute failed on purpose")
+
+    def test_enqueue_merges_into_the_queued_job(self):
+        Job.objects.enqueue("artist-stats", [3, 1])
+        Job.objects.enqueue("artist-stats", [2, 1])
+        Job.objects.enqueue("genre-popularity", [1])
+        Job.objects.enqueue("artist-stats", [])
+
+        self.assertEqual(Job.objects.count(), 2)
+        self.assertEqual(self.queued("artist-stats").ids, [1, 2, 3])
+
+        # A running job may have read its data already, so new ids wait
+        Job.objects.filter(kind="artist-stats").update(status=Job.RUNNING)
+        Job.objects.enqueue("artist-stats", [1])
+        self.assertEqual(self.queued("artist-stats").ids, [1])
+        self.assertEqual(Job.objects.count(), 3)
+
+    def test_song_writes_queue_stats_warm_up(self):
+        artist, other = self.artists[:2]
+        response = self.client.post("/songs", {
+            "title": "New", "artist_id": artist.id, "album": "Album",
+            "length": 100})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        song_id = response.data["id"]
+        response = self.client.put(f"/songs/{song_id}", {
+            "title": "New", "artist_id": other.id, "album": "Album",
+            "length": 100})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        SongGenre.objects.create(song_id=song_id, genre=self.genres[0])
+
+        self.assertEqual(
+            self.queued("artist-stats").ids, sorted([artist.id, other.id]))
+        self.assertEqual(drain(), (1, 0))
+        self.assertFalse(Job.objects.exists())
+
+        # The worker already computed the stats into the cache
+        with self.assertNumQueries(0):
+            response = self.client.get(f"/artists/{other.id}/stats")
+        self.assertEqual(
+            response.data["song_count"], other.songs.count())
+
+    def test_bulk_writes_queue_recounts(self):
+        artist = self.artists[0]
+        genre = self.genres[-1]
+        songs = list(artist.songs.all())
+        response = self.client.post("/songgenres/bulk", [
+            {"song": song.id, "genre": genre.id} for song in songs],
+            format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        # Nothing is recounted inside the request
+        self.assertFalse(ArtistGenre.objects.filter(
+            artist=artist, genre=genre).exists())
+        self.assertEqual(self.queued("artist-genres").ids, [artist.id])
+        self.assertEqual(self.queued("genre-popularity").ids, [genre.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            # The ArtistGenre rebuild queues a stats warm-up, run as well
+            self.assertEqual(drain(), (3, 0))
+        self.assertEqual(ArtistGenre.objects.get(
+            artist=artist, genre=genre).song_count, len(songs))
+        self.assertEqual(
+            GenrePopularity.objects.get(genre=genre).song_count,
+            SongGenre.objects.filter(genre=genre).count())
+
+        response = self.client.get(f"/artists/{artist.id}/stats")
+        self.assertIn(genre.id, [
+            entry["id"] for entry in response.data["genres"]])
+
+    def test_failed_jobs_are_retried_with_backoff(self):
+        Job.objects.enqueue("artist-stats", [self.artists[0].id])
+        before = jobs_run.value(kind="artist-stats", outcome="retried")
+
+        with mock.patch.dict(
+                JOB_HANDLERS, {"artist-stats": self.fail_on_purpose}):
+            started = timezone.now()
+            self.assertEqual(drain(), (0, 1))
+            job = self.queued("artist-stats")
+            self.assertEqual(job.attempts, 1)
+            self.assertIn("Recompute failed on purpose", job.last_error)
+            self.assertGreaterEqual(
+                job.run_after, started + timedelta(seconds=RETRY_BACKOFF))
+            self.assertEqual(
+                jobs_run.value(kind="artist-stats", outcome="retried"),
+                before + 1)
+
+            # Not due yet, so draining again leaves it alone
+            self.assertEqual(drain(), (0, 0))
+
+            # The backoff doubles with every attempt
+            Job.objects.update(run_after=timezone.now())
+            started = timezone.now()
+            drain()
+            job = self.queued("artist-stats")
+            self.assertEqual(job.attempts, 2)
+            self.assertGreaterEqual(
+                job.run_after, started + timedelta(seconds=RETRY_BACKOFF * 2))
+
+            Job.objects.update(attempts=MAX_ATTEMPTS - 1,
+                               run_after=timezone.now())
+            drain()
+            job = Job.objects.get()
+            self.assertEqual(job.status, Job.FAILED)
+            self.assertEqual(job.attempts, MAX_ATTEMPTS)
+
+        self.assertEqual(retry_failed(), 1)
+        job = self.queued("artist-stats")
+        self.assertEqual(job.attempts, 0)
+        self.assertEqual(drain(), (1, 0))
+        self.assertFalse(Job.objects.exists())
+
+    def test_retry_merges_into_a_job_queued_meanwhile(self):
+        Job.objects.enqueue("artist-stats", [1])
+        job = claim()
+        # Writes made while the job runs queue the kind again
+        Job.objects.enqueue("artist-stats", [2])
+
+        with mock.patch.dict(
+                JOB_HANDLERS, {"artist-stats": self.fail_on_purpose}):
+            self.assertFalse(run(job))
+        job = Job.objects.get()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertEqual(job.ids, [1, 2])
+        self.assertEqual(job.attempts, 1)
+        self.assertIn("Recompute failed on purpose", job.last_error)
+
+    def test_stale_running_jobs_are_requeued(self):
+        job = Job.objects.enqueue("artist-stats", [self.artists[0].id])
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.RUNNING, attempts=1,
+            updated=timezone.now() - timedelta(hours=1))
+
+        drain()
+        job = Job.objects.get()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertIn("worker stopped", job.last_error)
+
+    def test_unknown_kinds_fail(self):
+        Job.objects.enqueue("unknown", [1])
+        self.assertEqual(drain(), (0, 1))
+        self.assertIn("No handler", self.queued("unknown").last_error)
+
+    def test_command(self):
+        out = StringIO()
+        call_command("jobs", stdout=out)
+        self.assertIn("The job queue is empty", out.getvalue())
+
+        Job.objects.enqueue("artist-stats", [self.artists[0].id])
+        Job.objects.create(kind="genre-popularity", ids=[1],
+                           status=Job.FAILED, attempts=MAX_ATTEMPTS,
+                           run_after=timezone.now(),
+                           last_error="Traceback\nRuntimeError: broken")
+        out = StringIO()
+        call_command("jobs", "inspect", stdout=out)
+        output = out.getvalue()
+        self.assertIn("queued   artist-stats      1 job(s)", output)
+        self.assertIn("(genre-popularity, 1 ids, 5 attempts): "
+                      "RuntimeError: broken", output)
+
+        out = StringIO()
+        call_command("jobs", "drain", stdout=out)
+        self.assertIn("Ran 1 jobs (0 failed)", out.getvalue())
+
+        out = StringIO()
+        call_command("jobs", "retry", stdout=out)
+        self.assertIn("Queued 1 failed jobs again", out.getvalue())
+        self.assertEqual(self.queued("genre-popularity").attempts, 0)
@@ -0,0 +1,297 @@
+import gzip
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.db.models import Count
+from django.test import TestCase, TransactionTestCase
+
+from tunaapi.models import (Artist, ArtistGenre, Change, Genre,
+                            GenrePopularity, ImportCheckpoint, Job, Song,
+                            SongGenre)
+
+
+class TestSeedCatalog(TestCase):
+
+    def seed(self, **options):
+        options = {"artists": 5, "genres": 4, "songs": 30, "links": 45,
+                   "batch_size": 7, **options}
+        call_command("seed_catalog", stdout=StringIO(), **options)
+
+    def test_seed_counts(self):
+        self.seed()
+
+        self.assertEqual(Artist.objects.count(), 5)
+        self.assertEqual(Genre.objects.count(), 4)
+        self.assertEqual(Song.objects.count(), 30)
+        self.assertEqual(SongGenre.objects.count(), 45)
+        self.assertEqual(
+            SongGenre.objects.values("song", "genre").distinct().count(), 45)
+
+        # Derived tables are rebuilt for the seeded rows
+        self.assertEqual(GenrePopularity.objects.count(), 4)
+        self.assertEqual(
+            sum(GenrePopularity.objects.values_list("song_count", flat=True)), 45)
+        self.assertEqual(
+            ArtistGenre.objects.filter(is_dominant=True).count(),
+            Artist.objects.filter(songs__isnull=False).distinct().count())
+
+    def test_seed_is_repeatable(self):
+        self.seed(seed=7)
+        first = list(Song.objects.order_by("id").values_list(
+            "title", "album", "length"))
+        Artist.objects.all().delete()
+        Genre.objects.all().delete()
+
+        self.seed(seed=7)
+        second = list(Song.objects.order_by("id").values_list(
+            "title", "album", "length"))
+        self.assertEqual(first, second)
+
+
+class TestImportCatalog(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.existing = Artist.objects.create(name="Known", age=40, bio="")
+
+    def write(self, name, text):
+        path = os.path.join(self.directory, name)
+        opener = gzip.open if name.endswith(".gz") else open
+        with opener(path, "wt", encoding="utf-8") as target:
+            target.write(text)
+        return path
+
+    def run_import(self, path, **options):
+        out = StringIO()
+        err = StringIO()
+        call_command("import_catalog", path, stdout=out, stderr=err, **options)
+        return out.getvalue(), err.getvalue()
+
+    def csv_rows(self, count):
+        lines = ["title,artist,album,length,genres,artist_age"]
+        for number in range(count):
+            artist = "Known" if number % 3 == 0 else f"Artist {number % 4}"
+            genres = "Rock|Jazz" if number % 2 else "Rock"
+            lines.append(f"Song {number},{artist},Album {number % 5},"
+                         f"{100 + number},{genres},30")
+        return "\n".join(lines) + "\n"
+
+    def assert_counters_consistent(self):
+        stored = set(ArtistGenre.objects.values_list(
+            "artist_id", "genre_id", "song_count", "is_dominant"))
+        ArtistGenre.objects.rebuild()
+        self.assertEqual(stored, set(ArtistGenre.objects.values_list(
+            "artist_id", "genre_id", "song_count", "is_dominant")))
+        self.assertEqual(GenrePopularity.objects.repair(), [])
+
+    def test_import_csv(self):
+        path = self.write("drop.csv", self.csv_rows(10) + (
+            "Broken,Known,Album,long,Rock,30\n"
+            ",Known,Album,100,Rock,30\n"))
+        out, err = self.run_import(path, batch_size=4)
+
+        self.assertIn("Imported 10 songs (4 new artists, 2 new genres, "
+                      "2 rows rejected)", out)
+        self.assertIn("rows/s", out)
+        self.assertIn("Row 11: length and artist_age must be integers", err)
+        self.assertIn("Row 12: title is required", err)
+
+        self.assertEqual(Song.objects.count(), 10)
+        # Known resolves to the existing artist instead of a new one
+        self.assertEqual(Artist.objects.filter(name="Known").count(), 1)
+        self.assertEqual(self.existing.songs.count(), 4)
+        self.assertEqual(SongGenre.objects.count(), 15)
+        self.assertEqual(
+            Artist.objects.get(name="Artist 1").age, 30)
+        self.assert_counters_consistent()
+        # bulk_create skips the change log receivers, the import logs itself
+        self.assertEqual(dict(Change.objects.filter(action=Change.CREATED)
+                              .values_list("resource").annotate(Count("id"))),
+                         {"artist": 5, "genre": 2, "song": 10, "songgenre": 15})
+
+        checkpoint = ImportCheckpoint.objects.get(source=path)
+        self.assertTrue(checkpoint.completed)
+        self.assertEqual(checkpoint.rows_done, 12)
+
+        out, _ = self.run_import(path)
+        self.assertIn("already imported", out)
+        self.assertEqual(Song.objects.count(), 10)
+
+    def test_import_ndjson_gzipped(self):
+        rows = [
+            {"title": "One", "artist": "Known", "album": "A", "length": 90,
+             "genres": ["Pop", "Pop", "Folk"]},
+            {"title": "Two", "artist": "New", "album": "B", "length": "120",
+             "genres": "Folk", "artist_bio": "Newcomer"},
+        ]
+        path = self.write("drop.ndjson.gz", "\n".join(
+            json.dumps(row) for row in rows) + "\n\n[1]\n")
+        out, err = self.run_import(path)
+
+        self.assertIn("Imported 2 songs (1 new artists, 2 new genres, "
+                      "1 rows rejected)", out)
+        self.assertIn("Row 3: expected an object", err)
+        self.assertEqual(Artist.objects.get(name="New").bio, "Newcomer")
+        self.assertEqual(sorted(SongGenre.objects.filter(
+            song__title="One").values_list("genre__description", flat=True)),
+            ["Folk", "Pop"])
+        self.assert_counters_consistent()
+
+    def test_resume_after_interruption(self):
+        path = self.write("drop.csv", self.csv_rows(10))
+        bulk_create = SongGenre.objects.bulk_create
+        calls = []
+
+        def fail_third_chunk(objs, *args, **kwargs):
+            calls.append(1)
+            if len(calls) == 3:
+                raise RuntimeError("interrupted")
+            return bulk_create(objs, *args, **kwargs)
+
+        with mock.patch.object(SongGenre.objects, "bulk_create",
+                               side_effect=fail_third_chunk):
+            with self.assertRaises(RuntimeError):
+                self.run_import(path, batch_size=3)
+
+        # The failed chunk rolled back with its checkpoint update
+        checkpoint = ImportCheckpoint.objects.get(source=path)
+        self.assertEqual(checkpoint.rows_done, 6)
+        self.assertFalse(checkpoint.completed)
+        self.assertEqual(Song.objects.count(), 6)
+
+        out, _ = self.run_import(path, batch_size=3)
+        self.assertIn("Imported 4 songs", out)
+        self.assertIn("resumed after row 6", out)
+        self.assertEqual(sorted(Song.objects.values_list("title", flat=True)),
+                         sorted(f"Song {number}" for number in range(10)))
+        self.assert_counters_consistent()
+
+    def test_import_runs_only_its_jobs(self):
+        Job.objects.enqueue("artist-purge", [self.existing.id])
+        path = self.write("drop.csv", self.csv_rows(4))
+        self.run_import(path)
+
+        self.assertEqual(list(Job.objects.values_list("kind", flat=True)),
+                         ["artist-purge"])
+        self.assert_counters_consistent()
+
+    def test_changed_file_needs_restart(self):
+        path = self.write("drop.csv", self.csv_rows(4))
+        ImportCheckpoint.objects.create(
+            source=path, fingerprint="stale", rows_done=2)
+
+        with self.assertRaisesMessage(CommandError, "--restart"):
+            self.run_import(path)
+        out, _ = self.run_import(path, restart=True)
+        self.assertIn("Imported 4 songs", out)
+
+
+class TestExportCatalog(TestCase):
+
+    def setUp(self):
+        call_command("seed_catalog", artists=3, genres=4, songs=20, links=30,
+                     stdout=StringIO())
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def catalog(self):
+        return sorted(
+            (song.title, song.artist.name, song.album, song.length, tuple(sorted(
+                song.songgenre_set.values_list("genre__description", flat=True))))
+            for song in Song.objects.select_related("artist"))
+
+    def test_export_imports_back(self):
+        for name in ("catalog.csv", "catalog.ndjson.gz"):
+            with self.subTest(name=name):
+                before = self.catalog()
+                path = os.path.join(self.directory, name)
+                out = StringIO()
+                call_command("export_catalog", path, stdout=out)
+                self.assertIn("Exported", out.getvalue())
+
+                Song.objects.all().delete()
+                call_command("import_catalog", path, stdout=StringIO())
+                self.assertEqual(self.catalog(), before)
+
+
+class TestBenchmarkEndpoints(TestCase):
+
+    def test_report(self):
+        call_command("seed_catalog", artists=3, genres=3, songs=10, links=12,
+                     stdout=StringIO())
+        out = StringIO()
+        call_command("benchmark_endpoints", repeat=2, warmup=0,
+                     host="testserver", stdout=out)
+
+        report = json.loads(out.getvalue())["endpoints"]
+        urls = {endpoint["name"]: endpoint for endpoint in report}
+        for name in ("artist-list", "artist-detail", "artist-related",
+                     "genre-popular", "song-list-paginated", "songgenre-list"):
+            self.assertIn(name, urls)
+        for endpoint in report:
+            self.assertEqual(endpoint["status"], 200, endpoint["url"])
+            self.assertLessEqual(endpoint["p50_ms"], endpoint["p95_ms"])
+            self.assertGreater(endpoint["peak_memory_bytes"], 0)
+        self.assertGreater(urls["song-list"]["queries"], 0)
+
+
+class TestExplainEndpoints(TestCase):
+
+    def setUp(self):
+        call_command("seed_catalog", artists=3, genres=3, songs=10, links=12,
+                     stdout=StringIO())
+
+    def explain(self, *args):
+        out = StringIO()
+        call_command("explain_endpoints", *args, "--json", host="testserver",
+                     stdout=out, stderr=StringIO())
+        return {endpoint["name"]: endpoint
+                for endpoint in json.loads(out.getvalue())["endpoints"]}
+
+    def test_indexed_endpoints_are_clean(self):
+        report = self.explain("--skip-full-lists")
+
+        self.assertIn("song-detail", report)
+        self.assertNotIn("song-list", report)
+        for name, endpoint in report.items():
+            for statement in endpoint["statements"]:
+                self.assertEqual(statement["flags"], [], (name, statement))
+
+    def test_full_scans_are_flagged(self):
+        report = self.explain()
+
+        flags = [flag for statement in report["song-list"]["statements"]
+                 for flag in statement["flags"]]
+        self.assertEqual(flags, ["Full scan of tunaapi_song"])
+        with self.assertRaises(CommandError):
+            call_command("explain_endpoints", "--fail-on-scan",
+                         host="testserver", stdout=StringIO(), stderr=StringIO())
+
+
+class TestBenchmarkAsgi(TransactionTestCase):
+
+    def setUp(self):
+        call_command("seed_catalog", artists=3, genres=3, songs=10, links=12,
+                     stdout=StringIO())
+
+    def test_compares_async_and_sync_endpoints(self):
+        out = StringIO()
+        call_command("benchmark_asgi", requests=4, concurrency=2,
+                     host="testserver", stdout=out)
+
+        report = json.loads(out.getvalue())["endpoints"]
+        names = {endpoint["name"] for endpoint in report}
+        for name in ("artist-list", "artist-detail", "artist-related",
+                     "genre-popular", "song-detail", "songgenre-list"):
+            self.assertIn(name, names)
+        for endpoint in report:
+            for mode in ("wsgi", "asgi"):
+                self.assertEqual(endpoint[mode]["errors"], 0, endpoint["url"])
+                self.assertGreater(endpoint[mode]["requests_per_second"], 0)
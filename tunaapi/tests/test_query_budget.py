@@ -0,0 +1,76 @@
+from types import SimpleNamespace
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from .utils import create_data, refresh_data
+
+
+class TestQueryBudget(APITestCase):
+    """Every endpoint runs a fixed number of queries whatever the data size"""
+
+    @classmethod
+    def setUpTestData(cls):
+        create_data(cls)
+
+    def setUp(self):
+        refresh_data(self)
+
+    def budgets(self):
+        artist = self.artists[0]
+        genre = self.genres[0]
+        song = self.songs[0]
+        return [
+            ("/artists", 1),
+            ("/artists?page_size=3", 1),
+            (f"/artists/{artist.id}", 2),
+            (f"/artists/{artist.id}/related", 2),
+            (f"/artists/{artist.id}/stats", 2),
+            ("/artists/stats", 3),
+            ("/genres", 1),
+            ("/genres?page_size=3", 1),
+            (f"/genres/{genre.id}", 2),
+            ("/genres/popular", 1),
+            ("/songs", 1),
+            ("/songs?page_size=3", 1),
+            ("/songs?stream=1", 1),
+            (f"/songs?q={song.title.split()[0].strip('.')}", 1),
+            (f"/songs/{song.id}", 2),
+            ("/songs?include=artist,genres&page_size=3", 3),
+            (f"/songs/{song.id}?include=artist,genres", 4),
+            ("/artists?include=songs,genres", 3),
+            ("/genres?include=songs", 2),
+            ("/songgenres", 1),
+            ("/songgenres?page_size=3", 1),
+            ("/songgenres?stream=1", 1),
+            (f"/artists/{artist.id}/similar", 2),
+            ("/changes?since=0", 1),
+            ("/changes?since=latest", 1),
+            ("/export", 1),
+            ("/async/artists", 1),
+            (f"/async/artists/{artist.id}", 2),
+            (f"/async/artists/{artist.id}/related", 2),
+            ("/async/genres", 1),
+            (f"/async/genres/{genre.id}", 2),
+            ("/async/genres/popular", 1),
+            ("/async/songs", 1),
+            (f"/async/songs/{song.id}", 2),
+            ("/async/songgenres", 1),
+        ]
+
+    def assert_budgets(self):
+        for url, budget in self.budgets():
+            with self.subTest(url=url), self.assertNumQueries(budget):
+                response = self.client.get(url)
+                if response.streaming:
+                    b"".join(response.streaming_content)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_budgets(self):
+        self.assert_budgets()
+
+    def test_budgets_do_not_grow_with_data(self):
+        more = SimpleNamespace()
+        for _ in range(3):
+            create_data(more)
+        self.assert_budgets()
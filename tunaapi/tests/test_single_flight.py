@@ -0,0 +1,120 @@
+import threading
+import time
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+from django.test import SimpleTestCase
+
+from tunaapi.caching import SingleFlight
+from tunaapi.caching.single_flight import coalesced_requests
+from tunaapi.models import SongGenre
+from .utils import create_data, refresh_data
+
+
+class TestSingleFlight(SimpleTestCase):
+
+    def run_concurrently(self, flight, compute, callers=5):
+        results = [None] * callers
+
+        def call(index):
+            try:
+                results[index] = flight.do("key", compute)
+            except Exception as error:
+                results[index] = error
+
+        threads = [threading.Thread(target=call, args=(index,))
+                   for index in range(callers)]
+        for thread in threads:
+            thread.start()
+        return threads, results
+
+    def wait_for_waiters(self, flight):
+        # The leader is blocked, so the rest are waiting once they all started
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline and not flight.calls:
+            time.sleep(0.001)
+        time.sleep(0.05)
+
+    def test_concurrent_calls_share_one_computation(self):
+        flight = SingleFlight()
+        release = threading.Event()
+        computed = []
+
+        def compute():
+            computed.append(1)
+            release.wait(5)
+            return "result"
+
+        threads, results = self.run_concurrently(flight, compute)
+        self.wait_for_waiters(flight)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(len(computed), 1)
+        self.assertEqual(sorted(results), [("result", False)] + [("result", True)] * 4)
+        self.assertEqual(flight.calls, {})
+        # Later calls compute again
+        self.assertEqual(flight.do("key", lambda: "again"), ("again", False))
+
+    def test_errors_reach_every_caller(self):
+        flight = SingleFlight()
+        release = threading.Event()
+
+        def compute():
+            release.wait(5)
+            raise ValueError("failed")
+
+        threads, results = self.run_concurrently(flight, compute, callers=3)
+        self.wait_for_waiters(flight)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+        self.assertEqual(flight.calls, {})
+
+
+class TestCoalescedEndpoints(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        create_data(cls)
+
+    def setUp(self):
+        refresh_data(self)
+
+    def test_popular_cached_until_catalog_write(self):
+        hits = coalesced_requests.value(endpoint="genre-popular", outcome="hit")
+        first = self.client.get("/genres/popular")
+        with self.assertNumQueries(0):
+            second = self.client.get("/genres/popular")
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(
+            coalesced_requests.value(endpoint="genre-popular", outcome="hit"),
+            hits + 1)
+
+        # Another query string is computed separately
+        with self.assertNumQueries(1):
+            limited = self.client.get("/genres/popular?limit=1")
+        self.assertEqual(limited.data["genres"], first.data["genres"][:1])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            SongGenre.objects.create(song=self.songs[0], genre=self.genres[-1])
+        with self.assertNumQueries(1):
+            self.client.get("/genres/popular")
+
+    def test_errors_are_not_cached(self):
+        hits = coalesced_requests.value(endpoint="genre-popular", outcome="hit")
+        for _ in range(2):
+            response = self.client.get("/genres/popular?limit=0")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            coalesced_requests.value(endpoint="genre-popular", outcome="hit"),
+            hits)
+
+    def test_related_cached(self):
+        url = f"/artists/{self.artists[0].id}/related"
+        first = self.client.get(url)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).data, first.data)
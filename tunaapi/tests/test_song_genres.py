@@ -0,0 +1,120 @@
+import json
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from tunaapi.jobs import drain
+from tunaapi.models import ArtistGenre, GenrePopularity, Job, SongGenre
+from .utils import create_data, refresh_data
+
+
+class TestSongGenres(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        create_data(cls)
+
+    def setUp(self):
+        refresh_data(self)
+
+    def test_create(self):
+        song = self.songs[0]
+        genre = self.genres[-1]
+        response = self.client.post(
+            "/songgenres", {"song": song.id, "genre": genre.id})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        data = response.data
+        db_song_genre = SongGenre.objects.get(pk=data["id"])
+        self.assertEqual(db_song_genre.song_id, song.id)
+        self.assertEqual(db_song_genre.genre_id, genre.id)
+
+    def test_bulk_create(self):
+        genre = self.genres[-1]
+        songs = self.artists[0].songs.all()
+        new_song_genres = [{"song": song.id, "genre": genre.id} for song in songs]
+        new_song_genres.append({"song": songs[0].id, "genre": 0})
+        new_song_genres.append({"song": songs[0].id})
+
+        response = self.client.post(
+            "/songgenres/bulk", new_song_genres, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        data = response.data
+        self.assertEqual(len(data["created"]), len(songs))
+        self.assertEqual(
+            [error["index"] for error in data["errors"]],
+            [len(songs), len(songs) + 1])
+
+        # Derived counters are recounted by the job worker
+        queued = dict(Job.objects.filter(
+            status=Job.QUEUED).values_list('kind', 'ids'))
+        self.assertEqual(queued['artist-genres'], [self.artists[0].id])
+        self.assertEqual(queued['genre-popularity'], [genre.id])
+        drain()
+        self.assertEqual(
+            GenrePopularity.objects.get(genre=genre).song_count,
+            SongGenre.objects.filter(genre=genre).count())
+        self.assertEqual(
+            ArtistGenre.objects.get(artist=self.artists[0], genre=genre).song_count,
+            len(songs))
+
+    def test_create_duplicate(self):
+        song_genre = self.song_genres[0]
+        response = self.client.post(
+            "/songgenres",
+            {"song": song_genre.song_id, "genre": song_genre.genre_id})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            SongGenre.objects.filter(
+                song=song_genre.song_id, genre=song_genre.genre_id).count(), 1)
+        self.assertEqual(
+            GenrePopularity.objects.get(genre=song_genre.genre_id).song_count,
+            SongGenre.objects.filter(genre=song_genre.genre_id).count())
+
+    def test_bulk_create_duplicates(self):
+        song_genre = self.song_genres[0]
+        song = self.songs[-1]
+        genre = self.genres[0]
+        response = self.client.post("/songgenres/bulk", [
+            {"song": song_genre.song_id, "genre": song_genre.genre_id},
+            {"song": song.id, "genre": genre.id},
+            {"song": song.id, "genre": genre.id},
+        ], format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data["created"]), 1)
+        self.assertEqual(
+            [error["index"] for error in response.data["errors"]], [0, 2])
+
+    def test_delete(self):
+        song_genre_id = self.song_genres[0].id
+        response = self.client.delete(f"/songgenres/{song_genre_id}")
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(SongGenre.objects.filter(id=song_genre_id).exists())
+
+    def test_list(self):
+        response = self.client.get("/songgenres")
+        data = response.data
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(data), len(self.song_genres))
+
+        first_song_genre = data[0]
+        self.assertTrue("id" in first_song_genre)
+        self.assertTrue("artist" in first_song_genre["song"])
+        self.assertTrue("description" in first_song_genre["genre"])
+
+    def test_list_streamed_ndjson(self):
+        response = self.client.get("/songgenres?format=ndjson")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+
+        lines = b"".join(response.streaming_content).splitlines()
+        song_genres = [json.loads(line) for line in lines]
+        self.assertEqual(song_genres, json.loads(
+            json.dumps(self.client.get("/songgenres").data)))
@@ -1,7 +1,16 @@
+import json
+from io import StringIO
+
 from rest_framework import status
 from rest_framework.test import APITestCase
 
-from tunaapi.models import Song
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from unittest import mock
+
+from tunaapi.models import Song, SongGenre
+from tunaapi.search import genre_index
 from .utils import create_data, refresh_data
 
 
@@ -40,6 +49,44 @@ class TestSongs(APITestCase):
         self.assertEqual(db_song.album, new_song["album"])
         self.assertEqual(db_song.length, new_song["length"])
 
+    def test_bulk_create(self):
+        artist = self.artists[0]
+        new_songs = [
+            {"title": f"Bulk {i}", "artist_id": artist.id,
+             "album": "Bulk", "length": 100 + i}
+            for i in range(5)
+        ]
+        new_songs[2]["artist_id"] = 0
+
+        response = self.client.post("/songs/bulk", new_songs, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        data = response.data
+        self.assertEqual(len(data["created"]), 4)
+        self.assertEqual(data["errors"], [
+            {"index": 2, "errors": {"artist_id": ["Artist does not exist."]}}])
+        db_song = Song.objects.get(pk=data["created"][0]["id"])
+        self.assertEqual(db_song.title, "Bulk 0")
+        self.assertEqual(db_song.artist_id, artist.id)
+
+    def test_bulk_create_query_count(self):
+        artist = self.artists[0]
+
+        def post(count):
+            new_songs = [
+                {"title": "Bulk", "artist_id": artist.id,
+                 "album": "Bulk", "length": 100}
+                for _ in range(count)
+            ]
+            self.client.post("/songs/bulk", new_songs, format="json")
+
+        # Savepoint, one artist lookup, one insert, one change log insert and
+        # release, whatever the size
+        with self.assertNumQueries(5):
+            post(2)
+        with self.assertNumQueries(5):
+            post(50)
+
     def test_delete(self):
         song_id = Song.objects.all()[0].id
         response = self.client.delete(f"/songs/{song_id}")
@@ -117,5 +164,373 @@ class TestSongs(APITestCase):
         self.assertTrue("id" in first_genre)
         self.assertTrue("description" in first_genre)
 
+    def test_list_paginated(self):
+        seen = []
+        url = "/songs?page_size=2"
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            data = response.data
+            self.assertLessEqual(len(data["results"]), 2)
+            seen.extend(song["id"] for song in data["results"])
+            url = data["next"]
+
+        self.assertEqual(seen, sorted(song.id for song in self.songs))
+
+        # The previous cursor walks back over the page just left
+        second_page = self.client.get("/songs?page_size=2").data["next"]
+        previous = self.client.get(second_page).data["previous"]
+        data = self.client.get(previous).data
+        self.assertEqual([song["id"] for song in data["results"]], seen[:2])
+
+    def test_list_paginated_with_filter(self):
+        min_length = 60
+        expected = sorted(
+            (song.length, song.id) for song in self.songs
+            if song.length >= min_length)
+
+        seen = []
+        url = f"/songs?min_length={min_length}&ordering=length&page_size=3"
+        while url:
+            data = self.client.get(url).data
+            seen.extend((song["length"], song["id"])
+                        for song in data["results"])
+            url = data["next"]
+
+        self.assertEqual(seen, expected)
+
+    def test_list_paginated_through_equal_values(self):
+        artist = self.artists[0]
+        Song.objects.bulk_create([
+            Song(title=f"Same {number}", artist=artist, album="Same",
+                 length=77) for number in range(7)])
+        expected = sorted((song.length, song.id) for song in Song.objects.all())
+
+        seen = []
+        pages = []
+        url = "/songs?ordering=length&page_size=2"
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                data = self.client.get(url).data
+            # Each page seeks past the (length, id) key, never skips rows
+            self.assertFalse(any("OFFSET" in query["sql"]
+                                 for query in queries.captured_queries))
+            pages.append(data)
+            seen.extend((song["length"], song["id"])
+                        for song in data["results"])
+            url = data["next"]
+        self.assertEqual(seen, expected)
+
+        # Walking back from the last page visits the same pages
+        url = pages[-1]["previous"]
+        for page in reversed(pages[:-1]):
+            data = self.client.get(url).data
+            self.assertEqual(data["results"], page["results"])
+            url = data["previous"]
+        self.assertIsNone(url)
+
+    def test_list_paginated_bad_cursor(self):
+        response = self.client.get("/songs?page_size=2&cursor=bogus")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_list_paginated_bad_ordering(self):
+        response = self.client.get("/songs?page_size=2&ordering=artist")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_list_streamed(self):
+        response = self.client.get("/songs?stream=1")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "application/json")
+
+        data = json.loads(b"".join(response.streaming_content))
+        self.assertEqual(data, self.client.get("/songs").data)
+
+    def test_list_streamed_ndjson(self):
+        min_length = 60
+        response = self.client.get(
+            f"/songs?min_length={min_length}",
+            HTTP_ACCEPT="application/x-ndjson")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+
+        lines = b"".join(response.streaming_content).splitlines()
+        songs = [json.loads(line) for line in lines]
+        self.assertEqual(
+            sorted(song["id"] for song in songs),
+            sorted(song.id for song in self.songs if song.length >= min_length))
+
+    def test_list_sparse_fields(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/songs?fields=title,id")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('"album"', queries[0]["sql"])
+        self.assertEqual(response.data, [
+            {"id": song["id"], "title": song["title"]}
+            for song in self.client.get("/songs").data])
+
+    def test_list_sparse_fields_paginated(self):
+        seen = []
+        url = "/songs?fields=id&ordering=-length&page_size=3"
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                data = self.client.get(url).data
+            # The cursor reads the ordering column from the deferred rows
+            self.assertEqual(len(queries), 1)
+            self.assertTrue(all(song.keys() == {"id"} for song in data["results"]))
+            seen.extend(song["id"] for song in data["results"])
+            url = data["next"]
+
+        expected = sorted(self.songs, key=lambda song: (-song.length, -song.id))
+        self.assertEqual(seen, [song.id for song in expected])
+
+    def test_list_sparse_fields_streamed(self):
+        response = self.client.get("/songs?fields=id,length&stream=1")
+        data = json.loads(b"".join(response.streaming_content))
+        self.assertEqual(data, self.client.get("/songs?fields=id,length").data)
+        self.assertEqual(data[0].keys(), {"id", "length"})
+
+    def test_list_unknown_fields(self):
+        response = self.client.get("/songs?fields=id,lyrics")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("lyrics", response.data["fields"][0])
+
+    def test_details_sparse_fields(self):
+        song = self.songs[0]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f"/songs/{song.id}?fields=id,title")
+
+        self.assertEqual(response.data, {"id": song.id, "title": song.title})
+        # Neither the artist join nor the genre prefetch
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn("JOIN", queries[0]["sql"])
+
+        data = self.client.get(f"/songs/{song.id}?fields=genres").data
+        self.assertEqual(list(data), ["genres"])
+        self.assertEqual(len(data["genres"]), song.songgenre_set.count())
+
+    def genre_songs(self, *genres):
+        return {song_genre.song_id for song_genre in self.song_genres
+                if song_genre.genre_id in {genre.id for genre in genres}}
+
+    def tag(self, song, genre):
+        song_genre = SongGenre.objects.create(song=song, genre=genre)
+        self.song_genres.append(song_genre)
+
+    def test_list_include(self):
+        # One more genre on a song so genres are shared and repeated
+        song = self.songs[0]
+        SongGenre.objects.create(song=song, genre=self.genres[1])
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/songs?include=artist,genres")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # Songs, then one batched query per relation
+        self.assertEqual(len(queries), 3)
+
+        data = response.data
+        self.assertEqual([row["id"] for row in data["results"]],
+                         sorted(song.id for song in self.songs))
+        artists = data["included"]["artists"]
+        self.assertEqual([artist["id"] for artist in artists],
+                         sorted({song.artist_id for song in self.songs}))
+        self.assertEqual(artists[0].keys(), {"id", "name", "age", "bio"})
+        genres = data["included"]["genres"]
+        self.assertEqual([genre["id"] for genre in genres],
+                         sorted(genre.id for genre in self.genres))
+
+        first = next(row for row in data["results"] if row["id"] == song.id)
+        self.assertEqual(first["genre_ids"],
+                         sorted([self.song_genres[0].genre_id, self.genres[1].id]))
+
+    def test_list_include_paginated(self):
+        url = "/songs?include=artist&fields=title&page_size=3"
+        with CaptureQueriesContext(connection) as queries:
+            data = self.client.get(url).data
+        self.assertEqual(len(queries), 2)
+        # The linkage column is kept even though fields leaves it out
+        self.assertEqual(data["results"][0].keys(), {"id", "title", "artist_id"})
+        self.assertEqual(
+            [artist["id"] for artist in data["included"]["artists"]],
+            sorted({row["artist_id"] for row in data["results"]}))
+
+    def test_details_include(self):
+        song = self.songs[0]
+        response = self.client.get(f"/songs/{song.id}?include=genres")
+        self.assertEqual(response.data["genre_ids"], [self.song_genres[0].genre_id])
+        self.assertEqual(response.data["included"], {"genres": [
+            {"id": self.genres[0].id, "description": self.genres[0].description}]})
+
+    def test_include_invalid(self):
+        response = self.client.get("/songs?include=artist,lyrics")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("lyrics", response.data["include"][0])
+        response = self.client.get("/songs?include=artist&stream=1")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_filter_by_genres(self):
+        first, second, third = self.genres[:3]
+        both = self.songs[-1]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tag(both, first)
+            self.tag(both, second)
+
+        data = self.client.get(f"/songs?genre={first.id},{second.id}").data
+        self.assertEqual([song["id"] for song in data], [both.id])
+
+        data = self.client.get(f"/songs?genre_any={first.id},{third.id}").data
+        self.assertEqual([song["id"] for song in data],
+                         sorted(self.genre_songs(first, third)))
+
+    def test_filter_by_genres_with_other_filters(self):
+        genre = self.genres[0]
+        long_song = Song.objects.create(
+            title="Long", artist=self.artists[0], album="A", length=500)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tag(long_song, genre)
+
+        data = self.client.get(f"/songs?genre={genre.id}&min_length=400").data
+        self.assertEqual([song["id"] for song in data], [long_song.id])
+
+        data = self.client.get(
+            f"/songs?genre_any={genre.id}&page_size=1&ordering=-length").data
+        self.assertEqual([song["id"] for song in data["results"]], [long_song.id])
+
+    def test_filter_by_genres_large_result(self):
+        genres = self.genres[:4]
+        expected = sorted(self.genre_songs(*genres))
+        with mock.patch("tunaapi.search.genre_index.MAX_INLINE_IDS", 0):
+            data = self.client.get(
+                f"/songs?genre_any={','.join(str(genre.id) for genre in genres)}").data
+        self.assertEqual([song["id"] for song in data], expected)
+
+    def test_genre_index_tracks_writes(self):
+        genre = self.genres[0]
+        song = self.songs[-1]
+        self.client.get(f"/songs?genre={genre.id}")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/songgenres", {"song": song.id, "genre": genre.id})
+        self.assertIn(song.id, genre_index.song_ids([genre.id]))
+
+        song_genre = SongGenre.objects.get(song=song, genre=genre)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f"/songgenres/{song_genre.id}")
+        self.assertNotIn(song.id, genre_index.song_ids([genre.id]))
+
+        # Bulk writes skip model signals and rebuild from the table
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                "/songgenres/bulk", [{"song": song.id, "genre": genre.id}],
+                format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIn(song.id, genre_index.song_ids([genre.id]))
+
+    def test_search(self):
+        artist = self.artists[0]
+        in_title = Song.objects.create(
+            title="Zanzibar nights", artist=artist, album="Blue", length=90)
+        in_album = Song.objects.create(
+            title="Morning", artist=artist, album="Zanzibar", length=150)
+        Song.objects.create(
+            title="Evening", artist=artist, album="Red", length=60)
+
+        response = self.client.get("/songs?q=zanzib")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([song["id"] for song in response.data["results"]],
+                         [in_title.id, in_album.id])
+        self.assertIsNone(response.data["next"])
+
+        # Search combines with the other filters
+        response = self.client.get("/songs?q=zanzibar&min_length=100")
+        self.assertEqual([song["id"] for song in response.data["results"]],
+                         [in_album.id])
+
+    def test_search_by_artist_tracks_writes(self):
+        artist = self.artists[0]
+        artist.name = "Quixotic Quartet"
+        artist.save()
+
+        response = self.client.get("/songs?q=quixotic quartet")
+        self.assertEqual(
+            sorted(song["id"] for song in response.data["results"]),
+            sorted(song.id for song in artist.songs.all()))
+
+        song = artist.songs.all()[0]
+        song.artist = self.artists[1]
+        song.save()
+        artist.songs.all().delete()
+
+        response = self.client.get("/songs?q=quixotic")
+        self.assertEqual(response.data["results"], [])
+
+    def test_search_without_words(self):
+        for query in ("", "%21%21"):
+            with self.subTest(query=query):
+                response = self.client.get(f"/songs?q={query}")
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(response.data["results"], [])
+                self.assertIsNone(response.data["next"])
+
+                response = self.client.get(f"/songs?q={query}&stream=1")
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(
+                    b"".join(response.streaming_content).strip(), b"[]")
+
+    def test_search_paginated(self):
+        artist = self.artists[0]
+        created = [
+            Song.objects.create(title=f"Echo {'echo ' * i}", artist=artist,
+                                album="Loop", length=60)
+            for i in range(5)
+        ]
+
+        seen = []
+        url = "/songs?q=echo&page_size=2"
+        while url:
+            data = self.client.get(url).data
+            seen.extend(song["id"] for song in data["results"])
+            last = data
+            url = data["next"]
+
+        self.assertEqual(sorted(seen), sorted(song.id for song in created))
+        self.assertEqual(len(seen), len(set(seen)))
+
+        data = self.client.get(last["previous"]).data
+        self.assertEqual([song["id"] for song in data["results"]], seen[2:4])
+
+    def test_rebuild_search_index(self):
+        call_command("rebuild_search_index", stdout=StringIO())
+        song = self.songs[0]
+        word = song.title.split()[0].strip(".")
+
+        response = self.client.get(f"/songs?q={word}&page_size=1000")
+        self.assertIn(song.id, [hit["id"] for hit in response.data["results"]])
+
+    def test_details_invalidated_by_related_writes(self):
+        song = self.songs[0]
+        self.client.get(f"/songs/{song.id}")
+
+        genre = song.songgenre_set.all()[0].genre
+        artist = song.artist
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put(
+                f"/genres/{genre.id}", {"description": "Renamed"},
+                format="json")
+            self.client.put(
+                f"/artists/{artist.id}",
+                {"name": "Renamed", "age": artist.age, "bio": artist.bio},
+                format="json")
+
+        data = self.client.get(f"/songs/{song.id}").data
+        self.assertEqual(data["genres"][0]["description"], "Renamed")
+        self.assertEqual(data["artist"]["name"], "Renamed")
+
     # # def test_stretch_filter_by_genre(self):
     # #     response = self.client.get("")
@@ -1,5 +1,6 @@
 import random
 
+from django.core.cache import cache
 from faker import Faker
 
 from tunaapi.models import Artist, Song, Genre, SongGenre
@@ -48,6 +49,9 @@ def create_data(cls):
 
 
 def refresh_data(self):
+    # Test transactions roll back the database but not the cache, so start
+    # each test without responses cached by an earlier one
+    cache.clear()
     for artist in self.artists:
         artist.refresh_from_db()
     for song in self.songs:
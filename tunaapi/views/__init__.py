@@ -2,3 +2,6 @@ from .artist import ArtistView, ArtistSerializer
 from .genre import GenreView, GenreSerializer
 from .song import SongView, SongSerializer
 from .song_genre import SongGenreView, SongGenreSerializer
+from .metrics import metrics
+from .change import ChangeView
+from .export import export
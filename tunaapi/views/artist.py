@@ -3,35 +3,72 @@ from django.http import HttpResponseServerError
 from rest_framework.viewsets import ViewSet
 from rest_framework.response import Response
 from rest_framework import serializers, status
-from tunaapi.models import Artist, Song, SongGenre, Genre
+from rest_framework.exceptions import NotFound, ValidationError
+from tunaapi.models import Artist, ArtistGenre, Song
+from tunaapi.search import artist_similarity
+from tunaapi.search.artist_similarity import METRICS
+from tunaapi.caching import cached_detail, cached_values, coalesced, invalidate
+from tunaapi.deletion import delete_artists, soft_delete_artist
+from tunaapi.pagination import CatalogCursorPagination
+from tunaapi.views.bulk import bulk_create_response
+from tunaapi.views.fast_rows import fast_rows
+from tunaapi.views.includes import (Relation, detail_with_includes,
+                                    include_fields, link_pairs,
+                                    list_with_includes, page_with_includes,
+                                    requested_includes)
+from tunaapi.views.sparse_fields import (SparseFieldsMixin, ordering_columns,
+                                         only_fields, requested_fields)
 from rest_framework.decorators import action
 
-from django.db.models import Count
+from django.db.models import Avg, Count, Max, Min, Subquery, Sum
 
 
 class ArtistView(ViewSet):
     """Tuna API artists view"""
 
+    @cached_detail('artist')
     def retrieve(self, request, pk):
         """Handle GET requests for single artist
 
         Returns: JSON serialized artist
         """
-        # artist = Artist.objects.get(pk=pk)
-        artist = Artist.objects.filter(pk=pk).annotate(
-            song_count=Count('songs')).first()
-        serializer = SingleArtistSerializer(artist)
-        return Response(serializer.data)
+        includes = requested_includes(request, ARTIST_INCLUDES)
+        fields = include_fields(requested_fields(
+            request, SingleArtistSerializer), SingleArtistSerializer, includes)
+        artist = artist_detail_queryset(fields).filter(pk=pk).first()
+        if artist is None:
+            # Raised before anything is cached, so an id that is created
+            # later is not answered from a cached empty response
+            raise NotFound()
+        if fields is None or 'song_count' in fields:
+            count_songs(artist)
+        serializer = SingleArtistSerializer(artist, fields=fields)
+        return Response(
+            detail_with_includes(serializer.data, includes, artist.pk))
 
     def list(self, request):
         """Handle GET requests to get all artists
 
         Returns: JSON serialized list of all artists
         """
+        includes = requested_includes(request, ARTIST_INCLUDES)
+        fields = include_fields(
+            requested_fields(request, ArtistSerializer), ArtistSerializer,
+            includes)
         artists = Artist.objects.all()
+        rows = fast_rows(ArtistSerializer, fields)
 
-        serializer = ArtistSerializer(artists, many=True)
-        return Response(serializer.data)
+        paginator = CatalogCursorPagination(
+            ordering_fields=('id', 'name', 'age'))
+        if paginator.is_requested(request):
+            artists = rows.page_queryset(artists, ordering_columns(
+                paginator, request, artists, self))
+            page = paginator.paginate_queryset(artists, request, view=self)
+            return page_with_includes(
+                paginator, rows.from_dicts(page), includes)
+
+        return Response(list_with_includes(
+            rows.rows(artists), includes, artists.values('pk')))
 
     def create(self, request):
         """Handle POST requests for artists
@@ -64,56 +101,273 @@ class ArtistView(ViewSet):
     def destroy(self, request, pk):
         """Handle DELETE requests for artist
 
-        Returns: empty body with 204 status code"""
+        Accepts ?background=1 to hide the artist at once and purge its
+        songs in batches in the background, for very large discographies
+
+        Returns: empty body with 204 status code, or 202 when purging in
+        the background"""
 
         artist = Artist.objects.get(pk=pk)
-        artist.delete()
+        if request.query_params.get('background') == '1':
+            soft_delete_artist(artist.pk)
+            return Response(None, status=status.HTTP_202_ACCEPTED)
+        # Set-based deletes instead of artist.delete(), whose collector
+        # loads and signals every song and song genre one by one
+        delete_artists([artist.pk])
         return Response(None, status=status.HTTP_204_NO_CONTENT)
 
+    @action(methods=['post'], detail=False)
+    def bulk(self, request):
+        """Handle POST requests for a list of artists
+
+        Returns: JSON serialized created artists and per-item errors
+        """
+        return bulk_create_response(
+            request, ArtistSerializer, build_artists, ArtistSerializer,
+            after_create=announce_artists)
+
     @action(methods=['get'], detail=True)
+    @coalesced('artist-related')
     def related(self, request, pk):
         """GET request to get related artists"""
         # Get the artist for this request
         this_artist = Artist.objects.get(pk=pk)
 
-        # Filter songGenre instances where the artist attribute of the song is the same as this one
-        filtered_songgenres = SongGenre.objects.filter(
-            song__artist=this_artist)
-        most_common = (
-            # The values of all the genre fields in filtered_songgenres
-            filtered_songgenres.values('genre')
-            # For each genre, count the number of times that genre appears in the queryset
-            .annotate(count=Count('genre'))
-            # Order by count, with the most represented genre listed first
-            .order_by('-count')
-            # Get the first entry, which should be the most common genre in the list
-            .first()
-        )
-        this_artist.most_common_genre = most_common['genre'] if most_common else None
-
-        related_artists = []
-        artists = Artist.objects.exclude(pk=pk)
-        for artist in artists:
-            filtered_songgenres = SongGenre.objects.filter(
-                song__artist=artist)
-            most_common = (
-                # The values of all the genre fields in filtered_songgenres
-                filtered_songgenres.values('genre')
-                # For each genre, count the number of times that genre appears in the queryset
-                .annotate(count=Count('genre'))
-                # Order by count, with the most represented genre listed first
-                .order_by('-count')
-                # Get the first entry, which should be the most common genre in the list
-                .first()
-            )
-            artist.most_common_genre = most_common['genre'] if most_common else None
-            if artist.most_common_genre is not None and artist.most_common_genre == this_artist.most_common_genre:
-                related_artists.append(artist)
+        related_artists = related_artists_queryset(this_artist.pk)
         serializer = RelatedArtistSerializer(related_artists, many=True)
         return Response({'artists': serializer.data})
 
+    @action(methods=['get'], detail=True)
+    def similar(self, request, pk):
+        """GET request to get the artists with the most similar genre mix
+
+        Accepts ?k= for how many (default 10, at most 100) and
+        ?metric=cosine (default) or jaccard
+        """
+        this_artist = Artist.objects.get(pk=pk)
+
+        artists = similar_artists(
+            this_artist.pk, request.query_params.get('k'),
+            request.query_params.get('metric'))
+        serializer = SimilarArtistSerializer(artists, many=True)
+        return Response({'artists': serializer.data})
+
+    @action(methods=['get'], detail=True)
+    def stats(self, request, pk):
+        """GET request for an artist's song, length, album and genre stats"""
+        # Unknown artists are left out of the stats, so a cached hit needs
+        # no query to tell the artist exists
+        try:
+            artist_id = int(pk)
+        except ValueError as error:
+            raise NotFound() from error
+        stats = artist_stats([artist_id])
+        if artist_id not in stats:
+            raise NotFound()
+        return Response(stats[artist_id])
+
+    @action(methods=['get'], detail=False, url_path='stats')
+    def batch_stats(self, request):
+        """GET request for the stats of many artists
+
+        Accepts ?ids= as a comma-separated list of at most 1000 artist ids,
+        without it every artist is included. Unknown ids are left out.
+        """
+        ids = stats_artist_ids(request.query_params.get('ids'))
+        stats = artist_stats(ids)
+        return Response({'artists': [
+            stats[artist_id] for artist_id in (ids or sorted(stats))
+            if artist_id in stats
+        ]})
+
+
+MAX_STATS_IDS = 1000
+
+
+def stats_artist_ids(value):
+    """Parse ?ids= for the batch stats, None when it is not given
+
+    Raises: ValidationError if an id is not an integer or there are more
+    than MAX_STATS_IDS of them
+    """
+    if value is None:
+        return None
+    try:
+        ids = list(dict.fromkeys(
+            int(part) for part in value.split(',') if part.strip()))
+    except ValueError as error:
+        raise ValidationError(
+            {'ids': ['Ids must be comma-separated integers.']}) from error
+    if len(ids) > MAX_STATS_IDS:
+        raise ValidationError(
+            {'ids': [f'At most {MAX_STATS_IDS} ids are allowed.']})
+    return ids
+
+
+def artist_stats(artist_ids=None):
+    """Song, length, album and genre stats by artist id
+
+    Each artist's stats are cached until one of its songs or song genres
+    changes. The misses are computed together, see compute_artist_stats.
+    """
+    if artist_ids is None:
+        artist_ids = list(Artist.objects.values_list('id', flat=True))
+    return cached_values('artist-stats', artist_ids, compute_artist_stats)
+
+
+def compute_artist_stats(artist_ids):
+    """Stats for the given artists in two grouped queries
 
-class ArtistSerializer(serializers.ModelSerializer):
+    Song counts and lengths come from one aggregate over the artists' songs,
+    the genre distribution from the ArtistGenre counters. Artists that do
+    not exist are left out.
+    """
+    totals = (
+        Artist.objects.filter(pk__in=artist_ids)
+        .values_list('id')
+        .annotate(
+            song_count=Count('songs'),
+            total_length=Sum('songs__length'),
+            average_length=Avg('songs__length'),
+            min_length=Min('songs__length'),
+            max_length=Max('songs__length'),
+            album_count=Count('songs__album', distinct=True))
+        .order_by()
+    )
+    stats = {}
+    for (artist_id, song_count, total_length, average_length, min_length,
+         max_length, album_count) in totals:
+        stats[artist_id] = {
+            'id': artist_id,
+            'song_count': song_count,
+            'total_length': total_length or 0,
+            'average_length': (
+                round(average_length, 2) if average_length is not None
+                else None),
+            'min_length': min_length,
+            'max_length': max_length,
+            'album_count': album_count,
+            'genres': [],
+        }
+
+    genre_counts = (
+        ArtistGenre.objects.filter(artist_id__in=stats)
+        .values_list('artist_id', 'genre_id', 'genre__description',
+                     'song_count')
+        # Read in unique (artist, genre) index order, each artist's few
+        # genres are ranked below rather than by a temporary sort
+        .order_by('artist_id', 'genre_id')
+    )
+    for artist_id, genre_id, description, song_count in genre_counts:
+        stats[artist_id]['genres'].append({
+            'id': genre_id,
+            'description': description,
+            'song_count': song_count,
+        })
+    for artist in stats.values():
+        artist['genres'].sort(key=lambda genre: -genre['song_count'])
+    return stats
+
+
+def include_songs(artists):
+    from tunaapi.views import SongSerializer
+    songs = fast_rows(SongSerializer).rows(
+        Song.objects.filter(artist_id__in=artists))
+    links = {}
+    for song in songs:
+        links.setdefault(song['artist_id'], []).append(song['id'])
+    return songs, links
+
+
+def include_genres(artists):
+    pairs = (
+        ArtistGenre.objects.filter(artist_id__in=artists)
+        .values_list('artist_id', 'genre_id', 'genre__description')
+        .order_by('artist_id', 'genre_id')
+    )
+    return link_pairs(pairs, ('id', 'description'))
+
+
+ARTIST_INCLUDES = {
+    'songs': Relation('songs', include_songs, link='song_ids'),
+    'genres': Relation('genres', include_genres, link='genre_ids'),
+}
+
+
+def artist_detail_queryset(fields=None):
+    """Artists with their songs prefetched for SingleArtistSerializer
+
+    Set song_count on the fetched artist with count_songs. With `fields`
+    from ?fields=, only what those fields need is loaded.
+    """
+    artists = only_fields(Artist.objects.all(), SingleArtistSerializer, fields)
+    if fields is None or {'songs', 'song_count'}.intersection(fields):
+        artists = artists.prefetch_related('songs')
+    return artists
+
+
+def count_songs(artist):
+    # Count the prefetched songs rather than joining and grouping for it
+    artist.song_count = len(artist.songs.all())
+
+
+def related_artists_queryset(artist_id):
+    """Artists sharing the given artist's most common genre"""
+    # ArtistGenre flags each artist's most common genre, so this is a
+    # single lookup on the dominant-genre index
+    dominant_genre = ArtistGenre.objects.filter(
+        artist_id=artist_id, is_dominant=True).values('genre_id')
+    return (
+        Artist.objects
+        .filter(genre_counts__is_dominant=True,
+                genre_counts__genre_id=Subquery(dominant_genre))
+        .exclude(pk=artist_id)
+        # Same as ordering by artist id, but read in index order
+        .order_by('genre_counts__artist_id')
+    )
+
+
+def similar_artists(artist_id, k=None, metric=None):
+    """Artists ranked by genre-profile similarity, each with a score
+
+    Raises: ValidationError if k is not an integer from 1 to 100 or the
+    metric is unknown
+    """
+    try:
+        k = int(k) if k is not None else 10
+        if not 1 <= k <= 100:
+            raise ValueError
+    except ValueError as error:
+        raise ValidationError(
+            {'k': ['k must be an integer from 1 to 100.']}) from error
+    metric = metric or 'cosine'
+    if metric not in METRICS:
+        raise ValidationError(
+            {'metric': [f"Metric must be one of {', '.join(METRICS)}."]})
+
+    # Scores come from the in-memory genre profiles, only names are queried
+    ranked = artist_similarity.similar(artist_id, k, metric)
+    artists = Artist.objects.only('id', 'name').in_bulk(
+        [similar_id for similar_id, _ in ranked])
+    found = []
+    for similar_id, score in ranked:
+        if similar_id in artists:
+            artist = artists[similar_id]
+            artist.score = round(score, 6)
+            found.append(artist)
+    return found
+
+
+def build_artists(valid):
+    return [Artist(**data) for _, data in valid], []
+
+
+def announce_artists(artists):
+    # bulk_create skips post_save, which drops cached details of the ids
+    invalidate('artist', [artist.pk for artist in artists])
+
+
+class ArtistSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """JSON serializer for artists"""
 
     class Meta:
@@ -121,7 +375,7 @@ class ArtistSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'age', 'bio')
 
 
-class SingleArtistSerializer(serializers.ModelSerializer):
+class SingleArtistSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """JSON serializer for single artist"""
     song_count = serializers.IntegerField(default=None)
 
@@ -137,3 +391,12 @@ class RelatedArtistSerializer(serializers.ModelSerializer):
     class Meta:
         model = Artist
         fields = ('id', 'name')
+
+
+class SimilarArtistSerializer(serializers.ModelSerializer):
+    """JSON serializer for similar artists with their similarity score"""
+    score = serializers.FloatField()
+
+    class Meta:
+        model = Artist
+        fields = ('id', 'name', 'score')
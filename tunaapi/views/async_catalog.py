@@ -0,0 +1,125 @@
+"""Async read endpoints for the catalog, served natively under ASGI
+
+These mirror the read actions of the ViewSets (list, retrieve, popular and
+related) as async views, so a slow client does not hold a worker thread
+while its response is produced. They reuse the ViewSets' querysets and
+serializers; every query is awaited through Django's async ORM and the
+serializers only read data that was already loaded.
+"""
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+
+from tunaapi.filters import SongFilter
+from tunaapi.models import Artist, Genre, Song, SongGenre
+from tunaapi.pagination import CatalogCursorPagination
+from tunaapi.renderers import FastJSONRenderer
+from tunaapi.views.artist import (ArtistSerializer, RelatedArtistSerializer,
+                                  SingleArtistSerializer, artist_detail_queryset,
+                                  count_songs, related_artists_queryset)
+from tunaapi.views.genre import (GenreSerializer, PopularGenreSerializer,
+                                 SingleGenreSerializer, genre_detail_queryset,
+                                 popular_genres)
+from tunaapi.views.song import SingleSongSerializer, SongSerializer, song_detail_queryset
+from tunaapi.views.fast_rows import fast_rows
+from tunaapi.views.song_genre import AllSongGenreSerializer
+
+
+def _json_response(data, status_code=status.HTTP_200_OK):
+    return HttpResponse(FastJSONRenderer().render(data), status=status_code,
+                        content_type=FastJSONRenderer.media_type)
+
+
+def _not_found():
+    return _json_response({'detail': 'Not found.'}, status.HTTP_404_NOT_FOUND)
+
+
+def _api_error(error):
+    return _json_response(error.detail, error.status_code)
+
+
+async def _list_response(request, queryset, serializer_class, ordering_fields=('id',)):
+    """Full list or, when requested, a cursor page, as in the ViewSets"""
+    drf_request = Request(request)
+    paginator = CatalogCursorPagination(ordering_fields=ordering_fields)
+    if paginator.is_requested(drf_request):
+        try:
+            page = await sync_to_async(paginator.paginate_queryset)(
+                queryset, drf_request)
+        except APIException as error:
+            return _api_error(error)
+        response = paginator.get_paginated_response(
+            serializer_class(page, many=True).data)
+        return _json_response(response.data)
+
+    rows = fast_rows(serializer_class)
+    return _json_response(
+        [rows.build(row) async for row in rows.values_list(queryset)])
+
+
+async def artist_list(request):
+    return await _list_response(
+        request, Artist.objects.all(), ArtistSerializer, ('id', 'name', 'age'))
+
+
+async def artist_detail(request, pk):
+    artist = await artist_detail_queryset().filter(pk=pk).afirst()
+    if artist is None:
+        return _not_found()
+    count_songs(artist)
+    return _json_response(SingleArtistSerializer(artist).data)
+
+
+async def artist_related(request, pk):
+    if not await Artist.objects.filter(pk=pk).aexists():
+        return _not_found()
+    artists = [artist async for artist in related_artists_queryset(pk)]
+    return _json_response(
+        {'artists': RelatedArtistSerializer(artists, many=True).data})
+
+
+async def genre_list(request):
+    return await _list_response(
+        request, Genre.objects.all(), GenreSerializer, ('id', 'description'))
+
+
+async def genre_detail(request, pk):
+    genre = await genre_detail_queryset().filter(pk=pk).afirst()
+    if genre is None:
+        return _not_found()
+    return _json_response(SingleGenreSerializer(genre).data)
+
+
+async def genre_popular(request):
+    try:
+        genres = popular_genres(request.GET.get('limit'))
+    except APIException as error:
+        return _api_error(error)
+    genres = [genre async for genre in genres]
+    return _json_response(
+        {'genres': PopularGenreSerializer(genres, many=True).data})
+
+
+async def song_list(request):
+    filterset = SongFilter(data=request.GET, queryset=Song.objects.live())
+    # Genre filters read the in-memory genre index, which loads itself with
+    # the sync ORM when cold or stale, so the filters run off the event loop
+    queryset = await sync_to_async(lambda: filterset.qs)()
+    return await _list_response(
+        request, queryset, SongSerializer, ('id', 'title', 'album', 'length'))
+
+
+async def song_detail(request, pk):
+    song = await song_detail_queryset().filter(pk=pk).afirst()
+    if song is None:
+        return _not_found()
+    return _json_response(SingleSongSerializer(song).data)
+
+
+async def songgenre_list(request):
+    return await _list_response(
+        request,
+        SongGenre.objects.live().select_related('song__artist', 'genre'),
+        AllSongGenreSerializer)
@@ -0,0 +1,65 @@
+"""Shared handling for the bulk create endpoints"""
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+from tunaapi.models import Change
+
+BULK_BATCH_SIZE = 1000
+
+
+def bulk_create_response(request, input_serializer, build_batch,
+                         output_serializer, after_create=None):
+    """Validate and insert a list of items, reporting errors per item
+
+    Items are validated one by one and handed to `build_batch` in batches of
+    BULK_BATCH_SIZE as (index, validated_data) pairs. `build_batch` resolves
+    any foreign keys for the whole batch at once and returns the unsaved
+    instances plus errors for the items it had to reject. Every batch is
+    inserted with bulk_create inside a single transaction and logged as
+    created in the change log; invalid items are skipped without failing
+    the rest. `after_create`, if given, is called
+    with the created instances before the transaction commits.
+
+    Returns: {'created': [...], 'errors': [{'index': i, 'errors': {...}}]}
+    with 201 if anything was created, else 400
+    """
+    items = request.data
+    if not isinstance(items, list):
+        return Response({'detail': 'Expected a list of items.'},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    created = []
+    errors = []
+    with transaction.atomic():
+        for start in range(0, len(items), BULK_BATCH_SIZE):
+            valid = []
+            for index, item in enumerate(items[start:start + BULK_BATCH_SIZE], start):
+                serializer = input_serializer(data=item)
+                if serializer.is_valid():
+                    valid.append((index, serializer.validated_data))
+                else:
+                    errors.append({'index': index, 'errors': serializer.errors})
+            if not valid:
+                continue
+
+            instances, batch_errors = build_batch(valid)
+            errors.extend(batch_errors)
+            if instances:
+                model = type(instances[0])
+                batch = model.objects.bulk_create(instances)
+                Change.objects.record(Change.CREATED, batch)
+                created.extend(batch)
+
+        if after_create is not None and created:
+            after_create(created)
+
+    errors.sort(key=lambda error: error['index'])
+    return Response(
+        {'created': output_serializer(created, many=True).data,
+         'errors': errors},
+        status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST)
+
+
+def missing_error(index, field, label):
+    """Error entry for an item pointing at a row that does not exist"""
+    return {'index': index, 'errors': {field: [f'{label} does not exist.']}}
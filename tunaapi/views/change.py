@@ -0,0 +1,84 @@
+"""View module for handling requests about catalog changes"""
+from django.db.models import Max
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+from rest_framework.viewsets import ViewSet
+from tunaapi.models import Change
+
+CHANGES_PAGE_SIZE = 100
+CHANGES_MAX_PAGE_SIZE = 1000
+
+
+class ChangeView(ViewSet):
+    """Tuna API change feed view"""
+
+    def list(self, request):
+        """Handle GET requests for the changes after a cursor
+
+        Accepts ?since= with the cursor of the last change already applied
+        (default 0, from the start of the log) or `latest` for the current
+        position only, and ?page_size= (at most 1000).
+
+        To start syncing, read ?since=latest, download the lists, then apply
+        the changes since that cursor: rows written before the log existed,
+        or seeded, are only in the lists.
+
+        Returns: JSON with the changes in order, the cursor to pass next
+        time and a `next` link while more changes are waiting
+        """
+        page_size = page_size_param(request.query_params.get('page_size'))
+        since = request.query_params.get('since', '0')
+        if since == 'latest':
+            latest = Change.objects.aggregate(latest=Max('id'))['latest']
+            return Response({'results': [], 'cursor': latest or 0, 'next': None})
+        since = cursor_param(since)
+
+        changes = list(
+            Change.objects.filter(id__gt=since).order_by('id')[:page_size + 1])
+        more = len(changes) > page_size
+        changes = changes[:page_size]
+        cursor = changes[-1].id if changes else since
+        next_url = None
+        if more:
+            next_url = replace_query_param(
+                request.build_absolute_uri(), 'since', cursor)
+        serializer = ChangeSerializer(changes, many=True)
+        return Response(
+            {'results': serializer.data, 'cursor': cursor, 'next': next_url})
+
+
+def cursor_param(value):
+    """Raises: ValidationError unless the cursor is a non-negative integer"""
+    try:
+        cursor = int(value)
+        if cursor < 0:
+            raise ValueError
+    except ValueError as error:
+        raise ValidationError({'since': [
+            "Since must be a cursor from this feed or 'latest'."]}) from error
+    return cursor
+
+
+def page_size_param(value):
+    """Raises: ValidationError unless the page size is from 1 to 1000"""
+    if value is None:
+        return CHANGES_PAGE_SIZE
+    try:
+        page_size = int(value)
+        if not 1 <= page_size <= CHANGES_MAX_PAGE_SIZE:
+            raise ValueError
+    except ValueError as error:
+        raise ValidationError({'page_size': [
+            f'Page size must be an integer from 1 to {CHANGES_MAX_PAGE_SIZE}.'
+        ]}) from error
+    return page_size
+
+
+class ChangeSerializer(serializers.ModelSerializer):
+    """JSON serializer for change log entries"""
+
+    class Meta:
+        model = Change
+        fields = ('id', 'resource', 'object_id', 'action', 'data', 'changed_at')
@@ -0,0 +1,30 @@
+"""View module for streaming the whole catalog in one response"""
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+
+from tunaapi.export import (EXPORT_FORMATS, content_type, export_chunks,
+                            export_filename)
+
+
+@require_GET
+def export(request):
+    """Handle GET requests for a catalog export
+
+    Accepts ?format=ndjson (default) or csv, and ?gzip=1 for a gzipped file
+
+    Returns: a streamed attachment with one row per song, its artist's name
+    and its genres
+    """
+    output_format = request.GET.get('format', 'ndjson')
+    if output_format not in EXPORT_FORMATS:
+        return JsonResponse(
+            {'format': [f"Format must be one of {', '.join(EXPORT_FORMATS)}."]},
+            status=400)
+    compress = request.GET.get('gzip', '').lower() in ('1', 'true')
+
+    response = StreamingHttpResponse(
+        export_chunks(output_format, compress),
+        content_type=content_type(output_format, compress))
+    response['Content-Disposition'] = (
+        f'attachment; filename="{export_filename(output_format, compress)}"')
+    return response
@@ -3,31 +3,51 @@ from django.http import HttpResponseServerError
 from rest_framework.viewsets import ViewSet
 from rest_framework.response import Response
 from rest_framework import serializers, status
-from tunaapi.models import Genre, Song
+from rest_framework.exceptions import ValidationError
+from tunaapi.models import Genre, GenrePopularity, SongGenre
+from tunaapi.caching import cached_detail, coalesced
+from tunaapi.pagination import CatalogCursorPagination
+from tunaapi.views.fast_rows import fast_rows
+from tunaapi.views.includes import (Relation, detail_with_includes,
+                                    link_pairs, list_with_includes,
+                                    page_with_includes, requested_includes)
 from rest_framework.decorators import action
-from django.db.models import Count
+from django.db.models import Prefetch
 
 
 class GenreView(ViewSet):
     """Tuna API genres view"""
 
+    @cached_detail('genre')
     def retrieve(self, request, pk):
         """Handle GET requests for single genre
 
         Returns: JSON serialized genre
         """
-        genre = Genre.objects.get(pk=pk)
+        includes = requested_includes(request, GENRE_INCLUDES)
+        genre = genre_detail_queryset().get(pk=pk)
         serializer = SingleGenreSerializer(genre)
-        return Response(serializer.data)
+        return Response(
+            detail_with_includes(serializer.data, includes, genre.pk))
 
     def list(self, request):
         """Handle GET requests to get all genres
 
         Returns: JSON serialized list of all genres
         """
+        includes = requested_includes(request, GENRE_INCLUDES)
         genres = Genre.objects.all()
+
+        paginator = CatalogCursorPagination(
+            ordering_fields=('id', 'description'))
+        if paginator.is_requested(request):
+            page = paginator.paginate_queryset(genres, request, view=self)
+            serializer = GenreSerializer(page, many=True)
+            return page_with_includes(paginator, serializer.data, includes)
+
         serializer = GenreSerializer(genres, many=True)
-        return Response(serializer.data)
+        return Response(list_with_includes(
+            serializer.data, includes, genres.values('pk')))
 
     def create(self, request):
         """Handle POST requests for genres
@@ -63,16 +83,62 @@ class GenreView(ViewSet):
         return Response(None, status=status.HTTP_204_NO_CONTENT)
 
     @action(methods=['get'], detail=False)
+    @coalesced('genre-popular')
     def popular(self, request):
-        """GET request to get popular genres"""
-        # Gets list of genre objects that have an entry in SongGenre(this counts the songs without needing a join table)
-        # Orders by song count, DESCENDING (not django's default)
-        genres = Genre.objects.annotate(
-            song_count=Count('songgenre')).order_by('-song_count')
+        """GET request to get popular genres
+
+        Accepts ?limit= to return only the top N genres
+        """
+        genres = popular_genres(request.query_params.get('limit'))
         serializer = PopularGenreSerializer(genres, many=True)
         return Response({'genres': serializer.data})
 
 
+def genre_detail_queryset():
+    """Genres with their songs prefetched for SingleGenreSerializer"""
+    return Genre.objects.prefetch_related(
+        Prefetch('songgenre_set',
+                 queryset=SongGenre.objects.live().select_related('song')))
+
+
+def include_songs(genres):
+    from tunaapi.views import SongSerializer
+    columns = fast_rows(SongSerializer).columns
+    pairs = (
+        SongGenre.objects.live().filter(genre_id__in=genres)
+        .values_list('genre_id', *(f'song__{column}' for column in columns))
+        .order_by('genre_id', 'song_id')
+    )
+    return link_pairs(pairs, SongSerializer.Meta.fields)
+
+
+GENRE_INCLUDES = {
+    'songs': Relation('songs', include_songs, link='song_ids'),
+}
+
+
+def popular_genres(limit=None):
+    """Genres by song count, optionally only the top `limit`
+
+    Raises: ValidationError if limit is not a positive integer
+    """
+    # Song counts are kept per genre in GenrePopularity as songs are tagged, so this reads them off an index
+    # Orders by song count, DESCENDING (not django's default), ties broken by genre id
+    genres = GenrePopularity.objects.select_related(
+        'genre').order_by('-song_count', 'genre_id')
+
+    if limit is not None:
+        try:
+            limit = int(limit)
+            if limit < 1:
+                raise ValueError
+        except ValueError as error:
+            raise ValidationError(
+                {'limit': ['Limit must be a positive integer.']}) from error
+        genres = genres[:limit]
+    return genres
+
+
 class GenreSerializer(serializers.ModelSerializer):
     """JSON serializer for genres"""
 
@@ -91,14 +157,16 @@ class SingleGenreSerializer(serializers.ModelSerializer):
 
     def get_songs(self, obj):
         from tunaapi.views import SongSerializer
-        songs = Song.objects.filter(songgenre__genre=obj)
+        # Reads the songs through the songgenre_set prefetch made in retrieve
+        songs = [song_genre.song for song_genre in obj.songgenre_set.all()]
         return SongSerializer(songs, many=True).data
 
 
 class PopularGenreSerializer(serializers.ModelSerializer):
     """JSON serializer for list of genres by song count"""
-    song_count = serializers.IntegerField(read_only=True)
+    id = serializers.IntegerField(source='genre_id')
+    description = serializers.CharField(source='genre.description')
 
     class Meta:
-        model = Genre
+        model = GenrePopularity
         fields = ('id', 'description', 'song_count')
@@ -0,0 +1,120 @@
+"""Compound documents: `?include=` side-loads related resources
+
+`/songs?include=artist,genres` answers with the songs plus an `included`
+object holding each related artist and genre once, however many songs
+point at it. Every included relation is loaded with one query, whatever
+the page size, so clients no longer fetch the related resources one by one.
+"""
+from rest_framework.exceptions import ValidationError
+
+INCLUDE_PARAM = 'include'
+
+
+class Relation:
+    """A relation that can be named in `?include=`
+
+    `load(primary)` is given the primary keys, as a list or a values('pk')
+    queryset, runs one query and returns the related rows. To-many relations
+    also return a dict of primary key to related ids, stored on each primary
+    row under `link`; to-one relations return None, the primary row already
+    has the foreign key. `needs` are the primary fields the linkage is read
+    from, kept even when `?fields=` leaves them out.
+    """
+
+    def __init__(self, key, load, link=None, needs=('id',)):
+        self.key = key
+        self.load = load
+        self.link = link
+        self.needs = needs
+
+
+def requested_includes(request, relations):
+    """The relations named in `?include=`, in declaration order
+
+    Returns None when the parameter is absent.
+    Raises ValidationError for names that are not in `relations`.
+    """
+    raw = request.query_params.get(INCLUDE_PARAM)
+    if raw is None:
+        return None
+    names = {name.strip() for name in raw.split(',') if name.strip()}
+    unknown = sorted(names.difference(relations))
+    if unknown or not names:
+        raise ValidationError({INCLUDE_PARAM: [
+            f"Unknown relation(s) {', '.join(unknown) or '(none given)'}, "
+            f"choose from {', '.join(relations)}."]})
+    return [relation for name, relation in relations.items() if name in names]
+
+
+def include_fields(fields, serializer_class, includes):
+    """`fields` from ?fields= widened to what the includes link through"""
+    if fields is None or not includes:
+        return fields
+    needed = set(fields).union(
+        *(relation.needs for relation in includes))
+    return tuple(name for name in serializer_class.Meta.fields
+                 if name in needed)
+
+
+def load_includes(includes, primary, rows):
+    """The `included` object for the primary `rows`
+
+    Adds the linkage of to-many relations to each row.
+    """
+    included = {}
+    for relation in includes:
+        related, links = relation.load(primary)
+        included[relation.key] = related
+        if links is not None:
+            for row in rows:
+                row[relation.link] = links.get(row['id'], [])
+    return included
+
+
+def link_pairs(pairs, keys):
+    """Related rows and linkage from (primary id, related id, ...) tuples
+
+    The related columns after the primary id become a dict under `keys`.
+    Each related row is returned once, in id order.
+    """
+    related = {}
+    links = {}
+    for primary_id, *columns in pairs:
+        related_id = columns[0]
+        if related_id not in related:
+            related[related_id] = dict(zip(keys, columns))
+        links.setdefault(primary_id, []).append(related_id)
+    return [related[related_id] for related_id in sorted(related)], links
+
+
+def list_with_includes(rows, includes, primary):
+    """Unpaginated list data, wrapped with `included` when asked for"""
+    if not includes:
+        return rows
+    return {'results': rows,
+            'included': load_includes(includes, primary, rows)}
+
+
+def page_with_includes(paginator, rows, includes):
+    """The paginated response, with `included` next to the results"""
+    response = paginator.get_paginated_response(rows)
+    if includes:
+        response.data['included'] = load_includes(
+            includes, [row['id'] for row in rows], rows)
+    return response
+
+
+def detail_with_includes(data, includes, pk):
+    """Detail data with an `included` key when asked for"""
+    if not includes:
+        return data
+    data = dict(data)
+    data['included'] = load_includes(includes, [pk], [data])
+    return data
+
+
+def reject_streamed_includes(includes, streamed):
+    """Raises: ValidationError when includes are asked of a streamed list"""
+    if includes and streamed:
+        raise ValidationError({INCLUDE_PARAM: [
+            'Includes are not available on streamed lists.']})
@@ -0,0 +1,15 @@
+"""View module for exposing in-process metrics"""
+from django.http import HttpResponse
+from django.views.decorators.http import require_GET
+
+from tunaapi.metrics import registry
+
+
+@require_GET
+def metrics(request):
+    """Handle GET requests for metrics
+
+    Returns: all metrics in the Prometheus text exposition format
+    """
+    return HttpResponse(
+        registry.render(), content_type='text/plain; version=0.0.4')
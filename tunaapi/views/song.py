@@ -3,22 +3,46 @@ from django.http import HttpResponseServerError
 from rest_framework.viewsets import ViewSet
 from rest_framework.response import Response
 from rest_framework import serializers, status
-from tunaapi.models import Song, Artist, Genre, SongGenre
-from tunaapi.views import GenreSerializer
+from rest_framework.decorators import action
+from rest_framework.settings import api_settings
+from django.db.models import Prefetch
+from tunaapi.models import Song, Artist, SongGenre
+from tunaapi.views import ArtistSerializer, GenreSerializer
 from tunaapi.filters import SongFilter
+from tunaapi.caching import cached_detail
+from tunaapi.pagination import CatalogCursorPagination, SearchCursorPagination
+from tunaapi.renderers import (NDJSONRenderer, stream_rows, streaming_response,
+                               wants_stream)
+from tunaapi.search import search_songs
+from tunaapi.signals import catalog_bulk_changed
+from tunaapi.views.bulk import bulk_create_response, missing_error
+from tunaapi.views.fast_rows import fast_rows
+from tunaapi.views.includes import (Relation, detail_with_includes,
+                                    include_fields, link_pairs,
+                                    list_with_includes, page_with_includes,
+                                    reject_streamed_includes,
+                                    requested_includes)
+from tunaapi.views.sparse_fields import (SparseFieldsMixin, ordering_columns,
+                                         only_fields, requested_fields)
 
 
 class SongView(ViewSet):
     """Tuna API songs view"""
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES + [NDJSONRenderer]
 
+    @cached_detail('song')
     def retrieve(self, request, pk):
         """Handle GET requests for single song
 
         Returns: JSON serialized song
         """
-        song = Song.objects.get(pk=pk)
-        serializer = SingleSongSerializer(song)
-        return Response(serializer.data)
+        includes = requested_includes(request, SONG_INCLUDES)
+        fields = include_fields(requested_fields(
+            request, SingleSongSerializer), SingleSongSerializer, includes)
+        song = song_detail_queryset(fields).get(pk=pk)
+        serializer = SingleSongSerializer(song, fields=fields)
+        return Response(
+            detail_with_includes(serializer.data, includes, song.pk))
 
     def list(self, request):
         """Handle GET requests to get all songs
@@ -26,10 +50,41 @@ class SongView(ViewSet):
         Returns: JSON serialized list of all songs
         """
 
-        filterset = SongFilter(data=request.GET, queryset=Song.objects.all())
+        includes = requested_includes(request, SONG_INCLUDES)
+        reject_streamed_includes(includes, wants_stream(request))
+        fields = include_fields(
+            requested_fields(request, SongSerializer), SongSerializer, includes)
+        filterset = SongFilter(data=request.GET, queryset=Song.objects.live())
         songs = filterset.qs
-        serializer = SongSerializer(songs, many=True)
-        return Response(serializer.data)
+
+        query = request.query_params.get('q')
+        if query is not None:
+            # Ranked full-text search, always paginated most relevant first
+            songs = only_fields(search_songs(songs, query), SongSerializer, fields)
+            if wants_stream(request):
+                return streaming_response(request, songs, SongSerializer,
+                                          fields=fields)
+            paginator = SearchCursorPagination()
+            page = paginator.paginate_queryset(songs, request, view=self)
+            serializer = SongSerializer(page, many=True, fields=fields)
+            return page_with_includes(paginator, serializer.data, includes)
+
+        # Output built straight from column values, same as SongSerializer's
+        rows = fast_rows(SongSerializer, fields)
+        if wants_stream(request):
+            return stream_rows(request, rows.iterator(songs))
+
+        paginator = CatalogCursorPagination(
+            ordering_fields=('id', 'title', 'album', 'length'))
+        if paginator.is_requested(request):
+            songs = rows.page_queryset(songs, ordering_columns(
+                paginator, request, songs, self))
+            page = paginator.paginate_queryset(songs, request, view=self)
+            return page_with_includes(
+                paginator, rows.from_dicts(page), includes)
+
+        return Response(list_with_includes(
+            rows.rows(songs), includes, songs.values('pk')))
 
     def create(self, request):
         """Handle POST requests for songs
@@ -73,8 +128,74 @@ class SongView(ViewSet):
         song.delete()
         return Response(None, status=status.HTTP_204_NO_CONTENT)
 
+    @action(methods=['post'], detail=False)
+    def bulk(self, request):
+        """Handle POST requests for a list of songs
+
+        Returns: JSON serialized created songs and per-item errors
+        """
+        return bulk_create_response(
+            request, BulkSongSerializer, build_songs, SongSerializer,
+            after_create=announce_songs)
+
+
+def song_detail_queryset(fields=None):
+    """Songs with their artist and genres loaded for SingleSongSerializer
+
+    With `fields` from ?fields=, only what those fields need is loaded.
+    """
+    songs = only_fields(Song.objects.live(), SingleSongSerializer, fields)
+    if fields is None or 'artist' in fields:
+        songs = songs.select_related('artist')
+    if fields is None or 'genres' in fields:
+        songs = songs.prefetch_related(
+            Prefetch('songgenre_set',
+                     queryset=SongGenre.objects.select_related('genre')))
+    return songs
+
+
+def include_artists(songs):
+    artists = Artist.objects.filter(
+        pk__in=Song.objects.filter(pk__in=songs).values('artist_id'))
+    return fast_rows(ArtistSerializer).rows(artists), None
+
+
+def include_genres(songs):
+    pairs = (
+        SongGenre.objects.filter(song_id__in=songs)
+        .values_list('song_id', 'genre_id', 'genre__description')
+        .order_by('song_id', 'genre_id')
+    )
+    return link_pairs(pairs, GenreSerializer.Meta.fields)
 
-class SongSerializer(serializers.ModelSerializer):
+
+SONG_INCLUDES = {
+    'artist': Relation('artists', include_artists, needs=('id', 'artist_id')),
+    'genres': Relation('genres', include_genres, link='genre_ids'),
+}
+
+
+def build_songs(valid):
+    artists = Artist.objects.only('id').in_bulk(
+        {data['artist_id'] for _, data in valid})
+    songs = []
+    errors = []
+    for index, data in valid:
+        if data['artist_id'] in artists:
+            songs.append(Song(**data))
+        else:
+            errors.append(missing_error(index, 'artist_id', 'Artist'))
+    return songs, errors
+
+
+def announce_songs(songs):
+    # bulk_create skips model signals, so tell derived data about the new songs
+    catalog_bulk_changed.send(
+        sender=Song, artist_ids={song.artist_id for song in songs},
+        song_ids={song.id for song in songs})
+
+
+class SongSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """JSON serializer for songs"""
 
     class Meta:
@@ -82,17 +203,28 @@ class SongSerializer(serializers.ModelSerializer):
         fields = ('id', 'title', 'artist_id', 'album', 'length')
 
 
-class SingleSongSerializer(serializers.ModelSerializer):
+class BulkSongSerializer(serializers.ModelSerializer):
+    """JSON serializer for validating songs sent to the bulk endpoint"""
+    artist_id = serializers.IntegerField()
+
+    class Meta:
+        model = Song
+        fields = ('title', 'artist_id', 'album', 'length')
+
+
+class SingleSongSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """JSON serializer for a single song"""
     # This is saying the genres field needs its own logic, django will look for the get_genres function to determine the logic. It will look for get_fieldname for whatever the field name is
     genres = serializers.SerializerMethodField()
+    # Declared rather than nested with depth, which would list every
+    # artist column, soft-delete bookkeeping included
+    artist = ArtistSerializer(read_only=True)
 
     class Meta:
         model = Song
         fields = ('id', 'title', 'artist', 'album', 'length', 'genres')
-        depth = 1
 
     def get_genres(self, obj):
-        # Get genre records. Look at the SongGenre table, find where the song field in the songgenre table (songgenre__song) equals our current song (obj)
-        genres = Genre.objects.filter(songgenre__song=obj)
+        # Get genre records from the SongGenre rows prefetched in retrieve, each one already joined to its genre
+        genres = [song_genre.genre for song_genre in obj.songgenre_set.all()]
         return GenreSerializer(genres, many=True).data
@@ -1,25 +1,41 @@
 """View module for handling requests about song genres"""
+from django.db import IntegrityError, transaction
 from django.http import HttpResponseServerError
 from rest_framework.viewsets import ViewSet
 from rest_framework.response import Response
 from rest_framework import serializers, status
+from rest_framework.decorators import action
+from rest_framework.settings import api_settings
 from tunaapi.models import SongGenre, Song, Genre
+from tunaapi.pagination import CatalogCursorPagination
+from tunaapi.renderers import NDJSONRenderer, stream_rows, wants_stream
+from tunaapi.views import ArtistSerializer, GenreSerializer
+from tunaapi.views.fast_rows import fast_rows
+from tunaapi.signals import catalog_bulk_changed
+from tunaapi.views.bulk import bulk_create_response, missing_error
 
 
 class SongGenreView(ViewSet):
     """Tuna API song genre view"""
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES + [NDJSONRenderer]
 
     def create(self, request):
         """Handle POST requests for song genres
 
-        Returns: JSON serialized song genres
+        Returns: JSON serialized song genres, or 400 if the song already has the genre
         """
         song = Song.objects.get(pk=request.data["song"])
         genre = Genre.objects.get(pk=request.data["genre"])
-        songGenre = SongGenre.objects.create(
-            song=song,
-            genre=genre
-        )
+        try:
+            with transaction.atomic():
+                songGenre = SongGenre.objects.create(
+                    song=song,
+                    genre=genre
+                )
+        except IntegrityError:
+            return Response(
+                {'detail': 'Song already has this genre.'},
+                status=status.HTTP_400_BAD_REQUEST)
         serializer = SongGenreSerializer(songGenre)
         return Response(serializer.data)
 
@@ -28,11 +44,32 @@ class SongGenreView(ViewSet):
 
         Returns: JSON serialized list of all song genres
         """
-        song_genres = SongGenre.objects.all()
+        song_genres = SongGenre.objects.live()
+        # Nested song, artist and genre read from one joined values_list
+        rows = fast_rows(AllSongGenreSerializer)
 
-        serializer = AllSongGenreSerializer(song_genres, many=True)
-        return Response(serializer.data)
+        if wants_stream(request):
+            return stream_rows(request, rows.iterator(song_genres))
+
+        paginator = CatalogCursorPagination()
+        if paginator.is_requested(request):
+            page = paginator.paginate_queryset(
+                rows.page_queryset(song_genres), request, view=self)
+            return paginator.get_paginated_response(rows.from_dicts(page))
+
+        return Response(rows.rows(song_genres))
+
+    @action(methods=['post'], detail=False)
+    def bulk(self, request):
+        """Handle POST requests for a list of song genres
 
+        Returns: JSON serialized created song genres and per-item errors
+        """
+        return bulk_create_response(
+            request, BulkSongGenreSerializer, build_song_genres,
+            SongGenreSerializer, after_create=recount_song_genres)
+
+    @transaction.atomic
     def destroy(self, request, pk):
         """Handle DELETE requests for song genres
 
@@ -43,6 +80,41 @@ class SongGenreView(ViewSet):
         return Response(None, status=status.HTTP_204_NO_CONTENT)
 
 
+def build_song_genres(valid):
+    songs = Song.objects.only('id', 'artist_id').in_bulk(
+        {data['song'] for _, data in valid})
+    genres = Genre.objects.only('id').in_bulk(
+        {data['genre'] for _, data in valid})
+    # Pairs already linked, plus those added earlier in this batch
+    linked = set(SongGenre.objects.filter(
+        song_id__in=songs, genre_id__in=genres).values_list('song_id', 'genre_id'))
+    song_genres = []
+    errors = []
+    for index, data in valid:
+        pair = (data['song'], data['genre'])
+        if data['song'] not in songs:
+            errors.append(missing_error(index, 'song', 'Song'))
+        elif data['genre'] not in genres:
+            errors.append(missing_error(index, 'genre', 'Genre'))
+        elif pair in linked:
+            errors.append({'index': index, 'errors': {
+                'non_field_errors': ['Song already has this genre.']}})
+        else:
+            linked.add(pair)
+            song_genres.append(SongGenre(
+                song=songs[data['song']], genre=genres[data['genre']]))
+    return song_genres, errors
+
+
+def recount_song_genres(song_genres):
+    # bulk_create skips model signals, so refresh the derived counters here
+    catalog_bulk_changed.send(
+        sender=SongGenre,
+        artist_ids={song_genre.song.artist_id for song_genre in song_genres},
+        genre_ids={song_genre.genre_id for song_genre in song_genres},
+        song_ids={song_genre.song_id for song_genre in song_genres})
+
+
 class SongGenreSerializer(serializers.ModelSerializer):
     """JSON serializer for song genres"""
 
@@ -51,10 +123,28 @@ class SongGenreSerializer(serializers.ModelSerializer):
         fields = ('id', 'song', 'genre')
 
 
+class NestedSongSerializer(serializers.ModelSerializer):
+    """JSON serializer for a song with its artist, nested in song genres"""
+    artist = ArtistSerializer(read_only=True)
+
+    class Meta:
+        model = Song
+        fields = ('id', 'title', 'artist', 'album', 'length')
+
+
 class AllSongGenreSerializer(serializers.ModelSerializer):
     """JSON serializer for song genres"""
+    # Declared rather than nested with depth, which would list every
+    # artist column, soft-delete bookkeeping included
+    song = NestedSongSerializer(read_only=True)
+    genre = GenreSerializer(read_only=True)
 
     class Meta:
         model = SongGenre
         fields = ('id', 'song', 'genre')
-        depth = 2
+
+
+class BulkSongGenreSerializer(serializers.Serializer):
+    """JSON serializer for validating song genres sent to the bulk endpoint"""
+    song = serializers.IntegerField()
+    genre = serializers.IntegerField()
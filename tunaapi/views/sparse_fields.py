@@ -0,0 +1,71 @@
+"""Sparse fieldsets: `?fields=` trims a response down to the named fields
+
+The requested fields are pushed down to the queryset as well, so columns
+nobody asked for are never read from the database.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework.exceptions import ValidationError
+
+FIELDS_PARAM = 'fields'
+
+
+def requested_fields(request, serializer_class):
+    """The fields named in `?fields=`, in the serializer's order
+
+    Returns None when the parameter is absent, meaning every field.
+    Raises ValidationError for names the serializer does not have.
+    """
+    raw = request.query_params.get(FIELDS_PARAM)
+    if raw is None:
+        return None
+    names = {name.strip() for name in raw.split(',') if name.strip()}
+    available = serializer_class.Meta.fields
+    unknown = sorted(names.difference(available))
+    if unknown or not names:
+        raise ValidationError({FIELDS_PARAM: [
+            f"Unknown field(s) {', '.join(unknown) or '(none given)'}, choose "
+            f"from {', '.join(available)}."]})
+    return tuple(name for name in available if name in names)
+
+
+def model_columns(serializer_class, fields, extra=()):
+    """The concrete model fields backing `fields`, plus the primary key
+
+    `extra` names model fields needed regardless, such as the ordering
+    columns a cursor is built from. Serializer fields with no column
+    (reverse relations, computed values) are left out.
+    """
+    opts = serializer_class.Meta.model._meta
+    columns = {opts.pk.name: opts.pk}
+    for name in (*fields, *extra):
+        try:
+            field = opts.get_field(name)
+        except FieldDoesNotExist:
+            continue
+        if field.concrete:
+            columns[field.name] = field
+    return list(columns.values())
+
+
+def only_fields(queryset, serializer_class, fields, extra=()):
+    """Defer every column the requested fields do not need"""
+    if fields is None:
+        return queryset
+    return queryset.only(*(field.name for field in
+                           model_columns(serializer_class, fields, extra)))
+
+
+def ordering_columns(paginator, request, queryset, view):
+    """Model fields a cursor paginator reads from the rows of a page"""
+    return tuple(name.lstrip('-') for name in
+                 paginator.get_ordering(request, queryset, view))
+
+
+class SparseFieldsMixin:
+    """Serializer accepting `fields=` to drop every other declared field"""
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields).difference(fields):
+                self.fields.pop(name)
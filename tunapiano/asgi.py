@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tunapiano.settings')
 
 application = get_asgi_application()
+
+# Imported once the apps are loaded
+from tunaapi.jobs import start_worker  # noqa: E402
+
+start_worker()
@@ -45,6 +45,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'tunaapi.middleware.SQLInstrumentationMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -77,14 +78,65 @@ WSGI_APPLICATION = 'tunapiano.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.1/ref/settings/#databases
 
+# tunaapi.db.sqlite3 applies WAL journaling and the other pragmas in
+# tunaapi/db/sqlite3/base.py to every new connection, and starts atomic
+# blocks with BEGIN IMMEDIATE so concurrent writers queue up on the lock
+# instead of failing. Connections are kept for CONN_MAX_AGE seconds and
+# checked before being reused.
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'tunaapi.db.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'pragmas': {
+                'busy_timeout': 5000,
+            },
+        },
+    }
+}
+
+
+REST_FRAMEWORK = {
+    # Default page size for list endpoints when a client opts into pagination
+    'PAGE_SIZE': 100,
+    # Same output as DRF's JSONRenderer, encoded with orjson when installed
+    'DEFAULT_RENDERER_CLASSES': [
+        'tunaapi.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+}
+
+# Pagination is opted into per view, so no DEFAULT_PAGINATION_CLASS is set
+SILENCED_SYSTEM_CHECKS = ['rest_framework.W001']
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Backs the detail response cache; point this at a shared backend such as
+# Redis or Memcached when running more than one process
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        # Room for the per-artist stats and version tokens of the whole
+        # catalog, the default of 300 entries culls them on every batch
+        'OPTIONS': {'MAX_ENTRIES': 20000},
     }
 }
 
 
+# Background jobs
+# Threads per web process that run queued recompute jobs (tunaapi.jobs),
+# started by the WSGI and ASGI entry points; 0 leaves the queue to
+# `manage.py jobs work` or `manage.py jobs drain`
+
+JOB_WORKERS = 1
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
 
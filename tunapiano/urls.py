@@ -17,15 +17,34 @@ from django.contrib import admin
 from django.urls import path
 from django.conf.urls import include
 from rest_framework import routers
-from tunaapi.views import ArtistView, GenreView, SongView, SongGenreView
+from tunaapi.views import (ArtistView, ChangeView, GenreView, SongView,
+                           SongGenreView, export, metrics)
+from tunaapi.views import async_catalog
 
 router = routers.DefaultRouter(trailing_slash=False)
 router.register(r'artists', ArtistView, 'artist')
 router.register(r'genres', GenreView, 'genre')
 router.register(r'songs', SongView, 'song')
 router.register(r'songgenres', SongGenreView, 'songgenre')
+router.register(r'changes', ChangeView, 'change')
+
+# Async read endpoints, served natively when running under ASGI
+async_urlpatterns = [
+    path('artists', async_catalog.artist_list),
+    path('artists/<int:pk>', async_catalog.artist_detail),
+    path('artists/<int:pk>/related', async_catalog.artist_related),
+    path('genres', async_catalog.genre_list),
+    path('genres/popular', async_catalog.genre_popular),
+    path('genres/<int:pk>', async_catalog.genre_detail),
+    path('songs', async_catalog.song_list),
+    path('songs/<int:pk>', async_catalog.song_detail),
+    path('songgenres', async_catalog.songgenre_list),
+]
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics, name='metrics'),
+    path('export', export, name='export'),
+    path('async/', include(async_urlpatterns)),
     path('', include(router.urls))
 ]